@@ -0,0 +1,150 @@
+"""
+Read-only JSON API.
+
+``ReadEndpoint`` is a list view declared by its ``fields`` (public name ->
+ORM path) and ``filters`` (query parameter -> ORM lookup). Requests may ask
+for ``?fields=a,b`` to fetch only those columns. Rows are read with
+``values_list`` and serialized as plain dicts, so no model instance is
+built. Pages are keyset-paginated on the primary key: ``next`` is an opaque
+cursor for ``?cursor=`` and each page is an index range scan, however deep.
+
+Responses carry an ETag and answer ``If-None-Match`` with 304. Endpoints
+that can tell cheaply whether their data changed override ``get_version``,
+which lets the 304 be sent before the page is queried; the others hash the
+body. Access needs a logged-in user with the model's view permission.
+"""
+
+import base64
+import hashlib
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse, JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views import View
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(value) -> str:
+    text = json.dumps(value, cls=DjangoJSONEncoder)
+    return base64.urlsafe_b64encode(text.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except ValueError:
+        raise ValueError("Invalid cursor.")
+
+
+def _error(message, status=400):
+    return JsonResponse({"error": message}, status=status)
+
+
+def _conditional(request, etag, response=None):
+    """``response`` tagged with ``etag``, or a 304 if the client has it."""
+    if response is None:
+        response = HttpResponse(content_type="application/json")
+    response["ETag"] = etag
+    # Clients may keep the page but must revalidate it
+    patch_cache_control(response, private=True, no_cache=True)
+    return get_conditional_response(request, etag=etag, response=response)
+
+
+class ReadEndpoint(View):
+    model = None
+    # Public field name -> ORM path, in output order
+    fields = {}
+    # Fields returned when the request does not ask for any
+    default_fields = ()
+    # Query parameter -> ORM lookup
+    filters = {}
+    http_method_names = ["get", "head", "options"]
+
+    def get_queryset(self, request, **kwargs):
+        return self.model._default_manager.all()
+
+    def get_version(self, request, queryset, **kwargs):
+        """
+        A cheap value that changes whenever the data does, or ``None`` to
+        tag responses by a hash of their body.
+        """
+        return None
+
+    def has_permission(self, request) -> bool:
+        opts = self.model._meta
+        return request.user.has_perm(f"{opts.app_label}.view_{opts.model_name}")
+
+    def parse_fields(self, request) -> tuple:
+        requested = request.GET.get("fields")
+        if not requested:
+            return tuple(self.default_fields or self.fields)
+        names = tuple(dict.fromkeys(n.strip() for n in requested.split(",") if n))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}.")
+        return names
+
+    def parse_limit(self, request) -> int:
+        try:
+            limit = int(request.GET.get("limit", DEFAULT_PAGE_SIZE))
+        except ValueError:
+            raise ValueError("limit must be a whole number.")
+        return min(max(limit, 1), MAX_PAGE_SIZE)
+
+    def filter_queryset(self, request, queryset):
+        lookups = {
+            lookup: request.GET[param]
+            for param, lookup in self.filters.items()
+            if param in request.GET
+        }
+        return queryset.filter(**lookups)
+
+    def get(self, request, **kwargs):
+        if not request.user.is_authenticated:
+            return _error("Authentication required.", status=401)
+        if not self.has_permission(request):
+            return _error("Permission denied.", status=403)
+        try:
+            names = self.parse_fields(request)
+            limit = self.parse_limit(request)
+            cursor = request.GET.get("cursor")
+            queryset = self.filter_queryset(
+                request, self.get_queryset(request, **kwargs)
+            )
+            version = self.get_version(request, queryset, **kwargs)
+            etag = None
+            if version is not None:
+                key = json.dumps([version, request.get_full_path()], default=str)
+                etag = quote_etag(hashlib.md5(key.encode()).hexdigest())
+                response = _conditional(request, etag)
+                if response.status_code == 304:
+                    return response
+
+            if cursor:
+                queryset = queryset.filter(pk__gt=decode_cursor(cursor))
+            paths = [self.fields[name] for name in names]
+            rows = list(queryset.order_by("pk").values_list("pk", *paths)[: limit + 1])
+        except (ValueError, TypeError, ValidationError) as exc:
+            message = exc.messages[0] if isinstance(exc, ValidationError) else exc
+            return _error(str(message))
+
+        more = len(rows) > limit
+        rows = rows[:limit]
+        body = json.dumps(
+            {
+                "results": [dict(zip(names, row[1:])) for row in rows],
+                "next": encode_cursor(rows[-1][0]) if more else None,
+            },
+            cls=DjangoJSONEncoder,
+        )
+        if etag is None:
+            etag = quote_etag(hashlib.md5(body.encode()).hexdigest())
+        return _conditional(
+            request, etag, HttpResponse(body, content_type="application/json")
+        )
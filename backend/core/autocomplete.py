@@ -0,0 +1,256 @@
+"""
+Prefix-indexed admin autocomplete.
+
+Admin ``autocomplete_fields`` widgets search with ``icontains`` over every
+``search_fields`` entry, which scans the table on each keystroke. For the
+large lists (ED codes, GL accounts, employees) ``PrefixIndex`` keeps the
+codes and the words of the names in memory as sorted ``(token, pk)`` pairs,
+so a search is a bisection. Built lazily with one query, it follows
+``post_save``/``post_delete`` row by row; bulk writers call ``invalidate``.
+Changes made by other processes (the job runner, other web workers) are
+picked up through a shared version (``core.caches``): a search rebuilds
+the index when it is behind. Pages of results are cached until the index
+changes.
+
+``IndexedAutocompleteJsonView`` is mounted over the admin's autocomplete URL
+(see ``core.urls``) and answers from the index when the target model has
+one, falling back to the stock view otherwise.
+"""
+
+import threading
+from bisect import bisect_left, insort
+from collections import OrderedDict
+
+from django.apps import apps
+from django.contrib.admin.views.autocomplete import AutocompleteJsonView
+from django.core.exceptions import PermissionDenied
+from django.db.models.signals import post_delete, post_save
+from django.http import JsonResponse
+
+from .caches import SharedVersion
+
+
+class PrefixIndex:
+    def __init__(self, label, keys, words=(), text="", cache_size=1024):
+        """
+        ``keys`` are fields matched on a prefix of their whole value and
+        ``words`` fields matched on a prefix of the value or any of its
+        words. ``text`` formats a result label from the row's fields.
+        """
+        self.label = label
+        self.keys = keys
+        self.words = words
+        self.text = text
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._fields = None
+        self._rows = None
+        self._keyTokens = []
+        self._wordTokens = []
+        self._cache = OrderedDict()
+        self.shared = SharedVersion(label)
+
+    @property
+    def model(self):
+        return apps.get_model(self.label)
+
+    @property
+    def fields(self) -> tuple:
+        """Fields kept per row: the pk then ``keys`` and ``words``."""
+        if self._fields is None:
+            pk = self.model._meta.pk.attname
+            self._fields = tuple(dict.fromkeys((pk, *self.keys, *self.words)))
+        return self._fields
+
+    def _tokens(self, row) -> tuple:
+        keys = {str(row[name]).casefold() for name in self.keys if row[name]}
+        words = set()
+        for name in self.words:
+            value = str(row[name] or "").casefold()
+            if value:
+                words.add(value)
+                words.update(value.split())
+        return keys, words
+
+    def _add(self, row):
+        pk = row[self.fields[0]]
+        self._rows[pk] = row
+        keys, words = self._tokens(row)
+        for token in keys:
+            insort(self._keyTokens, (token, pk))
+        for token in words:
+            insort(self._wordTokens, (token, pk))
+
+    def _remove(self, pk):
+        row = self._rows.pop(pk, None)
+        if row is None:
+            return
+        keys, words = self._tokens(row)
+        for tokens, found in ((self._keyTokens, keys), (self._wordTokens, words)):
+            for token in found:
+                i = bisect_left(tokens, (token, pk))
+                if i < len(tokens) and tokens[i] == (token, pk):
+                    del tokens[i]
+
+    def _build(self):
+        rows = {}
+        key_tokens = []
+        word_tokens = []
+        for values in self.model._default_manager.values_list(*self.fields):
+            row = dict(zip(self.fields, values))
+            pk = values[0]
+            rows[pk] = row
+            keys, words = self._tokens(row)
+            key_tokens.extend((token, pk) for token in keys)
+            word_tokens.extend((token, pk) for token in words)
+        key_tokens.sort()
+        word_tokens.sort()
+        self._rows = rows
+        self._keyTokens = key_tokens
+        self._wordTokens = word_tokens
+
+    def _drop(self):
+        with self._lock:
+            self._rows = None
+            self._keyTokens = []
+            self._wordTokens = []
+            self._cache.clear()
+
+    def invalidate(self, **kwargs):
+        """Drop the index here and in other processes; searches rebuild it."""
+        self._drop()
+        self.shared.bump()
+
+    def saved(self, instance, **kwargs):
+        with self._lock:
+            if self._rows is not None:
+                self._remove(instance.pk)
+                self._add({name: getattr(instance, name) for name in self.fields})
+            self._cache.clear()
+        self.shared.bump()
+
+    def deleted(self, instance, **kwargs):
+        with self._lock:
+            if self._rows is not None:
+                self._remove(instance.pk)
+            self._cache.clear()
+        self.shared.bump()
+
+    def connect(self):
+        post_save.connect(self.saved, sender=self.label, weak=False)
+        post_delete.connect(self.deleted, sender=self.label, weak=False)
+
+    def _matches(self, term):
+        """Matching pks, code matches before name matches, without repeats."""
+        seen = set()
+        if not term:
+            tokens = self._keyTokens
+            for _, pk in tokens:
+                if pk not in seen:
+                    seen.add(pk)
+                    yield pk
+            return
+        for tokens in (self._keyTokens, self._wordTokens):
+            i = bisect_left(tokens, (term,))
+            while i < len(tokens) and tokens[i][0].startswith(term):
+                pk = tokens[i][1]
+                i += 1
+                if pk not in seen:
+                    seen.add(pk)
+                    yield pk
+
+    def search(self, term, page=1, size=20, to_field=None) -> tuple:
+        """
+        Return ``(results, more)`` for page ``page`` of ``term`` in the
+        select2 format, ``results`` being ``[{"id": ..., "text": ...}]``
+        with the id taken from ``to_field`` (the pk by default).
+        """
+        to_field = to_field or self.fields[0]
+        term = " ".join(term.casefold().split())
+        key = (term, page, size, to_field)
+        if self.shared.changed():
+            self._drop()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+            if self._rows is None:
+                self._build()
+            start = (page - 1) * size
+            pks = []
+            for i, pk in enumerate(self._matches(term)):
+                if i >= start:
+                    pks.append(pk)
+                    if len(pks) > size:
+                        break
+            results = [
+                {
+                    "id": str(self._rows[pk][to_field]),
+                    "text": self.text.format(**self._rows[pk]),
+                }
+                for pk in pks[:size]
+            ]
+            cached = (results, len(pks) > size)
+            self._cache[key] = cached
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return cached
+
+
+INDEXES = {
+    index.label: index
+    for index in (
+        PrefixIndex(
+            "payroll_setup.EdDefinition",
+            keys=("edCode",),
+            words=("description",),
+            text="{edCode} - {description}",
+        ),
+        PrefixIndex(
+            "financial.GLAccount",
+            keys=("no",),
+            words=("name",),
+            text="{no} - {name}",
+        ),
+        PrefixIndex(
+            "employee.Employee",
+            keys=("employeeNo",),
+            words=("name",),
+            text="{employeeNo} - {name}",
+        ),
+    )
+}
+for index in INDEXES.values():
+    index.connect()
+
+
+def invalidate(label):
+    """Drop the index of model ``label`` after a write that sent no signals."""
+    index = INDEXES.get(label)
+    if index is not None:
+        index.invalidate()
+
+
+class IndexedAutocompleteJsonView(AutocompleteJsonView):
+    """The admin autocomplete view, answered from ``INDEXES`` when it can."""
+
+    def get(self, request, *args, **kwargs):
+        term, model_admin, source_field, to_field_name = self.process_request(request)
+        index = INDEXES.get(model_admin.model._meta.label)
+        if (
+            index is None
+            or to_field_name not in index.fields
+            or source_field.get_limit_choices_to()
+        ):
+            return super().get(request, *args, **kwargs)
+
+        self.model_admin = model_admin
+        if not self.has_perm(request):
+            raise PermissionDenied
+        try:
+            page = max(int(request.GET.get("page", 1)), 1)
+        except ValueError:
+            page = 1
+        results, more = index.search(term, page, self.paginate_by, to_field_name)
+        return JsonResponse({"results": results, "pagination": {"more": more}})
@@ -0,0 +1,62 @@
+"""
+Cross-process invalidation of in-process caches.
+
+Setup snapshots, the exchange rate index and the autocomplete indexes are
+kept in memory by every process using them: web workers and the background
+job runner alike. Signals only reach the process that saved a row, so each
+cache also has a ``SharedVersion``, a ``CacheVersion`` row. A process that
+changes the cached data calls ``bump`` (after its transaction commits); a
+process about to use its cache calls ``changed`` first, one primary-key
+query, and drops the cache when another process bumped the version since.
+"""
+
+import threading
+
+from django.db import transaction
+from django.db.models import F
+
+from .models import CacheVersion
+
+
+class SharedVersion:
+    def __init__(self, name: str):
+        self.name = name
+        self.seen = None
+        self._lock = threading.Lock()
+
+    def __repr__(self) -> str:
+        return f"<SharedVersion {self.name}: {self.seen}>"
+
+    def current(self) -> int:
+        return (
+            CacheVersion.objects.filter(name=self.name)
+            .values_list("version", flat=True)
+            .first()
+            or 0
+        )
+
+    def changed(self) -> bool:
+        """Whether the data changed since the last call (true on the first)."""
+        version = self.current()
+        with self._lock:
+            if version == self.seen:
+                return False
+            self.seen = version
+            return True
+
+    def bump(self):
+        """Tell other processes the data changed, once the transaction commits."""
+        transaction.on_commit(self._bump)
+
+    def _bump(self):
+        if not CacheVersion.objects.filter(name=self.name).update(
+            version=F("version") + 1
+        ):
+            CacheVersion.objects.get_or_create(name=self.name)
+            CacheVersion.objects.filter(name=self.name).update(version=F("version") + 1)
+        version = self.current()
+        with self._lock:
+            # Our own change is already reflected in this process's cache;
+            # a gap means another process changed the data too
+            if self.seen is not None and version == self.seen + 1:
+                self.seen = version
@@ -0,0 +1,18 @@
+from django.db import models
+
+
+class CacheVersion(models.Model):
+    """
+    Version of the data behind an in-process cache, shared by every process
+    keeping that cache (see ``core.caches``).
+    """
+
+    name = models.CharField(max_length=100, primary_key=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Cache Version"
+        verbose_name_plural = "Cache Versions"
+
+    def __str__(self) -> str:
+        return f"{self.name}: {self.version}"
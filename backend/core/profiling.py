@@ -0,0 +1,196 @@
+"""
+Opt-in stage instrumentation.
+
+Hot paths wrap their work in ``stage(name, scheme=None, count=1)``. While no
+profile is active (the default) ``stage`` returns a shared no-op context
+manager, so instrumentation costs a global lookup per call; stages wrap
+chunks and plan steps, never single employees. Inside ``profiling()`` each
+stage adds its count, wall time and the database queries issued while it
+ran (nested stages included) to the active ``Profile``, overall and per
+scheme. Worker processes profile their own work and hand ``Profile.totals``
+back with their results for ``Profile.merge``.
+
+``Profile.as_dict`` is JSON-ready; ``summary`` renders it as text.
+"""
+
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+_active = None
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    @property
+    def count(self):
+        return 0
+
+    @count.setter
+    def count(self, value):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("profile", "name", "scheme", "count", "started", "queries")
+
+    def __init__(self, profile, name, scheme, count):
+        self.profile = profile
+        self.name = name
+        self.scheme = scheme
+        self.count = count
+
+    def __enter__(self):
+        self.queries = self.profile.queries
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profile.add(
+            self.name,
+            self.scheme,
+            self.count,
+            time.perf_counter() - self.started,
+            self.profile.queries - self.queries,
+        )
+        return False
+
+
+class Profile:
+    """Counts, seconds and queries per stage, and per scheme and stage."""
+
+    def __init__(self):
+        self.stages = {}
+        self.schemes = {}
+        self.queries = 0
+        self.started = time.perf_counter()
+        self.seconds = None
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+    def add(self, name, scheme, count, seconds, queries):
+        totals = self.stages.setdefault(name, [0, 0.0, 0])
+        totals[0] += count
+        totals[1] += seconds
+        totals[2] += queries
+        if scheme is not None:
+            totals = self.schemes.setdefault(scheme, {}).setdefault(name, [0, 0.0, 0])
+            totals[0] += count
+            totals[1] += seconds
+            totals[2] += queries
+
+    @property
+    def totals(self) -> tuple:
+        """Plain ``(stages, schemes)`` to send back from a worker process."""
+        return self.stages, self.schemes
+
+    def merge(self, totals):
+        stages, schemes = totals
+        for name, values in stages.items():
+            self.add(name, None, *values)
+        for scheme, by_stage in schemes.items():
+            for name, values in by_stage.items():
+                counts = self.schemes.setdefault(scheme, {}).setdefault(
+                    name, [0, 0.0, 0]
+                )
+                for index, value in enumerate(values):
+                    counts[index] += value
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+
+    def as_dict(self) -> dict:
+        def _stages(stages):
+            return {
+                name: {
+                    "count": count,
+                    "seconds": round(seconds, 6),
+                    "queries": queries,
+                }
+                for name, (count, seconds, queries) in stages.items()
+            }
+
+        return {
+            "seconds": round(self.seconds, 6) if self.seconds is not None else None,
+            "queries": self.queries,
+            "stages": _stages(self.stages),
+            "schemes": {
+                str(scheme): _stages(stages)
+                for scheme, stages in sorted(self.schemes.items(), key=str)
+            },
+        }
+
+
+def active():
+    """The active ``Profile``, or ``None``."""
+    return _active
+
+
+def stage(name: str, scheme=None, count: int = 1):
+    """Context manager timing ``name`` (for ``scheme``) in the active profile."""
+    if _active is None:
+        return _NULL_STAGE
+    return _Stage(_active, name, scheme, count)
+
+
+@contextmanager
+def profiling(enabled: bool = True):
+    """
+    Activate a new ``Profile`` for the block and yield it, or yield ``None``
+    when not ``enabled``. Queries are counted on the default connection.
+    """
+    global _active
+    if not enabled:
+        yield None
+        return
+    profile = Profile()
+    previous, _active = _active, profile
+    try:
+        with connection.execute_wrapper(profile.count_query):
+            yield profile
+    finally:
+        _active = previous
+        profile.finish()
+
+
+def _table(stages, indent="") -> list:
+    lines = []
+    for name, row in sorted(stages.items(), key=lambda item: -item[1]["seconds"]):
+        lines.append(
+            f"{indent}{name:<20}{row['count']:>10}{row['seconds']:>12.3f}"
+            f"{row['queries']:>10}"
+        )
+    return lines
+
+
+def summary(profile: dict) -> str:
+    """Text rendering of ``Profile.as_dict()``, slowest stages first."""
+    seconds = profile.get("seconds")
+    header = f"{'Stage':<20}{'Count':>10}{'Seconds':>12}{'Queries':>10}"
+    lines = [
+        (
+            f"Total {seconds:.3f}s, {profile.get('queries', 0)} queries"
+            if seconds is not None
+            else "Total: unfinished"
+        ),
+        "",
+        header,
+    ]
+    lines.extend(_table(profile.get("stages", {})))
+    for scheme, stages in profile.get("schemes", {}).items():
+        lines.extend(["", f"Scheme {scheme}", f"  {header}"])
+        lines.extend(_table(stages, "  "))
+    return "\n".join(lines)
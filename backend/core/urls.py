@@ -17,6 +17,29 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path
 
+from core.autocomplete import IndexedAutocompleteJsonView
+from employee.views import EmployeeListView
+from financial.views import GeneralLedgerEntryListView
+from payroll.views import PayrollRunLineListView, PayrollRunListView
+
 urlpatterns = [
+    # Ahead of admin.site.urls so the admin's autocomplete widgets use it
+    path(
+        'admin/autocomplete/',
+        admin.site.admin_view(IndexedAutocompleteJsonView.as_view(admin_site=admin.site)),
+        name='indexed_autocomplete',
+    ),
     path('admin/', admin.site.urls),
+    path('api/employees/', EmployeeListView.as_view(), name='api_employees'),
+    path('api/payroll-runs/', PayrollRunListView.as_view(), name='api_payroll_runs'),
+    path(
+        'api/payroll-runs/<int:run_id>/lines/',
+        PayrollRunLineListView.as_view(),
+        name='api_payroll_run_lines',
+    ),
+    path(
+        'api/gl-entries/',
+        GeneralLedgerEntryListView.as_view(),
+        name='api_gl_entries',
+    ),
 ]
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.http import HttpResponse
 
 from .models import Employee, ModeOfPayment
 
@@ -17,6 +18,7 @@ class EmployeeAdmin(admin.ModelAdmin):
         "name",
         "calculationScheme",
         "payrollCode",
+        "employeePostingGroup",
         "modeOfPayment",
         "basicPay",
         "salaryScale",
@@ -30,14 +32,24 @@ class EmployeeAdmin(admin.ModelAdmin):
         "payrollCode__code",
     )
     list_filter = ("payrollCode", "modeOfPayment")
+    list_select_related = (
+        "calculationScheme",
+        "payrollCode",
+        "employeePostingGroup",
+        "modeOfPayment",
+        "salaryScale",
+        "scaleStep__scale",
+    )
     autocomplete_fields = (
         "calculationScheme",
         "payrollCode",
+        "employeePostingGroup",
         "modeOfPayment",
         "salaryScale",
         "scaleStep",
     )
     ordering = ("employeeNo",)
+    actions = ["export_csv"]
 
     fieldsets = (
         (
@@ -49,7 +61,10 @@ class EmployeeAdmin(admin.ModelAdmin):
         (
             "Assignments",
             {
-                "fields": (("calculationScheme", "payrollCode"), ("modeOfPayment",)),
+                "fields": (
+                    ("calculationScheme", "payrollCode"),
+                    ("employeePostingGroup", "modeOfPayment"),
+                ),
                 "classes": ("gen-grid",),
             },
         ),
@@ -59,13 +74,21 @@ class EmployeeAdmin(admin.ModelAdmin):
                 "fields": (("basicPay", "fixedPay"), ("salaryScale", "scaleStep")),
                 "classes": ("gen-grid",),
             },
-
         ),
     )
 
     class Media:
         css = {"all": ("financial/admin.css",)}
 
+    @admin.action(description="Export selected employees to CSV")
+    def export_csv(self, request, queryset):
+        from .importer import export_rows, write_csv
+
+        response = HttpResponse(content_type="text/csv")
+        response["Content-Disposition"] = 'attachment; filename="employees.csv"'
+        write_csv(response, export_rows(queryset))
+        return response
+
 
 from django.contrib import admin
 
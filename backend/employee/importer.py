@@ -0,0 +1,275 @@
+"""
+Bulk employee import and export keyed on ``employeeNo``.
+
+Related records are referenced by their natural keys (scheme ID, payroll
+code, posting group, mode of payment code, scale code and step code) and
+resolved through dictionaries loaded once per import. Every row is parsed
+and checked before anything is written: the ``Employee.clean`` Basic Pay
+rules depend only on which of a handful of values are set, so they are
+evaluated once per distinct combination rather than once per row. Changes
+are then written with ``bulk_create``/``bulk_update`` in batches inside one
+transaction. Columns missing from a file leave existing values untouched.
+"""
+
+import csv
+import json
+import time
+from decimal import Decimal, InvalidOperation
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from core import autocomplete
+
+from financial.importer import BATCH_SIZE, ImportResult
+from payroll.changes import mark_dirty
+from payroll.models import Payroll, SalaryScale, SalaryScaleStep
+from payroll_setup.models import CalculationHeader, EmployeePostingGroup
+
+from .models import Employee, ModeOfPayment, basic_pay_errors
+
+# Column name -> (model, natural key field) for foreign keys
+RELATIONS = {
+    "calculationScheme": (CalculationHeader, "schemeId"),
+    "payrollCode": (Payroll, "code"),
+    "employeePostingGroup": (EmployeePostingGroup, "postingGroup"),
+    "modeOfPayment": (ModeOfPayment, "code"),
+    "salaryScale": (SalaryScale, "code"),
+    "scaleStep": (SalaryScaleStep, "code"),
+}
+COLUMNS = ("employeeNo", "name", *RELATIONS, "basicPay", "fixedPay")
+# Model field names in the order of the value tuples compared and written
+FIELDS = ("name", *(f"{name}_id" for name in RELATIONS), "basicPay", "fixedPay")
+DEFAULTS = ("", *(None for _ in RELATIONS), "None", None)
+BASIC_PAY = {value for value, _ in Employee._meta.get_field("basicPay").choices}
+CENT = Decimal("0.01")
+MAX_ERRORS = 50
+
+_NAME = FIELDS.index("name")
+_SCALE = FIELDS.index("salaryScale_id")
+_STEP = FIELDS.index("scaleStep_id")
+_BASIC_PAY = FIELDS.index("basicPay")
+_FIXED_PAY = FIELDS.index("fixedPay")
+
+
+def iter_csv_records(stream):
+    yield from csv.DictReader(stream)
+
+
+def iter_jsonl_records(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def _reader(path: Path):
+    if path.suffix.lower() == ".csv":
+        return iter_csv_records
+    return iter_jsonl_records
+
+
+def load_keys() -> dict:
+    """``{column: {natural key: pk}}`` for every related model."""
+    return {
+        column: dict(model.objects.values_list(key, "pk"))
+        for column, (model, key) in RELATIONS.items()
+    }
+
+
+def _text(value) -> str:
+    return "" if value is None else str(value).strip()
+
+
+def _fixed_pay(value):
+    text = _text(value)
+    if not text:
+        return None
+    amount = Decimal(text).quantize(CENT)
+    if len(amount.as_tuple().digits) > 12:
+        raise InvalidOperation
+    return amount
+
+
+def parse_rows(records, keys, existing) -> tuple:
+    """
+    Resolve ``records`` into ``{employeeNo: value tuple}`` merged over the
+    ``existing`` values; later rows for the same employee win. Returns the
+    rows and a list of error messages.
+    """
+    rows = {}
+    errors = []
+    name_length = Employee._meta.get_field("name").max_length
+    no_length = Employee._meta.get_field("employeeNo").max_length
+    for number, record in enumerate(records, start=1):
+        employee_no = _text(record.get("employeeNo"))
+        label = f"Row {number} ({employee_no or 'no Employee No.'})"
+        if not employee_no or len(employee_no) > no_length:
+            errors.append(f"{label}: invalid Employee No.")
+            continue
+        values = list(rows.get(employee_no) or existing.get(employee_no) or DEFAULTS)
+        if "name" in record:
+            values[_NAME] = _text(record["name"])
+            if len(values[_NAME]) > name_length:
+                errors.append(f"{label}: name is longer than {name_length}.")
+        for index, column in enumerate(RELATIONS, start=1):
+            if column not in record:
+                continue
+            key = _text(record[column])
+            if not key:
+                values[index] = None
+            elif key in keys[column]:
+                values[index] = keys[column][key]
+            else:
+                errors.append(f"{label}: {column} '{key}' does not exist.")
+        if "basicPay" in record:
+            values[_BASIC_PAY] = _text(record["basicPay"]) or "None"
+            if values[_BASIC_PAY] not in BASIC_PAY:
+                errors.append(f"{label}: invalid Basic Pay '{record['basicPay']}'.")
+        if "fixedPay" in record:
+            try:
+                values[_FIXED_PAY] = _fixed_pay(record["fixedPay"])
+            except (InvalidOperation, ValueError):
+                errors.append(f"{label}: invalid Fixed Pay '{record['fixedPay']}'.")
+        if not values[_NAME]:
+            errors.append(f"{label}: name is required.")
+        rows[employee_no] = tuple(values)
+    return rows, errors
+
+
+def _signature(values) -> tuple:
+    fixed = values[_FIXED_PAY]
+    return (
+        values[_BASIC_PAY],
+        None if fixed is None else bool(fixed),
+        bool(values[_SCALE]),
+        bool(values[_STEP]),
+    )
+
+
+def validate_rows(rows) -> list:
+    """Check the ``Employee.clean`` rules for every row."""
+    verdicts = {}
+    errors = []
+    for employee_no, values in rows.items():
+        signature = _signature(values)
+        if signature not in verdicts:
+            basic_pay, fixed, scale, step = signature
+            fixed = None if fixed is None else Decimal(fixed)
+            verdicts[signature] = basic_pay_errors(basic_pay, fixed, scale, step)
+        verdict = verdicts[signature]
+        if verdict:
+            errors.append(f"{employee_no}: {' '.join(dict.fromkeys(verdict.values()))}")
+    return errors
+
+
+def import_records(records, batch_size: int = BATCH_SIZE) -> ImportResult:
+    """
+    Import employees from an iterable of dicts keyed by ``COLUMNS``. Raises
+    ``ValidationError`` and writes nothing if any row is invalid.
+    """
+    result = ImportResult()
+    started = time.perf_counter()
+    keys = load_keys()
+    with transaction.atomic():
+        existing = {}
+        ids = {}
+        for pk, employee_no, *values in Employee.objects.values_list(
+            "pk", "employeeNo", *FIELDS
+        ):
+            existing[employee_no] = tuple(values)
+            ids[employee_no] = pk
+        rows, errors = parse_rows(records, keys, existing)
+        errors += validate_rows(rows)
+        if errors:
+            more = len(errors) - MAX_ERRORS
+            if more > 0:
+                errors = errors[:MAX_ERRORS] + [f"... and {more} more errors."]
+            raise ValidationError(errors)
+
+        to_create = []
+        to_update = []
+        for employee_no, values in rows.items():
+            current = existing.get(employee_no)
+            if current == values:
+                result.unchanged += 1
+                continue
+            employee = Employee(employeeNo=employee_no, **dict(zip(FIELDS, values)))
+            if current is None:
+                to_create.append(employee)
+                result.created += 1
+            else:
+                employee.pk = ids[employee_no]
+                to_update.append(employee)
+                result.updated += 1
+        Employee.objects.bulk_create(to_create, batch_size=batch_size)
+        Employee.objects.bulk_update(to_update, FIELDS, batch_size=batch_size)
+        # bulk writes send no signals, so mark changed employees here
+        changed = [e.employeeNo for e in to_create] + [e.employeeNo for e in to_update]
+        for start in range(0, len(changed), batch_size):
+            mark_dirty(
+                Employee.objects.filter(
+                    employeeNo__in=changed[start : start + batch_size]
+                )
+            )
+    autocomplete.invalidate("employee.Employee")
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def import_file(path, batch_size: int = BATCH_SIZE) -> ImportResult:
+    """Import a ``.csv`` or ``.jsonl`` employee file."""
+    path = Path(path)
+    with path.open(encoding="utf-8", newline="") as stream:
+        return import_records(_reader(path)(stream), batch_size)
+
+
+def export_rows(queryset=None):
+    """Yield employees as dicts keyed by ``COLUMNS`` with natural keys."""
+    if queryset is None:
+        queryset = Employee.objects.all()
+    lookups = [
+        "employeeNo",
+        "name",
+        *(f"{column}__{key}" for column, (_, key) in RELATIONS.items()),
+        "basicPay",
+        "fixedPay",
+    ]
+    for values in (
+        queryset.order_by("employeeNo").values_list(*lookups).iterator(chunk_size=2000)
+    ):
+        row = dict(zip(COLUMNS, values))
+        if row["fixedPay"] is not None:
+            row["fixedPay"] = str(row["fixedPay"])
+        yield row
+
+
+def write_csv(stream, rows):
+    writer = csv.DictWriter(stream, COLUMNS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+
+
+def write_jsonl(stream, rows):
+    for row in rows:
+        stream.write(json.dumps(row) + "\n")
+
+
+def export_file(path, queryset=None) -> int:
+    """Write employees to a ``.csv`` or ``.jsonl`` file; returns the count."""
+    path = Path(path)
+    count = 0
+
+    def counted():
+        nonlocal count
+        for row in export_rows(queryset):
+            count += 1
+            yield row
+
+    with path.open("w", encoding="utf-8", newline="") as stream:
+        if path.suffix.lower() == ".csv":
+            write_csv(stream, counted())
+        else:
+            write_jsonl(stream, counted())
+    return count
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from employee.importer import export_file
+from employee.models import Employee
+
+
+class Command(BaseCommand):
+    help = "Write employees to a CSV or JSONL file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSONL file")
+        parser.add_argument("--payroll", help="Only employees of this payroll code")
+
+    def handle(self, *args, **options):
+        queryset = Employee.objects.all()
+        if options["payroll"]:
+            queryset = queryset.filter(payrollCode__code=options["payroll"])
+        try:
+            count = export_file(options["path"], queryset)
+        except OSError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(
+            self.style.SUCCESS(f"Exported {count} employees to {options['path']}.")
+        )
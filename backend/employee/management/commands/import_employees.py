@@ -0,0 +1,27 @@
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from employee.importer import import_file
+from financial.importer import BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = "Create or update employees from a CSV or JSONL file keyed on employeeNo."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSONL file")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"File not found: {path}")
+        try:
+            result = import_file(path, batch_size=options["batch_size"])
+        except ValidationError as exc:
+            raise CommandError("\n".join(exc.messages))
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise CommandError(f"Failed to read {path}: {exc}")
+        self.stdout.write(self.style.SUCCESS(f"Imported Employees: {result}."))
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("employee", "0002_employee"),
+        ("payroll_setup", "0022_calculationheader_basicpayentry"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="employee",
+            name="employeePostingGroup",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="employees",
+                to="payroll_setup.employeepostinggroup",
+                verbose_name="Employee Posting Group",
+            ),
+        ),
+    ]
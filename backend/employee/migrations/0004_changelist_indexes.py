@@ -0,0 +1,29 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("employee", "0003_employee_employeepostinggroup"),
+        ("payroll", "0006_salaryscalestepamount"),
+        ("payroll_setup", "0024_changelist_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="employee",
+            index=models.Index(
+                fields=["payrollCode", "employeeNo"],
+                name="employee_em_payroll_7bde59_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="employee",
+            index=models.Index(
+                fields=["modeOfPayment", "employeeNo"],
+                name="employee_em_modeOfP_2a7877_idx",
+            ),
+        ),
+    ]
@@ -35,6 +35,14 @@ class Employee(models.Model):
         blank=True,
         null=True,
     )
+    employeePostingGroup = models.ForeignKey(
+        "payroll_setup.EmployeePostingGroup",
+        on_delete=models.PROTECT,
+        related_name="employees",
+        verbose_name="Employee Posting Group",
+        blank=True,
+        null=True,
+    )
     modeOfPayment = models.ForeignKey(
         "employee.ModeOfPayment",
         on_delete=models.PROTECT,
@@ -73,6 +81,10 @@ class Employee(models.Model):
         verbose_name = "Employee"
         verbose_name_plural = "Employees"
         ordering = ["employeeNo"]
+        indexes = [
+            models.Index(fields=["payrollCode", "employeeNo"]),
+            models.Index(fields=["modeOfPayment", "employeeNo"]),
+        ]
 
     def __str__(self) -> str:
         return f"{self.employeeNo} - {self.name}"
@@ -81,34 +93,36 @@ class Employee(models.Model):
         from django.core.exceptions import ValidationError
 
         super().clean()
-        if self.basicPay == "Fixed":
-            if self.fixedPay in (None,):
-                raise ValidationError(
-                    {"fixedPay": "Fixed Pay is required when Basic Pay is Fixed."}
-                )
-            if self.salaryScale or self.scaleStep:
-                raise ValidationError(
-                    {
-                        "salaryScale": "Clear when Basic Pay is Fixed.",
-                        "scaleStep": "Clear when Basic Pay is Fixed.",
-                    }
-                )
-        elif self.basicPay == "Scale":
-            if not self.salaryScale:
-                raise ValidationError(
-                    {"salaryScale": "Salary Scale is required when Basic Pay is Scale."}
-                )
-            if not self.scaleStep:
-                raise ValidationError(
-                    {"scaleStep": "Scale Step is required when Basic Pay is Scale."}
-                )
-            if self.fixedPay not in (None,):
-                raise ValidationError({"fixedPay": "Clear when Basic Pay is Scale."})
-        else:
-            # None
-            if self.fixedPay or self.salaryScale or self.scaleStep:
-                raise ValidationError(
-                    {
-                        "basicPay": "When Basic Pay is None, Fixed Pay, Salary Scale and Scale Step must be empty."
-                    }
-                )
+        errors = basic_pay_errors(
+            self.basicPay, self.fixedPay, self.salaryScale_id, self.scaleStep_id
+        )
+        if errors:
+            raise ValidationError(errors)
+
+
+def basic_pay_errors(basicPay, fixedPay, salaryScale, scaleStep) -> dict | None:
+    """
+    Basic Pay rules shared by ``Employee.clean`` and the bulk importer, which
+    checks them on plain values. Returns the first violation as a field error
+    dict, or ``None``.
+    """
+    if basicPay == "Fixed":
+        if fixedPay is None:
+            return {"fixedPay": "Fixed Pay is required when Basic Pay is Fixed."}
+        if salaryScale or scaleStep:
+            return {
+                "salaryScale": "Clear when Basic Pay is Fixed.",
+                "scaleStep": "Clear when Basic Pay is Fixed.",
+            }
+    elif basicPay == "Scale":
+        if not salaryScale:
+            return {"salaryScale": "Salary Scale is required when Basic Pay is Scale."}
+        if not scaleStep:
+            return {"scaleStep": "Scale Step is required when Basic Pay is Scale."}
+        if fixedPay is not None:
+            return {"fixedPay": "Clear when Basic Pay is Scale."}
+    elif fixedPay or salaryScale or scaleStep:
+        return {
+            "basicPay": "When Basic Pay is None, Fixed Pay, Salary Scale and Scale Step must be empty."
+        }
+    return None
@@ -1,3 +1,26 @@
-from django.shortcuts import render
+from core.api import ReadEndpoint
 
-# Create your views here.
+from .models import Employee
+
+
+class EmployeeListView(ReadEndpoint):
+    model = Employee
+    fields = {
+        "id": "pk",
+        "employeeNo": "employeeNo",
+        "name": "name",
+        "payrollCode": "payrollCode__code",
+        "calculationScheme": "calculationScheme__schemeId",
+        "employeePostingGroup": "employeePostingGroup__postingGroup",
+        "modeOfPayment": "modeOfPayment__code",
+        "basicPay": "basicPay",
+        "salaryScale": "salaryScale__code",
+        "scaleStep": "scaleStep__code",
+        "fixedPay": "fixedPay",
+    }
+    default_fields = ("id", "employeeNo", "name", "payrollCode")
+    filters = {
+        "payroll": "payrollCode__code",
+        "scheme": "calculationScheme__schemeId",
+        "employeeNo": "employeeNo__startswith",
+    }
@@ -1,12 +1,31 @@
 from django.contrib import admin, messages
-from django.utils.safestring import mark_safe
-from django.db import transaction
+from django.core.exceptions import ValidationError
+from django.utils.html import format_html
 from django.urls import path, reverse
 from django.shortcuts import redirect
-import json
-from pathlib import Path
+from django.template.response import TemplateResponse
 
-from .models import GLAccount
+from .models import (
+    Currency,
+    ExchangeRate,
+    GeneralJournalLine,
+    GeneralLedgerEntry,
+    GLAccount,
+)
+
+
+class ExchangeRateInline(admin.TabularInline):
+    model = ExchangeRate
+    extra = 0
+    fields = ("startingDate", "rate")
+    ordering = ("-startingDate",)
+
+
+@admin.register(Currency)
+class CurrencyAdmin(admin.ModelAdmin):
+    list_display = ("code", "name")
+    search_fields = ("code", "name")
+    inlines = [ExchangeRateInline]
 
 
 @admin.register(GLAccount)
@@ -19,7 +38,9 @@ class GLAccountAdmin(admin.ModelAdmin):
         "accountcategory",
         "direct_posting",
         "blocked",
+        "balance_display",
     )
+    list_select_related = ("balanceTotal",)
     search_fields = ("no", "name")
     list_filter = ("accounttype", "accountcategory", "direct_posting", "blocked")
     ordering = ("no",)
@@ -29,109 +50,34 @@ class GLAccountAdmin(admin.ModelAdmin):
     class Media:
         css = {"all": ("financial/admin.css",)}
 
-    def _extract_first_array(self, text: str) -> str | None:
-        # Extract the first top-level JSON array from arbitrary text
-        start = text.find("[")
-        if start == -1:
-            return None
-        depth = 0
-        in_string = False
-        escape = False
-        for i in range(start, len(text)):
-            ch = text[i]
-            if in_string:
-                if escape:
-                    escape = False
-                elif ch == "\\":
-                    escape = True
-                elif ch == '"':
-                    in_string = False
-                continue
-            else:
-                if ch == '"':
-                    in_string = True
-                    continue
-                if ch == "[":
-                    depth += 1
-                elif ch == "]":
-                    depth -= 1
-                    if depth == 0:
-                        end = i + 1
-                        return text[start:end]
-        return None
-
-    def _do_import_gl_accounts(self, request):
-        json_path = Path(__file__).resolve().parent / "gl_account.json"
-        if not json_path.exists():
-            return (0, 0, f"File not found: {json_path}")
-
-        text = None
-        try:
-            text = json_path.read_text(encoding="utf-8")
-            data = json.loads(text)
-        except Exception:
-            # Fallback: extract the first top-level array from the file
-            try:
-                array_text = self._extract_first_array(text or "")
-                if not array_text:
-                    return (0, 0, "Failed to read JSON: No top-level array found.")
-                data = json.loads(array_text)
-            except Exception as exc2:
-                return (0, 0, f"Failed to read JSON: {exc2}")
-
-        if isinstance(data, dict):
-            first_list = None
-            for value in data.values():
-                if isinstance(value, list):
-                    first_list = value
-                    break
-            data = first_list or []
-
-        if not isinstance(data, list):
-            return (
-                0,
-                0,
-                "JSON format not recognized. Expected a top-level list of accounts.",
-            )
+    @admin.display(description="Balance", ordering="balanceTotal__balance")
+    def balance_display(self, obj):
+        return obj.balance
 
-        created_count = 0
-        updated_count = 0
-        with transaction.atomic():
-            for item in data:
-                no = item.get("no")
-                if not no:
-                    continue
-                defaults = {
-                    "name": item.get("name") or "",
-                    "indentation": item.get("indentation") or 0,
-                    "income_balance": item.get("income_balance") or None,
-                    "accountcategory": item.get("accountcategory") or None,
-                    "debit_credit": item.get("debit_credit") or None,
-                    "accounttype": item.get("accounttype") or None,
-                    "totaling": item.get("totaling"),
-                    "direct_posting": bool(item.get("direct_posting")),
-                    "blocked": bool(item.get("blocked")),
-                }
-                obj, created = GLAccount.objects.update_or_create(
-                    no=no, defaults=defaults
-                )
-                if created:
-                    created_count += 1
-                else:
-                    updated_count += 1
+    def _queue_import(self, request):
+        from payroll.jobs import enqueue
 
-        return (created_count, updated_count, None)
+        from .importer import DEFAULT_PATH
 
-    @admin.action(description="Import GL Accounts from financial/gl_account.json")
-    def import_gl_accounts(self, request, queryset):
-        created, updated, error = self._do_import_gl_accounts(request)
-        if error:
-            self.message_user(request, error, level=messages.ERROR)
+        if not DEFAULT_PATH.exists():
+            self.message_user(
+                request, f"File not found: {DEFAULT_PATH}", level=messages.ERROR
+            )
             return
-        msg = mark_safe(
-            f"Imported GL Accounts: <strong>{created} created</strong>, <strong>{updated} updated</strong>."
+        # Imports run in a background worker (manage.py run_jobs)
+        job = enqueue("import_gl", request.user, path=str(DEFAULT_PATH))
+        url = reverse("admin:payroll_job_change", args=[job.pk])
+        self.message_user(
+            request,
+            format_html(
+                'GL Account import queued as <a href="{}">job {}</a>.', url, job.pk
+            ),
+            level=messages.SUCCESS,
         )
-        self.message_user(request, msg, level=messages.SUCCESS)
+
+    @admin.action(description="Import GL Accounts from financial/gl_account.json")
+    def import_gl_accounts(self, request, queryset):
+        self._queue_import(request)
 
     def get_urls(self):
         urls = super().get_urls()
@@ -140,17 +86,92 @@ class GLAccountAdmin(admin.ModelAdmin):
                 "import-gl/",
                 self.admin_site.admin_view(self.import_gl_view),
                 name="financial_glaccount_import",
-            )
+            ),
+            path(
+                "trial-balance/",
+                self.admin_site.admin_view(self.trial_balance_view),
+                name="financial_glaccount_trial_balance",
+            ),
         ]
         return custom_urls + urls
 
     def import_gl_view(self, request):
-        created, updated, error = self._do_import_gl_accounts(request)
-        if error:
-            self.message_user(request, error, level=messages.ERROR)
-        else:
-            msg = mark_safe(
-                f"Imported GL Accounts: <strong>{created} created</strong>, <strong>{updated} updated</strong>."
-            )
-            self.message_user(request, msg, level=messages.SUCCESS)
+        self._queue_import(request)
         return redirect(reverse("admin:financial_glaccount_changelist"))
+
+    def trial_balance_view(self, request):
+        from .totaling import trial_balance
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "title": "Trial Balance",
+            "rows": trial_balance(),
+        }
+        return TemplateResponse(
+            request, "admin/financial/glaccount/trial_balance.html", context
+        )
+
+
+@admin.register(GeneralJournalLine)
+class GeneralJournalLineAdmin(admin.ModelAdmin):
+    list_display = (
+        "documentNo",
+        "postingDate",
+        "glAccount",
+        "description",
+        "amount",
+        "sourceCode",
+    )
+    search_fields = ("documentNo", "glAccount__no", "glAccount__name")
+    list_filter = ("sourceCode", "postingDate")
+    autocomplete_fields = ("glAccount",)
+    ordering = ("documentNo", "id")
+    actions = ["post_documents"]
+
+    @admin.action(description="Post documents of selected lines to the G/L")
+    def post_documents(self, request, queryset):
+        from .ledger import post_journal
+
+        for document_no in sorted(set(queryset.values_list("documentNo", flat=True))):
+            try:
+                entries = post_journal(document_no)
+            except ValidationError as exc:
+                self.message_user(
+                    request,
+                    f"{document_no}: {'; '.join(exc.messages)}",
+                    level=messages.ERROR,
+                )
+            else:
+                self.message_user(
+                    request,
+                    f"{document_no}: posted {len(entries)} G/L entries.",
+                    level=messages.SUCCESS,
+                )
+
+
+@admin.register(GeneralLedgerEntry)
+class GeneralLedgerEntryAdmin(admin.ModelAdmin):
+    list_display = (
+        "id",
+        "postingDate",
+        "documentNo",
+        "glAccount",
+        "description",
+        "amount",
+        "sourceCode",
+    )
+    list_select_related = ("glAccount",)
+    search_fields = ("documentNo", "glAccount__no", "glAccount__name")
+    list_filter = ("sourceCode", "postingDate")
+    ordering = ("-id",)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        # Entries are append-only: balances and the API's ETags rely on it
+        return False
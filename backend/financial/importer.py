@@ -0,0 +1,194 @@
+"""
+Streaming chart-of-accounts importer.
+
+Records are parsed incrementally from JSON (the first array in the file,
+e.g. ``gl_account.json`` or ``{"accounts": [...]}``) or CSV, compared with
+the existing accounts loaded in one query, and written with
+``bulk_create``/``bulk_update`` in batches inside one transaction.
+"""
+
+import csv
+import json
+import time
+from pathlib import Path
+
+from django.db import transaction
+
+from core import autocomplete
+
+from .models import GLAccount
+
+DEFAULT_PATH = Path(__file__).resolve().parent / "gl_account.json"
+BATCH_SIZE = 1000
+READ_SIZE = 1 << 16
+
+FIELDS = (
+    "name",
+    "indentation",
+    "income_balance",
+    "accountcategory",
+    "debit_credit",
+    "accounttype",
+    "totaling",
+    "direct_posting",
+    "blocked",
+)
+
+_TRUE = {"1", "true", "yes", "y"}
+
+
+class ImportResult:
+    __slots__ = ("created", "updated", "unchanged", "skipped", "seconds")
+
+    def __init__(self):
+        self.created = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.skipped = 0
+        self.seconds = 0.0
+
+    @property
+    def total(self) -> int:
+        return self.created + self.updated + self.unchanged
+
+    @property
+    def rate(self) -> float:
+        """Records per second."""
+        return self.total / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.created} created, {self.updated} updated, "
+            f"{self.unchanged} unchanged, {self.skipped} skipped "
+            f"in {self.seconds:.2f}s ({self.rate:,.0f} records/s)"
+        )
+
+
+def iter_json_records(stream, read_size: int = READ_SIZE):
+    """Yield the items of the first JSON array in ``stream`` one at a time."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = -1
+    while position == -1:
+        chunk = stream.read(read_size)
+        if not chunk:
+            raise ValueError("No top-level array found.")
+        buffer += chunk
+        position = buffer.find("[")
+    buffer = buffer[position + 1 :]
+    eof = False
+    while True:
+        buffer = buffer.lstrip().lstrip(",").lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = stream.read(read_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        # A number may continue in the next chunk; only trust it with a
+        # delimiter after it
+        if end == len(buffer) and not eof:
+            chunk = stream.read(read_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def iter_csv_records(stream):
+    yield from csv.DictReader(stream)
+
+
+def _flag(value) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in _TRUE
+    return bool(value)
+
+
+def normalize(item) -> tuple:
+    """Return the record's field values in ``FIELDS`` order."""
+    return (
+        item.get("name") or "",
+        int(item.get("indentation") or 0),
+        item.get("income_balance") or None,
+        item.get("accountcategory") or None,
+        item.get("debit_credit") or None,
+        item.get("accounttype") or None,
+        item.get("totaling"),
+        _flag(item.get("direct_posting")),
+        _flag(item.get("blocked")),
+    )
+
+
+def import_records(
+    records, batch_size: int = BATCH_SIZE, progress=None
+) -> ImportResult:
+    result = ImportResult()
+    started = time.perf_counter()
+    with transaction.atomic():
+        existing = {
+            row[0]: row[1:] for row in GLAccount.objects.values_list("no", *FIELDS)
+        }
+        to_create = {}
+        to_update = {}
+        # Accounts already counted: a repeated ``no`` is written, not recounted
+        counted = set()
+
+        def flush():
+            GLAccount.objects.bulk_create(to_create.values(), batch_size=batch_size)
+            GLAccount.objects.bulk_update(
+                to_update.values(), FIELDS, batch_size=batch_size
+            )
+            to_create.clear()
+            to_update.clear()
+            if progress is not None:
+                progress(result.total)
+
+        for item in records:
+            no = str(item.get("no") or "").strip()
+            if not no:
+                result.skipped += 1
+                continue
+            values = normalize(item)
+            account = GLAccount(no=no, **dict(zip(FIELDS, values)))
+            first = no not in counted
+            counted.add(no)
+            if no in to_create or no not in existing:
+                to_create[no] = account
+                result.created += first
+            elif no in to_update or existing[no] != values:
+                to_update[no] = account
+                result.updated += first
+            else:
+                result.unchanged += first
+                continue
+            existing[no] = values
+            if len(to_create) + len(to_update) >= batch_size:
+                flush()
+        flush()
+    # bulk writes send no signals
+    autocomplete.invalidate("financial.GLAccount")
+    result.seconds = time.perf_counter() - started
+    return result
+
+
+def import_file(
+    path=DEFAULT_PATH, batch_size: int = BATCH_SIZE, progress=None
+) -> ImportResult:
+    """
+    Import a ``.json`` or ``.csv`` chart of accounts, calling
+    ``progress(records read)`` after each batch.
+    """
+    path = Path(path)
+    with path.open(encoding="utf-8", newline="") as stream:
+        if path.suffix.lower() == ".csv":
+            records = iter_csv_records(stream)
+        else:
+            records = iter_json_records(stream)
+        return import_records(records, batch_size, progress)
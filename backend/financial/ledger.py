@@ -0,0 +1,150 @@
+"""
+G/L entry posting with maintained balances.
+
+``post_entries`` writes ``GeneralLedgerEntry`` rows and, in the same
+transaction, adds their net effect to ``GLAccountBalance`` (one row per
+account) and ``GLAccountPeriodBalance`` (one row per account and month).
+Deltas are summed in memory first, so a posting touches each balance row
+once however many entries it has, and reading a balance is a primary-key
+lookup instead of a ``SUM`` over the ledger. Missing balance rows are
+inserted with conflicts ignored before the rows are locked, so concurrent
+first postings to an account wait for each other instead of failing.
+"""
+
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from core.profiling import stage
+
+from .models import (
+    GeneralJournalLine,
+    GeneralLedgerEntry,
+    GLAccountBalance,
+    GLAccountPeriodBalance,
+)
+
+ZERO = Decimal("0")
+INSERT_BATCH_SIZE = 1000
+
+
+def _add(totals, key, amount):
+    debit, credit = totals.get(key, (ZERO, ZERO))
+    if amount >= 0:
+        totals[key] = (debit + amount, credit)
+    else:
+        totals[key] = (debit, credit - amount)
+
+
+def _locked_rows(model, keys, load, new):
+    """
+    Lock the ``model`` rows of ``keys`` with ``load(keys)``, first inserting
+    the missing ones built by ``new(key)``. A row a concurrent posting inserts in
+    between is skipped and locked once that posting commits.
+    """
+    rows = load(keys)
+    missing = [key for key in keys if key not in rows]
+    if missing:
+        model.objects.bulk_create(
+            [new(key) for key in missing],
+            batch_size=INSERT_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+        rows.update(load(missing))
+    return rows
+
+
+def _apply_totals(totals):
+    rows = _locked_rows(
+        GLAccountBalance,
+        list(totals),
+        lambda accounts: GLAccountBalance.objects.select_for_update().in_bulk(accounts),
+        lambda account: GLAccountBalance(glAccount_id=account),
+    )
+    for account, (debit, credit) in totals.items():
+        row = rows[account]
+        row.debitAmount += debit
+        row.creditAmount += credit
+        row.balance = row.debitAmount - row.creditAmount
+    GLAccountBalance.objects.bulk_update(
+        rows.values(),
+        ["debitAmount", "creditAmount", "balance"],
+        batch_size=INSERT_BATCH_SIZE,
+    )
+
+
+def _period_rows(keys) -> dict:
+    accounts = {account for account, _ in keys}
+    periods = {period for _, period in keys}
+    return {
+        (row.glAccount_id, row.period): row
+        for row in GLAccountPeriodBalance.objects.select_for_update().filter(
+            glAccount_id__in=accounts, period__in=periods
+        )
+    }
+
+
+def _apply_period_totals(totals):
+    rows = _locked_rows(
+        GLAccountPeriodBalance,
+        list(totals),
+        _period_rows,
+        lambda key: GLAccountPeriodBalance(glAccount_id=key[0], period=key[1]),
+    )
+    for key, (debit, credit) in totals.items():
+        row = rows[key]
+        row.debitAmount += debit
+        row.creditAmount += credit
+        row.netChange = row.debitAmount - row.creditAmount
+    GLAccountPeriodBalance.objects.bulk_update(
+        [rows[key] for key in totals],
+        ["debitAmount", "creditAmount", "netChange"],
+        batch_size=INSERT_BATCH_SIZE,
+    )
+
+
+def post_entries(entries) -> list:
+    """
+    Insert unsaved ``GeneralLedgerEntry`` objects and update balances.
+    The entries must balance to zero.
+    """
+    entries = list(entries)
+    if sum((entry.amount for entry in entries), ZERO):
+        raise ValidationError("G/L entries do not balance.")
+    totals = {}
+    period_totals = {}
+    for entry in entries:
+        _add(totals, entry.glAccount_id, entry.amount)
+        period = entry.postingDate.replace(day=1)
+        _add(period_totals, (entry.glAccount_id, period), entry.amount)
+    with stage("gl.post", count=len(entries)), transaction.atomic():
+        GeneralLedgerEntry.objects.bulk_create(entries, batch_size=INSERT_BATCH_SIZE)
+        _apply_totals(totals)
+        _apply_period_totals(period_totals)
+    return entries
+
+
+def post_journal(document_no: str) -> list:
+    """Move a document's ``GeneralJournalLine`` rows into the ledger."""
+    with transaction.atomic():
+        lines = list(
+            GeneralJournalLine.objects.select_for_update().filter(
+                documentNo=document_no
+            )
+        )
+        if not lines:
+            raise ValidationError(f"Journal {document_no} has no lines.")
+        entries = post_entries(
+            GeneralLedgerEntry(
+                postingDate=line.postingDate,
+                documentNo=line.documentNo,
+                glAccount_id=line.glAccount_id,
+                description=line.description,
+                amount=line.amount,
+                sourceCode=line.sourceCode,
+            )
+            for line in lines
+        )
+        GeneralJournalLine.objects.filter(pk__in=[line.pk for line in lines]).delete()
+    return entries
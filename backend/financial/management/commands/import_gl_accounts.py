@@ -0,0 +1,28 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from financial.importer import BATCH_SIZE, DEFAULT_PATH, import_file
+
+
+class Command(BaseCommand):
+    help = "Import the chart of accounts from a JSON or CSV file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            default=str(DEFAULT_PATH),
+            help="JSON or CSV file (defaults to financial/gl_account.json).",
+        )
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        if not path.exists():
+            raise CommandError(f"File not found: {path}")
+        try:
+            result = import_file(path, batch_size=options["batch_size"])
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise CommandError(f"Failed to read {path}: {exc}")
+        self.stdout.write(self.style.SUCCESS(f"Imported GL Accounts: {result}."))
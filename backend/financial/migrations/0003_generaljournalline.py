@@ -0,0 +1,64 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("financial", "0002_currency"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GeneralJournalLine",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "documentNo",
+                    models.CharField(
+                        db_index=True, max_length=50, verbose_name="Document No."
+                    ),
+                ),
+                ("postingDate", models.DateField(verbose_name="Posting Date")),
+                ("description", models.CharField(blank=True, max_length=255)),
+                (
+                    "amount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        help_text="Positive for debit, negative for credit.",
+                        max_digits=16,
+                    ),
+                ),
+                (
+                    "sourceCode",
+                    models.CharField(
+                        blank=True, max_length=20, verbose_name="Source Code"
+                    ),
+                ),
+                (
+                    "glAccount",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="journalLines",
+                        to="financial.glaccount",
+                        verbose_name="G/L Account",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "General Journal Line",
+                "verbose_name_plural": "General Journal Lines",
+                "ordering": ["documentNo", "id"],
+            },
+        ),
+    ]
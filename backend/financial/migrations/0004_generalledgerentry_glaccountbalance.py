@@ -0,0 +1,173 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("financial", "0003_generaljournalline"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GLAccountBalance",
+            fields=[
+                (
+                    "glAccount",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="balanceTotal",
+                        serialize=False,
+                        to="financial.glaccount",
+                        verbose_name="G/L Account",
+                    ),
+                ),
+                (
+                    "debitAmount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=18,
+                        verbose_name="Debit Amount",
+                    ),
+                ),
+                (
+                    "creditAmount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=18,
+                        verbose_name="Credit Amount",
+                    ),
+                ),
+                (
+                    "balance",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=18),
+                ),
+            ],
+            options={
+                "verbose_name": "G/L Account Balance",
+                "verbose_name_plural": "G/L Account Balances",
+            },
+        ),
+        migrations.CreateModel(
+            name="GeneralLedgerEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("postingDate", models.DateField(verbose_name="Posting Date")),
+                (
+                    "documentNo",
+                    models.CharField(
+                        db_index=True, max_length=50, verbose_name="Document No."
+                    ),
+                ),
+                ("description", models.CharField(blank=True, max_length=255)),
+                (
+                    "amount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        help_text="Positive for debit, negative for credit.",
+                        max_digits=16,
+                    ),
+                ),
+                (
+                    "sourceCode",
+                    models.CharField(
+                        blank=True, max_length=20, verbose_name="Source Code"
+                    ),
+                ),
+                (
+                    "createdAt",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created At"),
+                ),
+                (
+                    "glAccount",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.PROTECT,
+                        related_name="ledgerEntries",
+                        to="financial.glaccount",
+                        verbose_name="G/L Account",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "G/L Entry",
+                "verbose_name_plural": "G/L Entries",
+                "ordering": ["id"],
+                "indexes": [
+                    models.Index(
+                        fields=["glAccount", "postingDate"],
+                        name="financial_g_glAccou_3a4854_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="GLAccountPeriodBalance",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("period", models.DateField(help_text="First day of the month.")),
+                (
+                    "debitAmount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=18,
+                        verbose_name="Debit Amount",
+                    ),
+                ),
+                (
+                    "creditAmount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=18,
+                        verbose_name="Credit Amount",
+                    ),
+                ),
+                (
+                    "netChange",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=18,
+                        verbose_name="Net Change",
+                    ),
+                ),
+                (
+                    "glAccount",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="periodBalances",
+                        to="financial.glaccount",
+                        verbose_name="G/L Account",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "G/L Account Period Balance",
+                "verbose_name_plural": "G/L Account Period Balances",
+                "ordering": ["glAccount", "period"],
+                "unique_together": {("glAccount", "period")},
+            },
+        ),
+    ]
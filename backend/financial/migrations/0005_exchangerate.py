@@ -0,0 +1,59 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:49
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("financial", "0004_generalledgerentry_glaccountbalance"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ExchangeRate",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("startingDate", models.DateField(verbose_name="Starting Date")),
+                (
+                    "rate",
+                    models.DecimalField(
+                        decimal_places=6,
+                        help_text="Local currency amount for one unit of the currency.",
+                        max_digits=18,
+                        validators=[
+                            django.core.validators.MinValueValidator(
+                                Decimal("0.000001")
+                            )
+                        ],
+                        verbose_name="Rate (LCY)",
+                    ),
+                ),
+                (
+                    "currency",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="exchangeRates",
+                        to="financial.currency",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Exchange Rate",
+                "verbose_name_plural": "Exchange Rates",
+                "ordering": ["currency", "startingDate"],
+                "unique_together": {("currency", "startingDate")},
+            },
+        ),
+    ]
@@ -1,3 +1,6 @@
+from decimal import Decimal
+
+from django.core.validators import MinValueValidator
 from django.db import models
 
 from . import enums
@@ -16,6 +19,32 @@ class Currency(models.Model):
         return f"{self.code} - {self.name}"
 
 
+class ExchangeRate(models.Model):
+    currency = models.ForeignKey(
+        "financial.Currency",
+        on_delete=models.CASCADE,
+        to_field="code",
+        related_name="exchangeRates",
+    )
+    startingDate = models.DateField(verbose_name="Starting Date")
+    rate = models.DecimalField(
+        max_digits=18,
+        decimal_places=6,
+        verbose_name="Rate (LCY)",
+        validators=[MinValueValidator(Decimal("0.000001"))],
+        help_text="Local currency amount for one unit of the currency.",
+    )
+
+    class Meta:
+        verbose_name = "Exchange Rate"
+        verbose_name_plural = "Exchange Rates"
+        ordering = ["currency", "startingDate"]
+        unique_together = (("currency", "startingDate"),)
+
+    def __str__(self) -> str:
+        return f"{self.currency_id} {self.startingDate}: {self.rate}"
+
+
 class GLAccount(models.Model):
     no = models.CharField(
         verbose_name="No.",
@@ -69,16 +98,132 @@ class GLAccount(models.Model):
     def __str__(self) -> str:
         return f"{self.no} - {self.name}"
 
+    def clean(self):
+        from django.core.exceptions import ValidationError
+
+        from .totaling import parse_totaling
+
+        super().clean()
+        try:
+            parse_totaling(self.totaling)
+        except ValidationError as exc:
+            raise ValidationError({"totaling": exc.messages})
+
     @property
     def balance(self):
-        # Placeholder: depends on GeneralLedgerEntry model not defined here
+        # Maintained by ledger.post_entries; select_related("balanceTotal") to
+        # avoid a query per account
         try:
-            from .models_ledger import GeneralLedgerEntry  # type: ignore
-        except Exception:
-            return 0.0
-        return (
-            GeneralLedgerEntry.objects.filter(gl_account=self.no).aggregate(
-                models.Sum("amount")
-            )["amount__sum"]
-            or 0.00
-        )
+            return self.balanceTotal.balance
+        except GLAccountBalance.DoesNotExist:
+            return Decimal("0")
+
+
+class GeneralJournalLine(models.Model):
+    documentNo = models.CharField(
+        max_length=50, db_index=True, verbose_name="Document No."
+    )
+    postingDate = models.DateField(verbose_name="Posting Date")
+    glAccount = models.ForeignKey(
+        "financial.GLAccount",
+        on_delete=models.PROTECT,
+        related_name="journalLines",
+        verbose_name="G/L Account",
+    )
+    description = models.CharField(max_length=255, blank=True)
+    amount = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        help_text="Positive for debit, negative for credit.",
+    )
+    sourceCode = models.CharField(max_length=20, blank=True, verbose_name="Source Code")
+
+    class Meta:
+        verbose_name = "General Journal Line"
+        verbose_name_plural = "General Journal Lines"
+        ordering = ["documentNo", "id"]
+
+    def __str__(self) -> str:
+        return f"{self.documentNo} {self.glAccount_id} {self.amount}"
+
+
+class GeneralLedgerEntry(models.Model):
+    postingDate = models.DateField(verbose_name="Posting Date")
+    documentNo = models.CharField(
+        max_length=50, db_index=True, verbose_name="Document No."
+    )
+    glAccount = models.ForeignKey(
+        "financial.GLAccount",
+        on_delete=models.PROTECT,
+        related_name="ledgerEntries",
+        verbose_name="G/L Account",
+    )
+    description = models.CharField(max_length=255, blank=True)
+    amount = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        help_text="Positive for debit, negative for credit.",
+    )
+    sourceCode = models.CharField(max_length=20, blank=True, verbose_name="Source Code")
+    createdAt = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+
+    class Meta:
+        verbose_name = "G/L Entry"
+        verbose_name_plural = "G/L Entries"
+        ordering = ["id"]
+        indexes = [models.Index(fields=["glAccount", "postingDate"])]
+
+    def __str__(self) -> str:
+        return f"{self.pk}: {self.glAccount_id} {self.amount}"
+
+
+class GLAccountBalance(models.Model):
+    glAccount = models.OneToOneField(
+        "financial.GLAccount",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="balanceTotal",
+        verbose_name="G/L Account",
+    )
+    debitAmount = models.DecimalField(
+        max_digits=18, decimal_places=2, default=0, verbose_name="Debit Amount"
+    )
+    creditAmount = models.DecimalField(
+        max_digits=18, decimal_places=2, default=0, verbose_name="Credit Amount"
+    )
+    balance = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name = "G/L Account Balance"
+        verbose_name_plural = "G/L Account Balances"
+
+    def __str__(self) -> str:
+        return f"{self.glAccount_id}: {self.balance}"
+
+
+class GLAccountPeriodBalance(models.Model):
+    glAccount = models.ForeignKey(
+        "financial.GLAccount",
+        on_delete=models.CASCADE,
+        related_name="periodBalances",
+        verbose_name="G/L Account",
+    )
+    period = models.DateField(help_text="First day of the month.")
+    debitAmount = models.DecimalField(
+        max_digits=18, decimal_places=2, default=0, verbose_name="Debit Amount"
+    )
+    creditAmount = models.DecimalField(
+        max_digits=18, decimal_places=2, default=0, verbose_name="Credit Amount"
+    )
+    netChange = models.DecimalField(
+        max_digits=18, decimal_places=2, default=0, verbose_name="Net Change"
+    )
+
+    class Meta:
+        verbose_name = "G/L Account Period Balance"
+        verbose_name_plural = "G/L Account Period Balances"
+        ordering = ["glAccount", "period"]
+        unique_together = (("glAccount", "period"),)
+
+    def __str__(self) -> str:
+        return f"{self.glAccount_id} {self.period:%Y-%m}: {self.netChange}"
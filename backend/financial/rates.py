@@ -0,0 +1,148 @@
+"""
+Exchange rate index and batch currency conversion.
+
+``RateIndex`` loads every ``ExchangeRate`` with one query into parallel
+tuples of starting dates and rates per currency, so the rate of a currency
+on a date is a bisection. ``get_rates`` keeps one index per process until
+an exchange rate is saved or deleted (see ``signals.py``) in any process
+(``core.caches``).
+
+Rates are local currency (LCY) per unit of the currency. A blank currency,
+or a currency without any exchange rates, is the local currency (rate 1);
+a date before a currency's first rate is an error. ``to_lcy``/``from_lcy``
+convert a whole sequence of amounts (Decimals, or a float numpy array) for
+one currency with a single rate lookup.
+"""
+
+import threading
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+
+from core.caches import SharedVersion
+
+from .models import ExchangeRate
+
+ONE = Decimal("1")
+
+
+class RateIndex:
+    __slots__ = ("dates", "rates")
+
+    def __init__(self, rows=()):
+        """``rows`` is an iterable of ``(currency, startingDate, rate)``."""
+        by_currency = {}
+        for currency, starting, rate in sorted(rows):
+            by_currency.setdefault(currency, []).append((starting, rate))
+        self.dates = {
+            currency: tuple(starting for starting, _ in entries)
+            for currency, entries in by_currency.items()
+        }
+        self.rates = {
+            currency: tuple(rate for _, rate in entries)
+            for currency, entries in by_currency.items()
+        }
+
+    def __repr__(self) -> str:
+        return f"<RateIndex: {len(self.dates)} currencies>"
+
+    def __contains__(self, currency) -> bool:
+        return currency in self.dates
+
+    @classmethod
+    def load(cls) -> "RateIndex":
+        return cls(
+            ExchangeRate.objects.values_list("currency_id", "startingDate", "rate")
+        )
+
+    def _index(self, currency, on) -> int:
+        dates = self.dates[currency]
+        if on is None:
+            return len(dates) - 1
+        index = bisect_right(dates, on) - 1
+        if index < 0:
+            raise ValidationError(f"No {currency} exchange rate on {on}.")
+        return index
+
+    def starting(self, currency, on=None):
+        """Starting date of the rate in effect, or ``None`` for LCY."""
+        if currency not in self.dates:
+            return None
+        return self.dates[currency][self._index(currency, on)]
+
+    def rate(self, currency, on=None) -> Decimal:
+        """LCY per unit of ``currency`` on ``on`` (the latest rate if ``None``)."""
+        if currency not in self.dates:
+            return ONE
+        return self.rates[currency][self._index(currency, on)]
+
+    def key(self, currencies, on=None) -> tuple:
+        """
+        Identifies the rates of ``currencies`` in effect on ``on``: equal keys
+        mean equal conversions.
+        """
+        return tuple(
+            (currency, self.starting(currency, on))
+            for currency in sorted(currencies)
+            if currency in self.dates
+        )
+
+    def to_lcy(self, currency, amounts, on=None):
+        """Convert ``amounts`` in ``currency`` to LCY."""
+        return _scale(amounts, self.rate(currency, on))
+
+    def from_lcy(self, currency, amounts, on=None):
+        """Convert LCY ``amounts`` to ``currency``."""
+        rate = self.rate(currency, on)
+        if rate == ONE:
+            return _scale(amounts, ONE)
+        if hasattr(amounts, "dtype"):
+            return amounts / float(rate)
+        return [amount / rate for amount in amounts]
+
+
+def _scale(amounts, rate: Decimal):
+    if hasattr(amounts, "dtype"):
+        return amounts * float(rate) if rate != ONE else amounts.copy()
+    if rate == ONE:
+        return list(amounts)
+    return [amount * rate for amount in amounts]
+
+
+_lock = threading.Lock()
+_version = 0
+_index = None
+_shared = SharedVersion("financial.rates")
+
+
+def get_rates() -> RateIndex:
+    """Return the cached rate index, loading it if needed."""
+    global _index
+    if _shared.changed():
+        _clear()
+    index = _index
+    if index is not None:
+        return index
+    version = _version
+    index = RateIndex.load()
+    with _lock:
+        if version == _version:
+            _index = index
+    return index
+
+
+def invalidate():
+    """
+    Drop the cached index, here and in other processes; an index being
+    loaded is not cached.
+    """
+    _clear()
+    _shared.bump()
+
+
+def _clear():
+    global _version, _index
+    with _lock:
+        _version += 1
+        _index = None
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete, post_save
+
+from . import rates
+from .models import ExchangeRate
+
+
+def invalidate_rates(sender, **kwargs):
+    rates.invalidate()
+
+
+post_save.connect(invalidate_rates, sender=ExchangeRate)
+post_delete.connect(invalidate_rates, sender=ExchangeRate)
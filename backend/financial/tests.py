@@ -0,0 +1,269 @@
+import datetime
+import io
+import json
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, TestCase
+
+from .importer import import_records, iter_json_records
+from .ledger import post_entries, post_journal
+from .models import (
+    GeneralJournalLine,
+    GeneralLedgerEntry,
+    GLAccount,
+    GLAccountBalance,
+    GLAccountPeriodBalance,
+)
+from .totaling import parse_totaling, trial_balance
+
+
+def entry(account, amount, document="D1", date=datetime.date(2025, 1, 15)):
+    return GeneralLedgerEntry(
+        postingDate=date,
+        documentNo=document,
+        glAccount_id=account,
+        amount=Decimal(amount),
+    )
+
+
+class GeneralLedgerEntryApiTests(TestCase):
+    """Cursor pages and ETags of ``/api/gl-entries/``."""
+
+    url = "/api/gl-entries/"
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        GLAccount.objects.create(no="1000", name="Cash")
+        GLAccount.objects.create(no="4000", name="Sales")
+        for index in range(1, 4):
+            post_entries([entry("1000", index), entry("4000", -index)])
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_cursor_pages_cover_every_entry_once(self):
+        ids = []
+        params = {"limit": 4}
+        while True:
+            data = self.client.get(self.url, params).json()
+            self.assertLessEqual(len(data["results"]), 4)
+            ids += [row["id"] for row in data["results"]]
+            if data["next"] is None:
+                break
+            params["cursor"] = data["next"]
+        self.assertEqual(
+            ids, list(GeneralLedgerEntry.objects.values_list("pk", flat=True))
+        )
+
+    def test_etag_answers_304_until_an_entry_is_posted(self):
+        response = self.client.get(self.url)
+        etag = response["ETag"]
+        response = self.client.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        post_entries([entry("1000", 5, "D2"), entry("4000", -5, "D2")])
+        response = self.client.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.json()["results"]), 8)
+
+    def test_entries_cannot_be_deleted_in_the_admin(self):
+        pk = GeneralLedgerEntry.objects.first().pk
+        url = f"/admin/financial/generalledgerentry/{pk}/delete/"
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertTrue(GeneralLedgerEntry.objects.filter(pk=pk).exists())
+
+
+class ImporterTests(TestCase):
+    """The streaming chart-of-accounts importer."""
+
+    def test_counts_with_small_reads_and_repeated_accounts(self):
+        GLAccount.objects.create(no="1000", name="Cash")
+        GLAccount.objects.create(no="2000", name="Bank")
+        records = [
+            {"no": "1000", "name": "Cash"},
+            {"no": "2000", "name": "Bank account", "indentation": 1},
+            {"no": "3000", "name": "Sales"},
+            {"no": "2000", "name": "Bank accounts", "indentation": 1},
+            {"no": ""},
+            {"no": "3000", "name": "Sales income", "blocked": "yes"},
+            {"no": "4000", "name": "Costs"},
+            {"no": "1000", "name": "Cash"},
+        ]
+        stream = io.StringIO(json.dumps({"accounts": records}))
+        result = import_records(iter_json_records(stream, read_size=7), batch_size=2)
+        self.assertEqual(
+            (result.created, result.updated, result.unchanged, result.skipped),
+            (2, 1, 1, 1),
+        )
+        self.assertEqual(
+            list(GLAccount.objects.values_list("no", "name", "blocked")),
+            [
+                ("1000", "Cash", False),
+                ("2000", "Bank accounts", False),
+                ("3000", "Sales income", True),
+                ("4000", "Costs", False),
+            ],
+        )
+
+
+class LedgerTests(TestCase):
+    """Balances maintained by ``post_entries``/``post_journal``."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for no, name in (("1000", "Cash"), ("4000", "Sales"), ("6000", "Costs")):
+            GLAccount.objects.create(no=no, name=name)
+
+    def journal(self, document, date, lines):
+        GeneralJournalLine.objects.bulk_create(
+            GeneralJournalLine(
+                documentNo=document,
+                postingDate=date,
+                glAccount_id=account,
+                amount=Decimal(amount),
+            )
+            for account, amount in lines
+        )
+
+    def test_balances_after_two_documents(self):
+        self.journal(
+            "S1",
+            datetime.date(2025, 1, 10),
+            [("1000", "100"), ("1000", "50"), ("4000", "-150")],
+        )
+        self.journal("C1", datetime.date(2025, 2, 3), [("6000", "40"), ("1000", "-40")])
+        post_journal("S1")
+        post_journal("C1")
+
+        self.assertFalse(GeneralJournalLine.objects.exists())
+        self.assertEqual(GeneralLedgerEntry.objects.count(), 5)
+        self.assertEqual(
+            {
+                row.glAccount_id: (row.debitAmount, row.creditAmount, row.balance)
+                for row in GLAccountBalance.objects.all()
+            },
+            {
+                "1000": (Decimal("150"), Decimal("40"), Decimal("110")),
+                "4000": (Decimal("0"), Decimal("150"), Decimal("-150")),
+                "6000": (Decimal("40"), Decimal("0"), Decimal("40")),
+            },
+        )
+        january, february = datetime.date(2025, 1, 1), datetime.date(2025, 2, 1)
+        self.assertEqual(
+            {
+                (row.glAccount_id, row.period): row.netChange
+                for row in GLAccountPeriodBalance.objects.all()
+            },
+            {
+                ("1000", january): Decimal("150"),
+                ("4000", january): Decimal("-150"),
+                ("1000", february): Decimal("-40"),
+                ("6000", february): Decimal("40"),
+            },
+        )
+        balances = {
+            account.no: account.balance
+            for account in GLAccount.objects.select_related("balanceTotal")
+        }
+        self.assertEqual(
+            balances,
+            {"1000": Decimal("110"), "4000": Decimal("-150"), "6000": Decimal("40")},
+        )
+
+    def test_unbalanced_journal_writes_nothing(self):
+        self.journal(
+            "BAD", datetime.date(2025, 1, 10), [("1000", "100"), ("4000", "-99")]
+        )
+        with self.assertRaises(ValidationError):
+            post_journal("BAD")
+        self.assertEqual(GeneralJournalLine.objects.count(), 2)
+        self.assertFalse(GeneralLedgerEntry.objects.exists())
+        self.assertFalse(GLAccountBalance.objects.exists())
+        self.assertFalse(GLAccountPeriodBalance.objects.exists())
+        self.assertEqual(GLAccount.objects.get(no="1000").balance, Decimal("0"))
+
+
+class TotalingParserTests(SimpleTestCase):
+    def test_overlapping_ranges_are_merged(self):
+        self.assertEqual(
+            parse_totaling("1000..1999 | 1500..2500|2100|3000..3999|3500"),
+            [("1000", "2500"), ("3000", "3999")],
+        )
+
+    def test_open_ended_ranges(self):
+        self.assertEqual(
+            parse_totaling("5000..|..0999|6000"), [(None, "0999"), ("5000", None)]
+        )
+        self.assertEqual(parse_totaling("..|1000"), [(None, None)])
+        self.assertEqual(parse_totaling("  "), [])
+
+    def test_rejected_filters(self):
+        for text in ("1000||2000", "1000&2000", "<1000", "1*", "2000..1000", "1..2..3"):
+            with self.subTest(text=text):
+                with self.assertRaises(ValidationError):
+                    parse_totaling(text)
+
+
+class TrialBalanceTests(TestCase):
+    """Total accounts summed from posting balances with prefix sums."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for no, type, totaling in [
+            ("1000", "Begin-Total", None),
+            ("1100", "Posting", None),
+            ("1200", "Posting", None),
+            ("1999", "End-Total", None),
+            ("2000", "Heading", None),
+            ("2100", "Posting", None),
+            ("2200", "Posting", None),
+            ("2999", "End-Total", "2100..2150|2100"),
+            ("8000", "Total", "1100..1200|1150..2100"),
+            ("9000", "Total", "..1150|2200.."),
+            ("9500", "Total", None),
+        ]:
+            GLAccount.objects.create(
+                no=no, name=no, accounttype=type, totaling=totaling
+            )
+        post_entries(
+            [
+                entry("1100", "100"),
+                entry("1200", "20"),
+                entry("2100", "3"),
+                entry("2200", "-123", date=datetime.date(2025, 2, 1)),
+            ]
+        )
+
+    def amounts(self, **dates):
+        return {account.no: amount for account, amount in trial_balance(**dates)}
+
+    def test_totals(self):
+        self.assertEqual(
+            self.amounts(),
+            {
+                "1000": None,
+                "1100": Decimal("100"),
+                "1200": Decimal("20"),
+                # End-Total without a filter: from its Begin-Total
+                "1999": Decimal("120"),
+                "2000": None,
+                "2100": Decimal("3"),
+                "2200": Decimal("-123"),
+                "2999": Decimal("3"),
+                # Overlapping ranges count each account once
+                "8000": Decimal("123"),
+                "9000": Decimal("-23"),
+                "9500": Decimal("0"),
+            },
+        )
+
+    def test_totals_by_period(self):
+        amounts = self.amounts(date_to=datetime.date(2025, 1, 31))
+        self.assertEqual(
+            (amounts["2200"], amounts["8000"], amounts["9000"]),
+            (Decimal("0"), Decimal("123"), Decimal("100")),
+        )
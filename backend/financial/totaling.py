@@ -0,0 +1,158 @@
+"""
+Totaling filters and trial balance.
+
+``GLAccount.totaling`` holds a filter such as ``1000..1999|2100`` or
+``..0999|5000..``. It is compiled into a sorted list of disjoint
+``(low, high)`` intervals over account numbers (compared as codes, i.e. as
+strings; ``None`` for an open end). An End-Total without a filter totals
+everything from its matching Begin-Total.
+
+The trial balance loads posting-account balances once, sorts them by
+account number and builds prefix sums, so each total account costs two
+bisections per interval instead of a range query.
+"""
+
+from bisect import bisect_left, bisect_right
+from decimal import Decimal
+from itertools import accumulate
+
+from django.core.exceptions import ValidationError
+from django.db.models import Sum
+
+from . import enums
+from .models import GLAccount, GLAccountBalance, GLAccountPeriodBalance
+
+ZERO = Decimal("0")
+POSTING = enums.G_L_Account_Type.POSTING.value
+TOTAL_TYPES = {
+    enums.G_L_Account_Type.TOTAL.value,
+    enums.G_L_Account_Type.END_TOTAL.value,
+}
+
+
+def _interval_key(interval):
+    low, high = interval
+    return ("" if low is None else low, high is not None, high or "")
+
+
+def parse_totaling(text: str | None) -> list:
+    """Compile a totaling filter into sorted, merged ``(low, high)`` intervals."""
+    if not text or not text.strip():
+        return []
+    intervals = []
+    for part in text.split("|"):
+        part = part.strip()
+        if not part:
+            raise ValidationError(f"Empty term in totaling filter '{text}'.")
+        if any(ch in part for ch in "&<>=*()"):
+            raise ValidationError(
+                f"Unsupported totaling term '{part}'; use ranges and '|' only."
+            )
+        if ".." in part:
+            low, _, high = part.partition("..")
+            low, high = low.strip() or None, high.strip() or None
+            if ".." in (high or ""):
+                raise ValidationError(f"Invalid range '{part}'.")
+            if low is not None and high is not None and low > high:
+                raise ValidationError(f"Range '{part}' runs backwards.")
+        else:
+            low = high = part
+        intervals.append((low, high))
+
+    intervals.sort(key=_interval_key)
+    merged = [intervals[0]]
+    for low, high in intervals[1:]:
+        last_low, last_high = merged[-1]
+        if last_high is None or low is None or low <= last_high:
+            if last_high is not None and (high is None or high > last_high):
+                merged[-1] = (last_low, high)
+        else:
+            merged.append((low, high))
+    return merged
+
+
+def totaling_intervals(accounts) -> dict:
+    """
+    Return ``{account no: intervals}`` for the total accounts among
+    ``accounts`` (``(no, accounttype, totaling)`` tuples sorted by ``no``).
+    """
+    result = {}
+    begins = []
+    for no, accounttype, totaling in accounts:
+        if accounttype == enums.G_L_Account_Type.BEGIN_TOTAL.value:
+            begins.append(no)
+            continue
+        if accounttype not in TOTAL_TYPES:
+            continue
+        begin = None
+        if accounttype == enums.G_L_Account_Type.END_TOTAL.value and begins:
+            begin = begins.pop()
+        if totaling and totaling.strip():
+            result[no] = parse_totaling(totaling)
+        elif begin is not None:
+            result[no] = [(begin, no)]
+        else:
+            result[no] = []
+    return result
+
+
+class PrefixIndex:
+    """Sorted account numbers with prefix sums of their balances."""
+
+    __slots__ = ("keys", "sums")
+
+    def __init__(self, balances: dict):
+        self.keys = sorted(balances)
+        self.sums = [ZERO, *accumulate(balances[key] for key in self.keys)]
+
+    def total(self, intervals) -> Decimal:
+        amount = ZERO
+        for low, high in intervals:
+            start = 0 if low is None else bisect_left(self.keys, low)
+            end = len(self.keys) if high is None else bisect_right(self.keys, high)
+            if end > start:
+                amount += self.sums[end] - self.sums[start]
+        return amount
+
+
+def posting_balances(date_from=None, date_to=None) -> dict:
+    """``{account no: balance}`` for posting accounts, optionally by period."""
+    if date_from is None and date_to is None:
+        queryset = GLAccountBalance.objects.filter(
+            glAccount__accounttype=POSTING
+        ).values_list("glAccount_id", "balance")
+        return dict(queryset)
+    queryset = GLAccountPeriodBalance.objects.filter(glAccount__accounttype=POSTING)
+    if date_from is not None:
+        queryset = queryset.filter(period__gte=date_from.replace(day=1))
+    if date_to is not None:
+        queryset = queryset.filter(period__lte=date_to)
+    return dict(
+        queryset.values("glAccount_id")
+        .annotate(total=Sum("netChange"))
+        .values_list("glAccount_id", "total")
+    )
+
+
+def trial_balance(date_from=None, date_to=None) -> list:
+    """
+    Return ``[(account, amount), ...]`` for every account in number order.
+    Posting accounts show their own balance, total accounts the sum of the
+    posting accounts their totaling covers, headings ``None``.
+    """
+    accounts = list(GLAccount.objects.order_by("no"))
+    balances = posting_balances(date_from, date_to)
+    index = PrefixIndex(balances)
+    intervals = totaling_intervals(
+        (account.no, account.accounttype, account.totaling) for account in accounts
+    )
+    rows = []
+    for account in accounts:
+        if account.no in intervals:
+            amount = index.total(intervals[account.no])
+        elif account.accounttype == POSTING:
+            amount = balances.get(account.no, ZERO)
+        else:
+            amount = None
+        rows.append((account, amount))
+    return rows
@@ -0,0 +1,40 @@
+from django.db.models import Max
+
+from core.api import ReadEndpoint
+
+from .models import GeneralLedgerEntry
+
+
+class GeneralLedgerEntryListView(ReadEndpoint):
+    model = GeneralLedgerEntry
+    fields = {
+        "id": "pk",
+        "postingDate": "postingDate",
+        "documentNo": "documentNo",
+        "glAccount": "glAccount_id",
+        "glAccountName": "glAccount__name",
+        "description": "description",
+        "amount": "amount",
+        "sourceCode": "sourceCode",
+        "createdAt": "createdAt",
+    }
+    default_fields = (
+        "id",
+        "postingDate",
+        "documentNo",
+        "glAccount",
+        "description",
+        "amount",
+    )
+    filters = {
+        "glAccount": "glAccount",
+        "documentNo": "documentNo",
+        "sourceCode": "sourceCode",
+        "from": "postingDate__gte",
+        "to": "postingDate__lte",
+    }
+
+    def get_version(self, request, queryset):
+        # Entries are only ever appended (see ledger.post_entries); the admin
+        # cannot delete them
+        return queryset.aggregate(last=Max("pk"))["last"]
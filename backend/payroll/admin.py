@@ -1,6 +1,19 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.core.exceptions import ValidationError
+from django.http import Http404, JsonResponse
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
 
-from .models import Payroll, SalaryScale, SalaryScaleStep
+from .models import (
+    Job,
+    Payroll,
+    PayrollRun,
+    PayrollRunLine,
+    SalaryScale,
+    SalaryScaleStep,
+    SalaryScaleStepAmount,
+)
 
 
 @admin.register(Payroll)
@@ -19,10 +32,245 @@ class SalaryScaleAdmin(admin.ModelAdmin):
     ordering = ("code",)
 
 
+class SalaryScaleStepAmountInline(admin.TabularInline):
+    model = SalaryScaleStepAmount
+    extra = 0
+    fields = ("effectiveDate", "amount")
+    ordering = ("effectiveDate",)
+
+
 @admin.register(SalaryScaleStep)
 class SalaryScaleStepAdmin(admin.ModelAdmin):
     list_display = ("code", "scale", "description", "amount", "payrollCode")
+    list_select_related = ("scale", "payrollCode")
     search_fields = ("code", "scale__code", "description", "payrollCode__code")
     list_filter = ("scale", "payrollCode")
     autocomplete_fields = ("scale", "payrollCode")
     ordering = ("scale__code", "code")
+    inlines = [SalaryScaleStepAmountInline]
+
+
+@admin.register(PayrollRun)
+class PayrollRunAdmin(admin.ModelAdmin):
+    list_display = (
+        "payrollCode",
+        "period",
+        "description",
+        "status",
+        "employeeCount",
+        "lineCount",
+        "startedAt",
+        "finishedAt",
+    )
+    search_fields = ("payrollCode__code", "description")
+    list_filter = ("status", "payrollCode")
+    autocomplete_fields = ("payrollCode",)
+    ordering = ("payrollCode", "-period")
+    readonly_fields = (
+        "status",
+        "employeeCount",
+        "lineCount",
+        "startedAt",
+        "finishedAt",
+        "profile_summary",
+    )
+    actions = [
+        "calculate_runs",
+        "profile_runs",
+        "recalculate_changed",
+        "post_runs",
+        "reopen_runs",
+    ]
+
+    def _enqueue(self, request, kind, queryset, **arguments):
+        """Queue a ``kind`` job per run that passes the job's status check."""
+        from .jobs import enqueue
+
+        for run in queryset.select_related("payrollCode"):
+            try:
+                if kind == "post":
+                    run.ensure_calculated()
+                else:
+                    run.ensure_editable()
+            except ValidationError as exc:
+                self.message_user(
+                    request, "; ".join(exc.messages), level=messages.ERROR
+                )
+                continue
+            job = enqueue(kind, request.user, run=run.pk, **arguments)
+            url = reverse("admin:payroll_job_change", args=[job.pk])
+            self.message_user(
+                request,
+                format_html('{}: queued as <a href="{}">job {}</a>.', run, url, job.pk),
+                level=messages.SUCCESS,
+            )
+
+    @admin.action(description="Calculate selected runs in the background")
+    def calculate_runs(self, request, queryset):
+        self._enqueue(request, "calculate", queryset)
+
+    @admin.action(description="Calculate selected runs with profiling")
+    def profile_runs(self, request, queryset):
+        self._enqueue(request, "calculate", queryset, profile=True)
+
+    @admin.display(description="Profile")
+    def profile_summary(self, obj):
+        from core.profiling import summary
+
+        if not obj.profile:
+            return "-"
+        url = reverse("admin:payroll_payrollrun_profile", args=[obj.pk])
+        return format_html(
+            '{}<a href="{}">Download JSON</a>',
+            format_html_join(
+                "",
+                "<p><strong>{}</strong> ({})</p><pre>{}</pre>",
+                (
+                    (operation, profile.get("profiledAt", ""), summary(profile))
+                    for operation, profile in obj.profile.items()
+                ),
+            ),
+            url,
+        )
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                "<path:object_id>/profile/",
+                self.admin_site.admin_view(self.profile_view),
+                name="payroll_payrollrun_profile",
+            ),
+        ]
+        return custom_urls + urls
+
+    def profile_view(self, request, object_id):
+        run = self.get_object(request, object_id)
+        if run is None or not self.has_view_permission(request, run):
+            raise Http404
+        response = JsonResponse(run.profile or {})
+        response["Content-Disposition"] = (
+            f'attachment; filename="payroll-run-{run.pk}-profile.json"'
+        )
+        return response
+
+    @admin.action(description="Recalculate changed employees")
+    def recalculate_changed(self, request, queryset):
+        self._enqueue(request, "calculate", queryset, incremental=True)
+
+    @admin.action(description="Post selected runs to the G/L")
+    def post_runs(self, request, queryset):
+        self._enqueue(request, "post", queryset)
+
+    @admin.action(description="Reopen selected runs stuck in Running")
+    def reopen_runs(self, request, queryset):
+        """
+        Mark runs left Running by a killed process as Failed so they can be
+        recalculated. Runs a job is still working on are left alone.
+        """
+        from .jobs import busy_run_ids
+
+        stuck = queryset.filter(status="Running")
+        busy_ids = busy_run_ids()
+        busy = stuck.filter(pk__in=busy_ids).count()
+        count = stuck.exclude(pk__in=busy_ids).update(
+            status="Failed", finishedAt=timezone.now()
+        )
+        self.message_user(request, f"Reopened {count} runs.", level=messages.SUCCESS)
+        if busy:
+            self.message_user(
+                request,
+                f"{busy} runs still have a running job and were left Running.",
+                level=messages.WARNING,
+            )
+
+
+@admin.register(PayrollRunLine)
+class PayrollRunLineAdmin(admin.ModelAdmin):
+    list_display = ("run", "employee", "edDefinition", "amount")
+    search_fields = ("employee__employeeNo", "edDefinition__edCode")
+    list_filter = ("run",)
+    raw_id_fields = ("run", "employee")
+    autocomplete_fields = ("edDefinition",)
+    ordering = ("run", "employee", "edDefinition")
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    change_form_template = "admin/payroll/job/change_form.html"
+    list_display = (
+        "id",
+        "kind",
+        "status",
+        "progress_display",
+        "message",
+        "createdBy",
+        "createdAt",
+        "startedAt",
+        "finishedAt",
+    )
+    list_select_related = ("createdBy",)
+    list_filter = ("status", "kind")
+    search_fields = ("message",)
+    ordering = ("-id",)
+    readonly_fields = (
+        "kind",
+        "arguments",
+        "status",
+        "done",
+        "total",
+        "message",
+        "error",
+        "timings",
+        "worker",
+        "createdBy",
+        "createdAt",
+        "startedAt",
+        "finishedAt",
+        "heartbeatAt",
+    )
+    actions = ["requeue"]
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.display(description="Progress")
+    def progress_display(self, obj):
+        if obj.total:
+            return f"{obj.done}/{obj.total}"
+        return obj.done or ""
+
+    @admin.action(description="Requeue selected failed jobs")
+    def requeue(self, request, queryset):
+        count = queryset.filter(status="Failed").update(
+            status="Queued",
+            done=0,
+            total=None,
+            message="",
+            error="",
+            timings=[],
+            worker="",
+            startedAt=None,
+            finishedAt=None,
+            heartbeatAt=None,
+        )
+        self.message_user(request, f"Requeued {count} jobs.", level=messages.SUCCESS)
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                "<path:object_id>/progress/",
+                self.admin_site.admin_view(self.progress_view),
+                name="payroll_job_progress",
+            ),
+        ]
+        return custom_urls + urls
+
+    def progress_view(self, request, object_id):
+        from .jobs import job_progress
+
+        job = self.get_object(request, object_id)
+        if job is None or not self.has_view_permission(request, job):
+            raise Http404
+        return JsonResponse(job_progress(job))
@@ -0,0 +1,453 @@
+"""
+Payroll benchmarks on synthetic data.
+
+``generate`` builds a self-contained payroll: EDs, a PAYE ``Lookup`` with
+``brackets`` brackets, a salary scale, ``schemes`` calculation schemes of
+``depth`` allowance lines each (plus gross, PAYE, a capped NSSF line and
+net), posting and payslip setup, and ``employees`` employees spread over
+the schemes, half on the scale and half on fixed pay. Data is random but
+seeded, so the same arguments always build the same payroll.
+
+``run_benchmark`` times the pipeline stages on it:
+
+* ``compile``: building the setup snapshot, i.e. compiling every scheme;
+* ``evaluate_employee``: ``CompiledScheme.evaluate`` one employee at a time;
+* ``evaluate_batch``: ``evaluate_batch`` over all employees of each scheme;
+* ``run``: ``execute_run``, memoized evaluation and line writes included;
+* ``payslips``: grouping the run lines into payslip texts;
+* ``posting``: ``post_run``.
+
+Each stage reports seconds, seconds per employee and the number of queries
+issued by this process. Read-only stages are repeated and the best time
+kept. ``compare`` checks results against a baseline from an earlier release.
+``manage.py benchmark_payroll`` runs it all in a throwaway database, which
+``reset`` empties between sizes.
+"""
+
+import datetime
+import platform
+import random
+import time
+from decimal import Decimal
+
+import django
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core import autocomplete
+from employee.models import Employee
+from financial import rates
+from financial.models import GLAccount
+from payroll_setup import snapshot
+from payroll_setup.batch import evaluate_batch
+from payroll_setup.models import (
+    CalculationHeader,
+    CalculationScheme,
+    EdDefinition,
+    EdPostingGroup,
+    EmployeePostingGroup,
+    Lookup,
+    LookupLine,
+    PayrollPostingSetup,
+    PayslipGroup,
+)
+
+from .models import Payroll, PayrollRun, SalaryScale, SalaryScaleStep
+from .payslips import build_layout, employee_chunks, load_payslips
+from .posting import post_run
+from .run import load_employees
+
+SIZES = (1000, 10000, 100000)
+PERIOD = datetime.date(2025, 1, 1)
+# Employees evaluated one at a time; the rate is scaled to the full count
+EMPLOYEE_SAMPLE = 2000
+INSERT_BATCH_SIZE = 5000
+STAGES = (
+    "generate",
+    "compile",
+    "evaluate_employee",
+    "evaluate_batch",
+    "run",
+    "payslips",
+    "posting",
+)
+
+
+def _ed(code, description, **fields) -> EdDefinition:
+    return EdDefinition.objects.create(
+        edCode=code, description=description, payslipText=description, **fields
+    )
+
+
+def _line(header, lineNo, description, **fields) -> CalculationScheme:
+    return CalculationScheme.objects.create(
+        scheme=header, lineNo=lineNo, description=description, **fields
+    )
+
+
+def generate(
+    employees: int,
+    schemes: int = 4,
+    depth: int = 8,
+    brackets: int = 6,
+    steps: int = 20,
+    seed: int = 0,
+    code: str = "BENCH",
+) -> Payroll:
+    """Build the synthetic payroll ``code``; see the module docstring."""
+    rng = random.Random(seed)
+    payroll = Payroll.objects.create(code=code, description="Benchmark payroll")
+
+    earnings = PayslipGroup.objects.create(
+        code=f"{code}-EARN", headingText="Earnings", payrollCode=payroll
+    )
+    deductions = PayslipGroup.objects.create(
+        code=f"{code}-DED", headingText="Deductions", payrollCode=payroll
+    )
+    salaries = EdPostingGroup.objects.create(
+        edPostingGroup=f"{code}-SAL", description="Salaries", payrollCode=payroll
+    )
+    taxes = EdPostingGroup.objects.create(
+        edPostingGroup=f"{code}-TAX", description="Taxes", payrollCode=payroll
+    )
+    posted = {"postingType": "G/L Account", "payrollCode": payroll}
+    basic = _ed("BASIC", "Basic Pay", payslipGroup=earnings, payrollCode=payroll)
+    gross = _ed(
+        "GROSS",
+        "Gross Pay",
+        calculationGroup="Payments",
+        edPostingGroup=salaries,
+        **posted,
+    )
+    paye = _ed(
+        "PAYE",
+        "PAYE",
+        calculationGroup="Deduction",
+        payslipGroup=deductions,
+        edPostingGroup=taxes,
+        **posted,
+    )
+    nssf = _ed(
+        "NSSF",
+        "NSSF",
+        calculationGroup="Deduction",
+        payslipGroup=deductions,
+        edPostingGroup=taxes,
+        **posted,
+    )
+    net = _ed("NET", "Net Pay", payrollCode=payroll)
+    allowances = [
+        _ed(
+            f"A{index:02d}",
+            f"Allowance {index}",
+            calculationGroup="Payments",
+            payslipGroup=earnings,
+            payrollCode=payroll,
+        )
+        for index in range(1, depth + 1)
+    ]
+
+    table = Lookup.objects.create(
+        code=f"{code}-PAYE", type="Percentage", payrollCode=payroll
+    )
+    lower = extract = Decimal(0)
+    for index in range(brackets):
+        percent = Decimal(index * 40 // max(brackets - 1, 1))
+        LookupLine.objects.create(
+            lookup=table, lowerAmount=lower, percent=percent, extractAmount=extract
+        )
+        upper = Decimal(235000 * 2**index)
+        extract += (upper - lower) * percent / 100
+        lower = upper
+
+    scale = SalaryScale.objects.create(code=f"{code}-U1", payrollCode=payroll)
+    scale_steps = [
+        SalaryScaleStep.objects.create(
+            code=f"{code}-U1-{index:02d}",
+            scale=scale,
+            amount=Decimal(200000 + 75000 * index),
+            payrollCode=payroll,
+        )
+        for index in range(steps)
+    ]
+
+    headers = []
+    for number in range(1, schemes + 1):
+        header = CalculationHeader.objects.create(
+            schemeId=f"{code}-S{number}",
+            description=f"Benchmark scheme {number}",
+            payrollCode=payroll,
+            basicPayEntry=basic,
+        )
+        # A calculation line reads a line numbered higher than itself
+        net_line = _line(header, 10, "Net pay", payrollLines=net)
+        gross_line = _line(
+            header,
+            50,
+            "Gross pay",
+            Input="Payroll Entry",
+            payrollEntry=basic,
+            calculation="Add",
+            calculateTo=net_line,
+            payrollLines=gross,
+        )
+        for index, allowance in enumerate(allowances):
+            _line(
+                header,
+                100 + 10 * index,
+                allowance.description,
+                Input="Payroll Entry",
+                payrollEntry=basic,
+                calculation="Percent",
+                divideMultiply=Decimal(rng.randint(1, 15)),
+                roundType="Nearest",
+                roundPrecision=Decimal(1),
+                calculateTo=gross_line,
+                payrollLines=allowance,
+            )
+        _line(
+            header,
+            20,
+            "PAYE",
+            Input="Calculation Line",
+            calculationLine=gross_line,
+            calculation="Look Up",
+            lookUp=table,
+            roundType="Down",
+            roundPrecision=Decimal(1),
+            payrollLines=paye,
+        )
+        nssf_rate = _line(
+            header,
+            40,
+            "NSSF 5%",
+            Input="Calculation Line",
+            calculationLine=gross_line,
+            calculation="Percent",
+            divideMultiply=Decimal(5),
+        )
+        _line(
+            header,
+            30,
+            "NSSF capped",
+            Input="Calculation Line",
+            calculationLine=nssf_rate,
+            calculation="Lowest",
+            divideMultiply=Decimal(150000),
+            payrollLines=nssf,
+        )
+        for lineNo, ed in ((60, paye), (70, nssf)):
+            _line(
+                header,
+                lineNo,
+                f"Less {ed.description}",
+                Input="Payroll Entry",
+                payrollEntry=ed,
+                calculation="Subtract",
+                calculateTo=net_line,
+            )
+        headers.append(header)
+
+    accounts = {
+        no: GLAccount.objects.get_or_create(
+            no=no, defaults={"name": name, "accounttype": "Posting"}
+        )[0]
+        for no, name in (
+            ("B-6000", "Salaries"),
+            ("B-2000", "Salaries payable"),
+            ("B-2100", "Taxes payable"),
+        )
+    }
+    groups = []
+    for number in range(1, 4):
+        group = EmployeePostingGroup.objects.create(
+            postingGroup=f"{code}-G{number}",
+            description=f"Group {number}",
+            payrollCode=payroll,
+        )
+        PayrollPostingSetup.objects.create(
+            employeePostingGroup=group,
+            edPostingGroup=salaries,
+            debitAccount=accounts["B-6000"],
+            creditAccount=accounts["B-2000"],
+        )
+        PayrollPostingSetup.objects.create(
+            employeePostingGroup=group,
+            edPostingGroup=taxes,
+            debitAccount=accounts["B-2000"],
+            creditAccount=accounts["B-2100"],
+        )
+        groups.append(group)
+
+    rows = []
+    for index in range(employees):
+        fields = {
+            "employeeNo": f"{code}-{index:07d}",
+            "name": f"Employee {index}",
+            "calculationScheme": headers[index % len(headers)],
+            "payrollCode": payroll,
+            "employeePostingGroup": groups[index % len(groups)],
+        }
+        if index % 2:
+            fields.update(
+                basicPay="Fixed", fixedPay=Decimal(rng.randint(150000, 5000000))
+            )
+        else:
+            fields.update(
+                basicPay="Scale",
+                salaryScale=scale,
+                scaleStep=rng.choice(scale_steps),
+            )
+        rows.append(Employee(**fields))
+    Employee.objects.bulk_create(rows, batch_size=INSERT_BATCH_SIZE)
+    autocomplete.invalidate("employee.Employee")
+    return payroll
+
+
+def reset():
+    """Empty the database and drop the in-process caches built on it."""
+    call_command("flush", interactive=False, verbosity=0)
+    # Flushing sends no delete signals
+    snapshot.invalidate(plans=True)
+    rates.invalidate()
+    for label in autocomplete.INDEXES:
+        autocomplete.invalidate(label)
+
+
+def _measure(function, repeat: int = 1) -> tuple:
+    """``(best seconds, queries of the last call, result)`` of ``function()``."""
+    best = None
+    for _ in range(max(repeat, 1)):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            result = function()
+            elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, len(queries), result
+
+
+def _result(employees, stage, seconds, queries, **extra) -> dict:
+    return {
+        "employees": employees,
+        "stage": stage,
+        "seconds": round(seconds, 6),
+        "perEmployee": round(seconds / employees, 9) if employees else None,
+        "queries": queries,
+        **extra,
+    }
+
+
+def _compile(payroll):
+    snapshot.invalidate(plans=True)
+    return snapshot.get_snapshot(payroll, PERIOD)
+
+
+def _evaluate_employees(setup, groups, month) -> int:
+    count = 0
+    for scheme_id, rows in groups.items():
+        plan, basic_code = setup.scheme(scheme_id, PERIOD)
+        for _, amount in rows:
+            plan.evaluate({basic_code: amount}, month)
+            count += 1
+    return count
+
+
+def _evaluate_batches(setup, groups, month) -> int:
+    count = 0
+    for scheme_id, rows in groups.items():
+        plan, basic_code = setup.scheme(scheme_id, PERIOD)
+        evaluate_batch(plan, {basic_code: [amount for _, amount in rows]}, None, month)
+        count += len(rows)
+    return count
+
+
+def _payslips(run) -> int:
+    layout = build_layout(run)
+    return sum(len(load_payslips(run, layout, ids)) for ids in employee_chunks(run))
+
+
+def run_benchmark(payroll, employees: int, workers: int = 1, repeat: int = 3) -> list:
+    """Time each stage on ``payroll`` (see the module docstring)."""
+    from .run import execute_run
+
+    results = []
+    month = PERIOD.month
+
+    seconds, queries, setup = _measure(lambda: _compile(payroll), repeat)
+    results.append(_result(employees, "compile", seconds, queries))
+
+    groups = load_employees(payroll, setup, on=PERIOD)
+    sample, taken = {}, 0
+    for scheme_id, rows in groups.items():
+        share = rows[: max(EMPLOYEE_SAMPLE // len(groups), 1)]
+        sample[scheme_id] = share
+        taken += len(share)
+    seconds, queries, _ = _measure(
+        lambda: _evaluate_employees(setup, sample, month), repeat
+    )
+    results.append(
+        _result(
+            employees,
+            "evaluate_employee",
+            seconds * employees / taken if taken else 0.0,
+            queries,
+            sampled=taken,
+        )
+    )
+
+    seconds, queries, _ = _measure(
+        lambda: _evaluate_batches(setup, groups, month), repeat
+    )
+    results.append(_result(employees, "evaluate_batch", seconds, queries))
+
+    run = PayrollRun.objects.create(payrollCode=payroll, period=PERIOD)
+    seconds, queries, _ = _measure(lambda: execute_run(run, workers=workers))
+    results.append(_result(employees, "run", seconds, queries, lines=run.lineCount))
+
+    seconds, queries, payslips = _measure(lambda: _payslips(run), repeat)
+    results.append(_result(employees, "payslips", seconds, queries, payslips=payslips))
+
+    seconds, queries, lines = _measure(lambda: post_run(run))
+    results.append(
+        _result(employees, "posting", seconds, queries, journalLines=len(lines))
+    )
+    return results
+
+
+def environment() -> dict:
+    return {
+        "createdAt": timezone.now().isoformat(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def compare(results, baseline, tolerance: float = 0.25) -> list:
+    """
+    Stages of ``results`` slower than in ``baseline`` (the ``results`` list
+    of an earlier report) by more than ``tolerance``, as dicts with both
+    timings and their ratio. Sub-millisecond differences are ignored.
+    """
+    previous = {(row["employees"], row["stage"]): row for row in baseline}
+    regressions = []
+    for row in results:
+        before = previous.get((row["employees"], row["stage"]))
+        if before is None or not before["seconds"]:
+            continue
+        ratio = row["seconds"] / before["seconds"]
+        if ratio > 1 + tolerance and row["seconds"] - before["seconds"] > 0.001:
+            regressions.append(
+                {
+                    "employees": row["employees"],
+                    "stage": row["stage"],
+                    "baseline": before["seconds"],
+                    "seconds": row["seconds"],
+                    "ratio": round(ratio, 3),
+                }
+            )
+    return regressions
@@ -0,0 +1,113 @@
+"""
+Change tracking for incremental recalculation.
+
+Saving or deleting a row that feeds a calculation marks the employees it
+affects as dirty (``DirtyEmployee``, one row per employee holding the time
+of its latest change). The affected employees are found through reverse
+indexes:
+
+* ``Employee`` -> itself;
+* ``SalaryScaleStep``/``SalaryScaleStepAmount`` -> employees on that step;
+* ``CalculationHeader``/``CalculationScheme``/``CalculationSchemeVersion``
+  -> employees on the scheme;
+* ``Lookup``/``LookupLine`` -> employees on schemes with a line using it;
+* ``ExchangeRate`` -> employees on schemes using a lookup in its currency;
+* ``EdDefinition`` -> employees on schemes reading, producing or using it
+  as the basic pay entry.
+
+A rerun of a calculated ``PayrollRun`` recomputes only employees marked
+since that run started (see ``payroll.run.execute_run``). Bulk writers that
+bypass signals call ``mark_dirty`` themselves.
+"""
+
+from django.db.models import Q
+from django.utils import timezone
+
+from employee.models import Employee
+from payroll_setup.models import CalculationScheme
+
+from .models import DirtyEmployee, PayrollRun
+
+INSERT_BATCH_SIZE = 1000
+
+
+def _on_schemes(lines):
+    return Employee.objects.filter(calculationScheme__in=lines.values("scheme_id"))
+
+
+def affected_employees(instance):
+    """Return a queryset of the employees ``instance`` feeds into."""
+    label = instance._meta.label
+    if label == "employee.Employee":
+        return Employee.objects.filter(pk=instance.pk)
+    if label == "payroll.SalaryScaleStep":
+        return Employee.objects.filter(scaleStep=instance.pk)
+    if label == "payroll.SalaryScaleStepAmount":
+        return Employee.objects.filter(scaleStep=instance.step_id)
+    if label == "payroll_setup.CalculationHeader":
+        return Employee.objects.filter(calculationScheme=instance.pk)
+    if label in (
+        "payroll_setup.CalculationScheme",
+        "payroll_setup.CalculationSchemeVersion",
+    ):
+        return Employee.objects.filter(calculationScheme=instance.scheme_id)
+    if label == "payroll_setup.Lookup":
+        return _on_schemes(CalculationScheme.objects.filter(lookUp=instance.pk))
+    if label == "payroll_setup.LookupLine":
+        return _on_schemes(CalculationScheme.objects.filter(lookUp=instance.lookup_id))
+    if label == "financial.ExchangeRate":
+        return _on_schemes(
+            CalculationScheme.objects.filter(lookUp__currencyCode=instance.currency_id)
+        )
+    if label == "payroll_setup.EdDefinition":
+        return Employee.objects.filter(
+            Q(
+                calculationScheme__in=CalculationScheme.objects.filter(
+                    Q(payrollEntry=instance.pk) | Q(payrollLines=instance.pk)
+                ).values("scheme_id")
+            )
+            | Q(calculationScheme__basicPayEntry=instance.pk)
+        )
+    return Employee.objects.none()
+
+
+def mark_dirty(employee_ids, when=None) -> int:
+    """Mark ``employee_ids`` (ids or an ``Employee`` queryset) changed now."""
+    if hasattr(employee_ids, "values_list"):
+        employee_ids = employee_ids.values_list("pk", flat=True)
+    when = when or timezone.now()
+    marks = [DirtyEmployee(employee_id=pk, changedAt=when) for pk in employee_ids]
+    DirtyEmployee.objects.bulk_create(
+        marks,
+        batch_size=INSERT_BATCH_SIZE,
+        update_conflicts=True,
+        unique_fields=["employee"],
+        update_fields=["changedAt"],
+    )
+    return len(marks)
+
+
+def dirty_employee_ids(since) -> list:
+    """Employees changed at or after ``since``."""
+    return list(
+        DirtyEmployee.objects.filter(changedAt__gte=since).values_list(
+            "employee_id", flat=True
+        )
+    )
+
+
+def prune_marks() -> int:
+    """
+    Drop marks no calculated run can need any more, i.e. those older than
+    the earliest start of a calculated run (all of them if there is none).
+    """
+    marks = DirtyEmployee.objects.all()
+    earliest = (
+        PayrollRun.objects.filter(status="Calculated", startedAt__isnull=False)
+        .order_by("startedAt")
+        .values_list("startedAt", flat=True)
+        .first()
+    )
+    if earliest is not None:
+        marks = marks.filter(changedAt__lt=earliest)
+    return marks.delete()[0]
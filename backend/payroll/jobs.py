@@ -0,0 +1,305 @@
+"""
+Database-backed background jobs.
+
+``enqueue`` stores a ``Job``; ``manage.py run_jobs`` worker processes claim
+queued jobs with a conditional update (so two workers never take the same
+one, without broker or row locks) and run them through ``HANDLERS``.
+
+Handlers report progress per chunk through a ``Progress``. The work being
+measured usually sits inside one long transaction, so progress is not
+written to the ``Job`` row while it runs but to a small JSON file per job
+in ``PAYROLL_JOB_DIR`` (any process on the machine can read it). The row
+gets the final counts, per-step timings, message or traceback when the job
+ends. ``job_progress`` merges the two for the admin's progress endpoint.
+
+While a job runs, a thread of the worker stamps ``Job.heartbeatAt`` on
+its own connection (outside the handler's transaction). ``claim_next``
+first marks running jobs without a recent heartbeat as Failed, releasing
+their payroll runs, so jobs of a killed worker can be requeued.
+
+Workers live long, so the setup snapshots, rate index and autocomplete
+indexes they keep are checked against shared versions (``core.caches``)
+before use and follow edits made by the web processes, and the other way
+round.
+"""
+
+import json
+import os
+import socket
+import tempfile
+import threading
+import time
+import traceback
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, connection, connections
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job, PayrollRun
+
+POLL_SECONDS = 1.0
+HEARTBEAT_SECONDS = 30
+# Running jobs without a heartbeat for this long are taken as abandoned
+STALE_SECONDS = 600
+# Timings kept in the progress file; the row keeps them all
+RECENT_TIMINGS = 20
+
+
+def job_dir() -> Path:
+    return Path(
+        getattr(settings, "PAYROLL_JOB_DIR", None)
+        or Path(tempfile.gettempdir()) / "payroll-jobs"
+    )
+
+
+def _progress_path(job_id) -> Path:
+    return job_dir() / f"{job_id}.json"
+
+
+class Progress:
+    """Callable handed to handlers: ``progress(done, total=None)``."""
+
+    def __init__(self, job_id):
+        self.jobId = job_id
+        self.done = 0
+        self.total = None
+        self.timings = []
+        self._last = time.perf_counter()
+
+    def __call__(self, done, total=None):
+        now = time.perf_counter()
+        self.timings.append([done, round(now - self._last, 4)])
+        self._last = now
+        self.done = done
+        if total is not None:
+            self.total = total
+        path = _progress_path(self.jobId)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_suffix(".part")
+        partial.write_text(
+            json.dumps(
+                {
+                    "done": self.done,
+                    "total": self.total,
+                    "timings": self.timings[-RECENT_TIMINGS:],
+                }
+            )
+        )
+        os.replace(partial, path)
+
+    def clear(self):
+        _progress_path(self.jobId).unlink(missing_ok=True)
+
+
+class Heartbeat(threading.Thread):
+    """Stamps ``heartbeatAt`` on a running job until stopped."""
+
+    def __init__(self, job_id, interval=HEARTBEAT_SECONDS):
+        super().__init__(name=f"job-{job_id}-heartbeat", daemon=True)
+        self.jobId = job_id
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        try:
+            while not self._stopped.wait(self.interval):
+                try:
+                    Job.objects.filter(pk=self.jobId, status="Running").update(
+                        heartbeatAt=timezone.now()
+                    )
+                except DatabaseError:
+                    # e.g. SQLite locked by the handler's transaction
+                    pass
+        finally:
+            connection.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def _calculate(arguments, progress) -> str:
+    from .run import execute_run
+
+    run = PayrollRun.objects.select_related("payrollCode").get(pk=arguments["run"])
+    execute_run(
+        run,
+        workers=arguments.get("workers"),
+        incremental=arguments.get("incremental", False),
+        progress=progress,
+        profile=arguments.get("profile"),
+    )
+    return f"{run}: {run.employeeCount} employees, {run.lineCount} lines."
+
+
+def _post(arguments, progress) -> str:
+    from .posting import post_run
+
+    run = PayrollRun.objects.select_related("payrollCode").get(pk=arguments["run"])
+    lines = post_run(run, profile=arguments.get("profile"))
+    progress(1, 1)
+    return f"{run}: posted {len(lines)} journal lines."
+
+
+def _import_gl(arguments, progress) -> str:
+    from financial.importer import DEFAULT_PATH, import_file
+
+    result = import_file(arguments.get("path") or DEFAULT_PATH, progress=progress)
+    return f"G/L accounts: {result}."
+
+
+HANDLERS = {
+    "calculate": _calculate,
+    "post": _post,
+    "import_gl": _import_gl,
+}
+
+
+def enqueue(kind, user=None, **arguments) -> Job:
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind {kind!r}.")
+    return Job.objects.create(kind=kind, arguments=arguments, createdBy=user)
+
+
+def fail_stale(seconds: int | None = None) -> int:
+    """
+    Mark running jobs without a heartbeat in ``seconds`` (default: the
+    ``PAYROLL_JOB_STALE_SECONDS`` setting) as Failed, and their payroll runs
+    still Running too. Returns the number of jobs failed.
+    """
+    if seconds is None:
+        seconds = getattr(settings, "PAYROLL_JOB_STALE_SECONDS", STALE_SECONDS)
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=seconds)
+    stale = Q(heartbeatAt__lt=cutoff) | Q(
+        heartbeatAt__isnull=True, startedAt__lt=cutoff
+    )
+    count = 0
+    for job in Job.objects.filter(stale, status="Running"):
+        failed = Job.objects.filter(stale, pk=job.pk, status="Running").update(
+            status="Failed",
+            message=f"Worker {job.worker} stopped sending heartbeats."[:255],
+            finishedAt=now,
+        )
+        if not failed:
+            continue
+        count += 1
+        if job.kind == "calculate":
+            PayrollRun.objects.filter(
+                pk=job.arguments.get("run"), status="Running"
+            ).update(status="Failed", finishedAt=now)
+    return count
+
+
+def claim_next(worker: str):
+    """
+    Take the oldest queued job for ``worker``, or return ``None``. Jobs of
+    workers that stopped sending heartbeats are failed first.
+    """
+    fail_stale()
+    queued = Job.objects.filter(status="Queued").order_by("pk")
+    for pk in queued.values_list("pk", flat=True)[:10]:
+        now = timezone.now()
+        claimed = Job.objects.filter(pk=pk, status="Queued").update(
+            status="Running", startedAt=now, heartbeatAt=now, worker=worker
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def busy_run_ids() -> list:
+    """Payroll runs a running job is calculating or posting."""
+    return list(
+        Job.objects.filter(status="Running", kind__in=("calculate", "post"))
+        .values_list("arguments__run", flat=True)
+        .distinct()
+    )
+
+
+def run_job(job: Job) -> Job:
+    """Run a claimed job and record its outcome on the row."""
+    progress = Progress(job.pk)
+    heartbeat = Heartbeat(job.pk)
+    heartbeat.start()
+    try:
+        job.message = HANDLERS[job.kind](job.arguments, progress)[:255]
+        job.status = "Done"
+    except ValidationError as exc:
+        job.status = "Failed"
+        job.message = "; ".join(exc.messages)[:255]
+    except Exception as exc:
+        job.status = "Failed"
+        job.message = str(exc)[:255]
+        job.error = traceback.format_exc()
+    finally:
+        heartbeat.stop()
+    job.done = progress.done
+    job.total = progress.total
+    job.timings = progress.timings
+    job.finishedAt = timezone.now()
+    job.save(
+        update_fields=[
+            "status",
+            "message",
+            "error",
+            "done",
+            "total",
+            "timings",
+            "finishedAt",
+        ]
+    )
+    progress.clear()
+    return job
+
+
+def work(poll: float = POLL_SECONDS, once: bool = False) -> int:
+    """
+    Run queued jobs until interrupted, or until the queue is empty with
+    ``once``. Returns the number of jobs run.
+    """
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    count = 0
+    while True:
+        job = claim_next(worker)
+        if job is None:
+            if once:
+                return count
+            time.sleep(poll)
+            continue
+        run_job(job)
+        count += 1
+        # Long jobs may outlive the server's idle connection timeout
+        connections.close_all()
+
+
+def job_progress(job: Job) -> dict:
+    """The job's state, with live progress while it runs."""
+    state = {
+        "id": job.pk,
+        "kind": job.kind,
+        "status": job.status,
+        "done": job.done,
+        "total": job.total,
+        "message": job.message,
+        "timings": job.timings[-RECENT_TIMINGS:],
+        "startedAt": job.startedAt,
+        "finishedAt": job.finishedAt,
+        "heartbeatAt": job.heartbeatAt,
+    }
+    if job.status == "Running":
+        try:
+            state.update(json.loads(_progress_path(job.pk).read_text()))
+        except (OSError, ValueError):
+            pass
+    end = job.finishedAt or timezone.now()
+    state["seconds"] = (end - job.startedAt).total_seconds() if job.startedAt else None
+    if state["total"]:
+        state["percent"] = round(100 * state["done"] / state["total"], 1)
+    else:
+        state["percent"] = 100.0 if job.status == "Done" else None
+    return state
@@ -0,0 +1,166 @@
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from payroll.benchmark import (
+    SIZES,
+    STAGES,
+    compare,
+    environment,
+    generate,
+    reset,
+    run_benchmark,
+)
+
+
+def _sizes(value):
+    try:
+        sizes = [int(size) for size in value.split(",") if size]
+    except ValueError:
+        raise CommandError("Employee counts must be whole numbers, e.g. 1000,10000.")
+    if not sizes or min(sizes) < 1:
+        raise CommandError("Give at least one employee count above zero.")
+    return sizes
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark payroll calculation, posting and payslips on synthetic data "
+        "in a throwaway database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--employees",
+            default=",".join(str(size) for size in SIZES),
+            help="Comma-separated employee counts to benchmark.",
+        )
+        parser.add_argument("--schemes", type=int, default=4)
+        parser.add_argument(
+            "--depth", type=int, default=8, help="Allowance lines per scheme."
+        )
+        parser.add_argument(
+            "--brackets", type=int, default=6, help="PAYE lookup brackets."
+        )
+        parser.add_argument("--steps", type=int, default=20, help="Salary scale steps.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Worker processes for the payroll run.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=3,
+            help="Runs of each read-only stage; the best time is kept.",
+        )
+        parser.add_argument("--output", help="Write the JSON report to this file.")
+        parser.add_argument(
+            "--baseline",
+            help="JSON report of an earlier benchmark to compare against.",
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.25,
+            help="Slowdown over the baseline reported as a regression (0.25 = 25%%).",
+        )
+
+    def handle(self, *args, **options):
+        sizes = _sizes(options["employees"])
+        baseline = None
+        if options["baseline"]:
+            try:
+                baseline = json.loads(Path(options["baseline"]).read_text())
+            except (OSError, ValueError) as exc:
+                raise CommandError(f"Cannot read baseline: {exc}")
+        parameters = {
+            key: options[key]
+            for key in ("schemes", "depth", "brackets", "steps", "seed", "workers")
+        }
+        parameters["repeat"] = options["repeat"]
+
+        # Never touch the configured database
+        name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        results = []
+        try:
+            for employees in sizes:
+                reset()
+                started = time.perf_counter()
+                payroll = generate(
+                    employees,
+                    schemes=options["schemes"],
+                    depth=options["depth"],
+                    brackets=options["brackets"],
+                    steps=options["steps"],
+                    seed=options["seed"],
+                )
+                generated = time.perf_counter() - started
+                results.append(
+                    {
+                        "employees": employees,
+                        "stage": "generate",
+                        "seconds": round(generated, 6),
+                    }
+                )
+                results.extend(
+                    run_benchmark(
+                        payroll,
+                        employees,
+                        workers=options["workers"],
+                        repeat=options["repeat"],
+                    )
+                )
+                self._summary(results, employees)
+            report = {
+                "environment": environment(),
+                "parameters": parameters,
+                "results": results,
+            }
+        finally:
+            connection.creation.destroy_test_db(name, verbosity=0)
+
+        if baseline is not None:
+            report["regressions"] = compare(
+                results, baseline["results"], options["tolerance"]
+            )
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2) + "\n")
+            self.stdout.write(f"Report written to {options['output']}.")
+        else:
+            self.stdout.write(json.dumps(report, indent=2))
+
+        for row in report.get("regressions", ()):
+            self.stdout.write(
+                self.style.ERROR(
+                    f"{row['stage']} at {row['employees']} employees: "
+                    f"{row['seconds']:.3f}s vs {row['baseline']:.3f}s "
+                    f"({row['ratio']:.2f}x)"
+                )
+            )
+        if report.get("regressions"):
+            raise CommandError(
+                f"{len(report['regressions'])} stages slower than the baseline."
+            )
+
+    def _summary(self, results, employees):
+        rows = {row["stage"]: row for row in results if row["employees"] == employees}
+        self.stderr.write(f"{employees} employees:")
+        for stage in STAGES:
+            row = rows.get(stage)
+            if row is None:
+                continue
+            per_employee = row.get("perEmployee")
+            detail = f"{per_employee * 1e6:10.1f} us/employee" if per_employee else ""
+            queries = f"{row['queries']:6d} queries" if "queries" in row else ""
+            self.stderr.write(
+                f"  {stage:<18} {row['seconds']:9.3f}s {detail:>22} {queries}"
+            )
@@ -0,0 +1,63 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.models import PayrollRun
+from payroll.payslips import CHUNK_SIZE, write_files, write_merged
+
+
+class Command(BaseCommand):
+    help = "Print the payslips of a calculated payroll run to PDF."
+
+    def add_arguments(self, parser):
+        parser.add_argument("payroll", help="Payroll code")
+        parser.add_argument("period", help="Payroll month as YYYY-MM")
+        parser.add_argument(
+            "output",
+            help="PDF file to write, or a directory with --split.",
+        )
+        parser.add_argument(
+            "--split",
+            action="store_true",
+            help="Write one <employeeNo>.pdf per employee into the directory.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Worker processes (defaults to the number of CPUs).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            period = datetime.datetime.strptime(options["period"], "%Y-%m").date()
+        except ValueError:
+            raise CommandError("Period must be given as YYYY-MM.")
+        try:
+            run = PayrollRun.objects.select_related("payrollCode").get(
+                payrollCode__code=options["payroll"], period=period
+            )
+        except PayrollRun.DoesNotExist:
+            raise CommandError(
+                f"Payroll {options['payroll']} has no run for {options['period']}."
+            )
+        if run.status not in ("Calculated", "Posted"):
+            raise CommandError(f"{run} is {run.status}, not calculated.")
+
+        write = write_files if options["split"] else write_merged
+        started = time.perf_counter()
+        count = write(
+            run,
+            options["output"],
+            workers=options["workers"],
+            chunk_size=options["chunk_size"],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{run}: {count} payslips written to {options['output']} "
+                f"in {elapsed:.2f}s."
+            )
+        )
@@ -0,0 +1,48 @@
+import multiprocessing
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from payroll.jobs import POLL_SECONDS, work
+
+
+def _work(poll, once):
+    import django
+
+    django.setup()
+    work(poll, once)
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs (payroll runs, postings, imports)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="Worker processes taking jobs in parallel.",
+        )
+        parser.add_argument("--poll", type=float, default=POLL_SECONDS)
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit when the queue is empty instead of waiting for jobs.",
+        )
+
+    def handle(self, *args, **options):
+        poll, once = options["poll"], options["once"]
+        if options["processes"] <= 1:
+            count = work(poll, once)
+            self.stdout.write(self.style.SUCCESS(f"Ran {count} jobs."))
+            return
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        processes = [
+            multiprocessing.Process(target=_work, args=(poll, once))
+            for _ in range(options["processes"])
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
@@ -0,0 +1,71 @@
+import datetime
+import time
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from core.profiling import summary
+from payroll.models import Payroll, PayrollRun
+from payroll.run import CHUNK_SIZE, cache_stats, execute_run
+
+
+class Command(BaseCommand):
+    help = "Calculate a payroll run for every employee of a payroll."
+
+    def add_arguments(self, parser):
+        parser.add_argument("payroll", help="Payroll code")
+        parser.add_argument("period", help="Payroll month as YYYY-MM")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=None,
+            help="Worker processes (defaults to the number of CPUs).",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only recalculate employees changed since the run last started.",
+        )
+        parser.add_argument(
+            "--profile",
+            action="store_true",
+            help="Time each stage, store the profile on the run and print it.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            payroll = Payroll.objects.get(code=options["payroll"])
+        except Payroll.DoesNotExist:
+            raise CommandError(f"Payroll {options['payroll']} does not exist.")
+        try:
+            period = datetime.datetime.strptime(options["period"], "%Y-%m").date()
+        except ValueError:
+            raise CommandError("Period must be given as YYYY-MM.")
+
+        run, _ = PayrollRun.objects.get_or_create(payrollCode=payroll, period=period)
+        started = time.perf_counter()
+        try:
+            execute_run(
+                run,
+                chunk_size=options["chunk_size"],
+                workers=options["workers"],
+                incremental=options["incremental"],
+                profile=options["profile"] or None,
+            )
+        except ValidationError as exc:
+            raise CommandError("; ".join(exc.messages))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{run}: {run.employeeCount} employees, {run.lineCount} lines "
+                f"in {elapsed:.2f}s."
+            )
+        )
+        stats = cache_stats()
+        self.stdout.write(
+            f"Result cache: {stats['hits']} hits, {stats['misses']} misses "
+            f"({stats['hitRate']:.1%}), {stats['entries']} entries."
+        )
+        if options["profile"]:
+            self.stdout.write(summary(run.profile["calculate"]))
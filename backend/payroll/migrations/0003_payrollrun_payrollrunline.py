@@ -0,0 +1,52 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employee', '0002_employee'),
+        ('payroll', '0002_salaryscale_salaryscalestep'),
+        ('payroll_setup', '0022_calculationheader_basicpayentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(help_text='First day of the payroll month.')),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('Open', 'Open'), ('Running', 'Running'), ('Calculated', 'Calculated'), ('Failed', 'Failed')], default='Open', max_length=20)),
+                ('employeeCount', models.PositiveIntegerField(default=0, verbose_name='Employee Count')),
+                ('lineCount', models.PositiveIntegerField(default=0, verbose_name='Line Count')),
+                ('startedAt', models.DateTimeField(blank=True, null=True, verbose_name='Started At')),
+                ('finishedAt', models.DateTimeField(blank=True, null=True, verbose_name='Finished At')),
+                ('payrollCode', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='runs', to='payroll.payroll', verbose_name='Payroll Code')),
+            ],
+            options={
+                'verbose_name': 'Payroll Run',
+                'verbose_name_plural': 'Payroll Runs',
+                'ordering': ['payrollCode', '-period'],
+                'unique_together': {('payrollCode', 'period')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PayrollRunLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, default=0.0, max_digits=14)),
+                ('edDefinition', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='payrollRunLines', to='payroll_setup.eddefinition', to_field='edCode', verbose_name='ED Code')),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='payrollRunLines', to='employee.employee', verbose_name='Employee')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='payroll.payrollrun', verbose_name='Payroll Run')),
+            ],
+            options={
+                'verbose_name': 'Payroll Run Line',
+                'verbose_name_plural': 'Payroll Run Lines',
+                'ordering': ['run', 'employee', 'edDefinition'],
+                'indexes': [models.Index(fields=['run', 'employee'], name='payroll_pay_run_id_7b1683_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payroll", "0003_payrollrun_payrollrunline"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="payrollrun",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("Open", "Open"),
+                    ("Running", "Running"),
+                    ("Calculated", "Calculated"),
+                    ("Posted", "Posted"),
+                    ("Failed", "Failed"),
+                ],
+                default="Open",
+                max_length=20,
+            ),
+        ),
+    ]
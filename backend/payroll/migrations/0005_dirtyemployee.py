@@ -0,0 +1,39 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("employee", "0003_employee_employeepostinggroup"),
+        ("payroll", "0004_alter_payrollrun_status"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DirtyEmployee",
+            fields=[
+                (
+                    "employee",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="dirtyMark",
+                        serialize=False,
+                        to="employee.employee",
+                        verbose_name="Employee",
+                    ),
+                ),
+                (
+                    "changedAt",
+                    models.DateTimeField(db_index=True, verbose_name="Changed At"),
+                ),
+            ],
+            options={
+                "verbose_name": "Dirty Employee",
+                "verbose_name_plural": "Dirty Employees",
+            },
+        ),
+    ]
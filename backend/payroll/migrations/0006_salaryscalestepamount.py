@@ -0,0 +1,45 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payroll", "0005_dirtyemployee"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SalaryScaleStepAmount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("effectiveDate", models.DateField(verbose_name="Effective Date")),
+                ("amount", models.DecimalField(decimal_places=2, max_digits=12)),
+                (
+                    "step",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="amounts",
+                        to="payroll.salaryscalestep",
+                        verbose_name="Scale Step",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Salary Scale Step Amount",
+                "verbose_name_plural": "Salary Scale Step Amounts",
+                "ordering": ["step", "effectiveDate"],
+                "unique_together": {("step", "effectiveDate")},
+            },
+        ),
+    ]
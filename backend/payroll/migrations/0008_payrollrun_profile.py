@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payroll", "0007_job"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payrollrun",
+            name="profile",
+            field=models.JSONField(
+                blank=True,
+                help_text="Stage profiles of the last profiled calculation and posting.",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.6 on 2026-10-18 20:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payroll", "0008_payrollrun_profile"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="job",
+            name="heartbeatAt",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="Last sign of life from the worker running the job.",
+                null=True,
+                verbose_name="Heartbeat At",
+            ),
+        ),
+    ]
@@ -1,4 +1,7 @@
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.utils import timezone
 
 
 class Payroll(models.Model):
@@ -61,3 +64,199 @@ class SalaryScaleStep(models.Model):
 
     def __str__(self) -> str:
         return f"{self.scale.code}-{self.code}"
+
+
+class SalaryScaleStepAmount(models.Model):
+    """A step amount effective from ``effectiveDate`` (a scale revision)."""
+
+    step = models.ForeignKey(
+        "payroll.SalaryScaleStep",
+        on_delete=models.CASCADE,
+        related_name="amounts",
+        verbose_name="Scale Step",
+    )
+    effectiveDate = models.DateField(verbose_name="Effective Date")
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        verbose_name = "Salary Scale Step Amount"
+        verbose_name_plural = "Salary Scale Step Amounts"
+        ordering = ["step", "effectiveDate"]
+        unique_together = (("step", "effectiveDate"),)
+
+    def __str__(self) -> str:
+        return f"{self.step_id} from {self.effectiveDate:%Y-%m-%d}"
+
+
+class PayrollRun(models.Model):
+    payrollCode = models.ForeignKey(
+        "payroll.Payroll",
+        on_delete=models.PROTECT,
+        related_name="runs",
+        verbose_name="Payroll Code",
+    )
+    period = models.DateField(help_text="First day of the payroll month.")
+    description = models.CharField(max_length=255, blank=True)
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ("Open", "Open"),
+            ("Running", "Running"),
+            ("Calculated", "Calculated"),
+            ("Posted", "Posted"),
+            ("Failed", "Failed"),
+        ],
+        default="Open",
+    )
+    employeeCount = models.PositiveIntegerField(
+        default=0, verbose_name="Employee Count"
+    )
+    lineCount = models.PositiveIntegerField(default=0, verbose_name="Line Count")
+    startedAt = models.DateTimeField(blank=True, null=True, verbose_name="Started At")
+    finishedAt = models.DateTimeField(blank=True, null=True, verbose_name="Finished At")
+    profile = models.JSONField(
+        blank=True,
+        null=True,
+        help_text="Stage profiles of the last profiled calculation and posting.",
+    )
+
+    class Meta:
+        verbose_name = "Payroll Run"
+        verbose_name_plural = "Payroll Runs"
+        ordering = ["payrollCode", "-period"]
+        unique_together = (("payrollCode", "period"),)
+
+    def __str__(self) -> str:
+        return f"{self.payrollCode.code} {self.period:%Y-%m}"
+
+    # Runs that must not be recalculated
+    LOCKED = ("Running", "Posted")
+
+    def ensure_editable(self):
+        """Refuse to recalculate a posted run or one being calculated."""
+        if self.status in self.LOCKED:
+            raise ValidationError(f"Payroll run {self} is {self.status}.")
+
+    def ensure_calculated(self):
+        """Refuse to post a run that is not calculated."""
+        if self.status != "Calculated":
+            raise ValidationError(
+                f"Payroll run {self} is {self.status}, not Calculated."
+            )
+
+    def attach_profile(self, operation: str, profile):
+        """Keep a finished ``core.profiling.Profile`` under ``operation``."""
+        self.profile = {
+            **(self.profile or {}),
+            operation: {"profiledAt": timezone.now().isoformat(), **profile.as_dict()},
+        }
+
+
+class PayrollRunLine(models.Model):
+    run = models.ForeignKey(
+        "payroll.PayrollRun",
+        on_delete=models.CASCADE,
+        related_name="lines",
+        verbose_name="Payroll Run",
+    )
+    employee = models.ForeignKey(
+        "employee.Employee",
+        on_delete=models.PROTECT,
+        related_name="payrollRunLines",
+        verbose_name="Employee",
+    )
+    edDefinition = models.ForeignKey(
+        "payroll_setup.EdDefinition",
+        on_delete=models.PROTECT,
+        to_field="edCode",
+        related_name="payrollRunLines",
+        verbose_name="ED Code",
+    )
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0.0)
+
+    class Meta:
+        verbose_name = "Payroll Run Line"
+        verbose_name_plural = "Payroll Run Lines"
+        ordering = ["run", "employee", "edDefinition"]
+        indexes = [models.Index(fields=["run", "employee"])]
+
+    def __str__(self) -> str:
+        return f"{self.run_id} / {self.employee_id} / {self.edDefinition_id}"
+
+
+class DirtyEmployee(models.Model):
+    """An employee whose calculation inputs changed at ``changedAt``."""
+
+    employee = models.OneToOneField(
+        "employee.Employee",
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="dirtyMark",
+        verbose_name="Employee",
+    )
+    changedAt = models.DateTimeField(db_index=True, verbose_name="Changed At")
+
+    class Meta:
+        verbose_name = "Dirty Employee"
+        verbose_name_plural = "Dirty Employees"
+
+    def __str__(self) -> str:
+        return f"{self.employee_id} @ {self.changedAt:%Y-%m-%d %H:%M:%S}"
+
+
+class Job(models.Model):
+    """A background task run by ``manage.py run_jobs`` (see ``payroll.jobs``)."""
+
+    kind = models.CharField(
+        max_length=20,
+        choices=[
+            ("calculate", "Calculate payroll run"),
+            ("post", "Post payroll run"),
+            ("import_gl", "Import G/L accounts"),
+        ],
+    )
+    arguments = models.JSONField(default=dict, blank=True)
+    status = models.CharField(
+        max_length=20,
+        choices=[
+            ("Queued", "Queued"),
+            ("Running", "Running"),
+            ("Done", "Done"),
+            ("Failed", "Failed"),
+        ],
+        default="Queued",
+    )
+    done = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(blank=True, null=True)
+    message = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    timings = models.JSONField(
+        default=list, blank=True, help_text="[done, seconds] per progress step."
+    )
+    worker = models.CharField(max_length=100, blank=True)
+    createdBy = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        related_name="payrollJobs",
+        blank=True,
+        null=True,
+        verbose_name="Created By",
+    )
+    createdAt = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+    startedAt = models.DateTimeField(blank=True, null=True, verbose_name="Started At")
+    finishedAt = models.DateTimeField(blank=True, null=True, verbose_name="Finished At")
+    heartbeatAt = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name="Heartbeat At",
+        help_text="Last sign of life from the worker running the job.",
+    )
+
+    class Meta:
+        verbose_name = "Job"
+        verbose_name_plural = "Jobs"
+        ordering = ["-id"]
+        indexes = [models.Index(fields=["status", "id"])]
+
+    def __str__(self) -> str:
+        return f"#{self.pk} {self.get_kind_display()}"
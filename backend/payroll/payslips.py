@@ -0,0 +1,233 @@
+"""
+Payslip generation.
+
+EDs are printed under their ``EdDefinition.payslipGroup`` heading
+(``PayslipGroup.headingText``, groups in code order) as their
+``payslipText`` (or description); EDs without a payslip group are working
+values and are left off. The layout is built once per run: the page frame
+is rendered from the ``payroll/payslip.txt`` template into a format string
+and each ED's label is padded in advance, so filling a payslip is string
+formatting. The run lines of each chunk of employees are grouped in one
+pass over a single query ordered by employee.
+
+Payslips become PDF pages (``payroll.pdf``). Chunks are filled in a process
+pool when more than one worker is requested, with a bounded number in
+flight, and written to disk as they arrive: one merged PDF with
+``write_merged`` or one PDF per employee with ``write_files``.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+from pathlib import Path
+from typing import NamedTuple
+
+from django.db import connections
+from django.db.models import Q
+from django.template.loader import get_template
+
+from employee.models import Employee
+from payroll_setup.models import PayslipGroup
+from payroll_setup.snapshot import get_snapshot
+
+from .models import PayrollRunLine
+from .pdf import PdfWriter, text_pages
+
+CHUNK_SIZE = 500
+TEMPLATE = "payroll/payslip.txt"
+RULE = "-" * 62
+TEXT_WIDTH = 44
+AMOUNT_WIDTH = 16
+
+
+class PayslipLayout(NamedTuple):
+    # Rendered template, with {employeeNo}, {name} and {body} to fill in
+    page: str
+    # {payslip group id: heading}, in print order
+    headings: dict
+    # {edCode: (payslip group id, padded label)}, in print order
+    entries: dict
+
+
+# Run and layout shared with worker processes by the pool initializer
+_run = None
+_layout = None
+
+
+def _literal(text) -> str:
+    return str(text).replace("{", "{{").replace("}", "}}")
+
+
+def _line(label, amount) -> str:
+    return f"{label}{amount:>{AMOUNT_WIDTH},.2f}"
+
+
+def build_layout(run) -> PayslipLayout:
+    payroll = run.payrollCode
+    snapshot = get_snapshot(payroll)
+    page = get_template(TEMPLATE).render(
+        {
+            "payroll": _literal(f"{payroll.code} {payroll.description}".strip()),
+            "period": run.period,
+            "rule": RULE,
+            "employeeNo": "{employeeNo}",
+            "name": "{name}",
+            "body": "{body}",
+        }
+    )
+    headings = dict(
+        PayslipGroup.objects.filter(
+            Q(payrollCode=payroll) | Q(payrollCode__isnull=True)
+        )
+        .order_by("code")
+        .values_list("pk", "headingText")
+    )
+    entries = {}
+    for code, ed in sorted(snapshot.edDefinitions.items()):
+        if ed.payslipGroup_id in headings:
+            text = ed.payslipText or ed.description
+            entries[code] = (ed.payslipGroup_id, f"  {text[:TEXT_WIDTH]:<{TEXT_WIDTH}}")
+    return PayslipLayout(page, headings, entries)
+
+
+def employee_chunks(run, chunk_size: int = CHUNK_SIZE) -> list:
+    """Ids of the run's employees in employeeNo order, in chunks."""
+    ids = list(
+        Employee.objects.filter(
+            pk__in=PayrollRunLine.objects.filter(run=run).values("employee_id")
+        )
+        .order_by("employeeNo")
+        .values_list("pk", flat=True)
+    )
+    return [ids[start : start + chunk_size] for start in range(0, len(ids), chunk_size)]
+
+
+def load_payslips(run, layout, employee_ids) -> list:
+    """
+    ``[(employeeNo, text), ...]`` for ``employee_ids`` (in that order) with
+    two queries. Employees with no printed line get no payslip.
+    """
+    employees = {
+        pk: (employee_no, name)
+        for pk, employee_no, name in Employee.objects.filter(
+            pk__in=employee_ids
+        ).values_list("pk", "employeeNo", "name")
+    }
+    rank = {code: i for i, code in enumerate(layout.entries)}
+    total_label = f"  {'Total':<{TEXT_WIDTH}}"
+    lines = (
+        PayrollRunLine.objects.filter(
+            run=run, employee_id__in=employee_ids, edDefinition_id__in=rank
+        )
+        .order_by("employee_id")
+        .values_list("employee_id", "edDefinition_id", "amount")
+    )
+    payslips = {}
+    for employee_id, rows in groupby(lines.iterator(), key=lambda row: row[0]):
+        buckets = {}
+        for _, code, amount in sorted(rows, key=lambda row: rank[row[1]]):
+            group_id, label = layout.entries[code]
+            buckets.setdefault(group_id, []).append((label, amount))
+        body = []
+        for group_id, heading in layout.headings.items():
+            if group_id in buckets:
+                body.append(heading)
+                body.extend(_line(*line) for line in buckets[group_id])
+                total = sum(amount for _, amount in buckets[group_id])
+                body.append(_line(total_label, total))
+                body.append("")
+        employee_no, name = employees[employee_id]
+        body.append("")
+        payslips[employee_id] = (
+            employee_no,
+            layout.page.format(employeeNo=employee_no, name=name, body="\n".join(body)),
+        )
+    return [payslips[pk] for pk in employee_ids if pk in payslips]
+
+
+def _file_name(employee_no) -> str:
+    return employee_no.replace(os.sep, "-") + ".pdf"
+
+
+def _set_state(run, layout):
+    global _run, _layout
+    _run, _layout = run, layout
+
+
+def _init_worker(run, layout):
+    import django
+
+    django.setup()
+    _set_state(run, layout)
+
+
+def _render_chunk(task):
+    """
+    Render one chunk. Returns a list of page content lists, or the number
+    of files written when a directory is given.
+    """
+    employee_ids, directory = task
+    payslips = load_payslips(_run, _layout, employee_ids)
+    if directory is None:
+        return [text_pages(text) for _, text in payslips]
+    for employee_no, text in payslips:
+        path = Path(directory) / _file_name(employee_no)
+        with path.open("wb") as stream, PdfWriter(stream) as pdf:
+            pdf.add_pages(text_pages(text))
+    return len(payslips)
+
+
+def _results(run, tasks, workers: int):
+    """Yield ``_render_chunk`` results in task order."""
+    layout = build_layout(run)
+    if workers <= 1 or len(tasks) <= 1:
+        _set_state(run, layout)
+        yield from map(_render_chunk, tasks)
+        return
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(run, layout)
+    ) as pool:
+        # Keep a few chunks in flight so finished ones never pile up
+        pending = deque()
+        for task in tasks:
+            pending.append(pool.submit(_render_chunk, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def write_merged(
+    run, path, workers: int | None = None, chunk_size: int = CHUNK_SIZE
+) -> int:
+    """Write every payslip of ``run`` to one PDF at ``path``; returns the count."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    path = Path(path)
+    partial = path.with_name(path.name + ".part")
+    tasks = [(ids, None) for ids in employee_chunks(run, chunk_size)]
+    count = 0
+    with partial.open("wb") as stream:
+        pdf = PdfWriter(stream)
+        for payslips in _results(run, tasks, workers):
+            for pages in payslips:
+                pdf.add_pages(pages)
+            count += len(payslips)
+        pdf.close()
+    os.replace(partial, path)
+    return count
+
+
+def write_files(
+    run, directory, workers: int | None = None, chunk_size: int = CHUNK_SIZE
+) -> int:
+    """Write one ``<employeeNo>.pdf`` per payslip into ``directory``."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    tasks = [(ids, str(directory)) for ids in employee_chunks(run, chunk_size)]
+    return sum(_results(run, tasks, workers))
@@ -0,0 +1,115 @@
+"""
+Minimal streaming PDF writer for plain-text documents.
+
+Pages are monospaced text (the standard Courier font, which every reader
+has, so nothing is embedded). ``PdfWriter`` writes each page to the stream
+as it is added and keeps only object offsets, so a document of any number
+of pages is written in constant memory. Page content can be built
+elsewhere (e.g. in worker processes) with ``text_pages``.
+"""
+
+PAGE_WIDTH = 595  # A4 in points
+PAGE_HEIGHT = 842
+MARGIN = 40
+FONT_SIZE = 9
+LEADING = 11
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+
+_CATALOG, _PAGES, _FONT = 1, 2, 3
+
+
+def page_content(lines) -> bytes:
+    """The content stream of one page showing ``lines`` top to bottom."""
+    data = "\n".join(lines).encode("cp1252", "replace")
+    data = data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+    parts = [
+        b"BT /F1 %d Tf %d TL %d %d Td"
+        % (FONT_SIZE, LEADING, MARGIN, PAGE_HEIGHT - MARGIN - FONT_SIZE)
+    ]
+    if lines:
+        parts.extend(b"(%s) Tj T*" % line for line in data.split(b"\n"))
+    parts.append(b"ET")
+    return b"\n".join(parts)
+
+
+def text_pages(text: str) -> list:
+    """Split ``text`` into page content streams, breaking on form feeds."""
+    pages = []
+    for section in text.split("\f"):
+        lines = section.expandtabs().splitlines()
+        for start in range(0, max(len(lines), 1), LINES_PER_PAGE):
+            pages.append(page_content(lines[start : start + LINES_PER_PAGE]))
+    return pages
+
+
+class PdfWriter:
+    """Write pages to a binary ``stream``; call ``close`` to finish."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.offsets = {}
+        self.pageIds = []
+        self.nextId = _FONT + 1
+        self.position = 0
+        self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        self._object(_CATALOG, b"<< /Type /Catalog /Pages 2 0 R >>")
+        self._object(
+            _FONT,
+            b"<< /Type /Font /Subtype /Type1 /BaseFont /Courier "
+            b"/Encoding /WinAnsiEncoding >>",
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if exc_info[0] is None:
+            self.close()
+
+    def _write(self, data: bytes):
+        self.stream.write(data)
+        self.position += len(data)
+
+    def _object(self, object_id: int, body: bytes):
+        self.offsets[object_id] = self.position
+        self._write(b"%d 0 obj\n%s\nendobj\n" % (object_id, body))
+
+    def add_page(self, content: bytes):
+        """Append a page with the given content stream."""
+        content_id, page_id = self.nextId, self.nextId + 1
+        self.nextId += 2
+        self._object(
+            content_id,
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content),
+        )
+        self._object(
+            page_id,
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>"
+            % (PAGE_WIDTH, PAGE_HEIGHT, content_id),
+        )
+        self.pageIds.append(page_id)
+
+    def add_pages(self, contents):
+        for content in contents:
+            self.add_page(content)
+
+    def close(self):
+        """Write the page tree, cross-reference table and trailer."""
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self.pageIds)
+        self._object(
+            _PAGES,
+            b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.pageIds)),
+        )
+        xref = self.position
+        count = self.nextId
+        entries = [b"xref\n0 %d\n0000000000 65535 f \n" % count]
+        entries.extend(
+            b"%010d 00000 n \n" % self.offsets[object_id]
+            for object_id in range(1, count)
+        )
+        self._write(b"".join(entries))
+        self._write(
+            b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (count, xref)
+        )
@@ -0,0 +1,155 @@
+"""
+G/L posting of payroll runs.
+
+Run lines are streamed once and summed in a dict keyed by the posting-setup
+key (employee posting group, ED posting group). Each key's total becomes one
+debit and one credit ``GeneralJournalLine`` on the accounts of its
+``PayrollPostingSetup``, looked up in the setup snapshot, so a month for any
+number of employees posts a few lines per posting-setup combination.
+Profiled postings are stored under ``run.profile["post"]``.
+"""
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from core.profiling import profiling, stage
+from employee.models import Employee
+from financial.models import GeneralJournalLine
+from payroll_setup.snapshot import get_snapshot
+
+from .models import PayrollRun, PayrollRunLine
+
+ZERO = Decimal("0")
+SOURCE_CODE = "PAYROLL"
+READ_CHUNK_SIZE = 10000
+INSERT_BATCH_SIZE = 1000
+
+
+def document_no(run: PayrollRun) -> str:
+    return f"{run.payrollCode.code}-{run.period:%Y-%m}"
+
+
+def employee_posting_groups(payroll) -> dict:
+    return dict(
+        Employee.objects.filter(payrollCode=payroll).values_list(
+            "pk", "employeePostingGroup_id"
+        )
+    )
+
+
+def aggregate(lines, employee_groups, snapshot) -> dict:
+    """
+    Sum ``(employee id, edCode, amount)`` rows into
+    ``{(employee posting group, ED posting group): amount}``. EDs without an
+    ED posting group or with posting type None are not posted.
+    """
+    ed_groups = {
+        code: ed.edPostingGroup_id
+        for code, ed in snapshot.edDefinitions.items()
+        if ed.edPostingGroup_id and ed.postingType != "None"
+    }
+    totals = {}
+    for employee_id, code, amount in lines:
+        ed_group = ed_groups.get(code)
+        if ed_group is None:
+            continue
+        key = (employee_groups.get(employee_id), ed_group)
+        totals[key] = totals.get(key, ZERO) + amount
+    return totals
+
+
+def journal_lines(totals, snapshot, document: str, posting_date) -> list:
+    """Build balanced debit/credit journal lines for aggregated ``totals``."""
+    errors = []
+    lines = []
+    for key, amount in sorted(totals.items(), key=lambda item: str(item[0])):
+        if not amount:
+            continue
+        employee_group, ed_group = key
+        if employee_group is None:
+            errors.append("Employees without an Employee Posting Group have lines.")
+            continue
+        debit, credit = snapshot.postingSetups.get(key, (None, None))
+        if debit is None or credit is None:
+            errors.append(
+                f"Payroll Posting Setup {employee_group}/{ed_group} needs both "
+                "a debit and a credit account."
+            )
+            continue
+        description = f"Payroll {document}"
+        for account, signed in ((debit, amount), (credit, -amount)):
+            lines.append(
+                GeneralJournalLine(
+                    documentNo=document,
+                    postingDate=posting_date,
+                    glAccount_id=account,
+                    description=description,
+                    amount=signed,
+                    sourceCode=SOURCE_CODE,
+                )
+            )
+    if errors:
+        raise ValidationError(sorted(set(errors)))
+    return lines
+
+
+def _counted(rows, step):
+    """Yield ``rows``, counting them on the profiling ``step``."""
+    count = 0
+    for row in rows:
+        count += 1
+        yield row
+    step.count = count
+
+
+def post_run(run: PayrollRun, posting_date=None, profile: bool | None = None) -> list:
+    """
+    Write the journal lines for a calculated run and mark it Posted. The run
+    is claimed in the transaction that reads its lines, so a calculation can
+    neither start under the posting nor be overwritten by it. With
+    ``profile`` (default: the ``PAYROLL_PROFILE`` setting) the posting's
+    stage profile is stored on the run.
+    """
+    run.ensure_calculated()
+    if profile is None:
+        profile = getattr(settings, "PAYROLL_PROFILE", False)
+    with profiling(profile) as profiled, transaction.atomic():
+        claimed = PayrollRun.objects.filter(pk=run.pk, status="Calculated").update(
+            status="Posted"
+        )
+        if not claimed:
+            raise ValidationError(f"Payroll run {run} is no longer Calculated.")
+        with stage("snapshot"):
+            snapshot = get_snapshot(run.payrollCode)
+        with stage("post.aggregate") as step:
+            rows = (
+                PayrollRunLine.objects.filter(run=run)
+                .values_list("employee_id", "edDefinition_id", "amount")
+                .iterator(chunk_size=READ_CHUNK_SIZE)
+            )
+            totals = aggregate(
+                rows if profiled is None else _counted(rows, step),
+                employee_posting_groups(run.payrollCode),
+                snapshot,
+            )
+        document = document_no(run)
+        with stage("post.journal", count=len(totals)):
+            lines = journal_lines(
+                totals, snapshot, document, posting_date or run.period
+            )
+
+        if sum((line.amount for line in lines), ZERO):
+            raise ValidationError(f"Journal for {document} does not balance.")
+        with stage("post.write", count=len(lines)):
+            GeneralJournalLine.objects.filter(
+                documentNo=document, sourceCode=SOURCE_CODE
+            ).delete()
+            GeneralJournalLine.objects.bulk_create(lines, batch_size=INSERT_BATCH_SIZE)
+    run.status = "Posted"
+    if profiled is not None:
+        run.attach_profile("post", profiled)
+        run.save(update_fields=["profile"])
+    return lines
@@ -0,0 +1,276 @@
+"""
+Payroll run pipeline.
+
+Employees of a ``Payroll`` are loaded with one query, grouped by
+``calculationScheme`` and split into chunks. Each chunk is evaluated with the
+scheme's compiled plan from the payroll's setup snapshot
+(``payroll_setup.snapshot``) using ``payroll_setup.batch.evaluate_batch``, in
+a process pool when more than one worker is requested, and the resulting
+lines are written with ``bulk_create``. An incremental rerun of a calculated
+run recomputes only the employees marked dirty since it started
+(``payroll.changes``). Employees with the same scheme and basic pay share
+one memoized evaluation (``payroll_setup.memo``).
+
+With profiling on (``execute_run(profile=True)`` or the ``PAYROLL_PROFILE``
+setting) the stages of the run are timed with ``core.profiling``, worker
+processes included, and the profile is stored in ``PayrollRun.profile``.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+
+from core.profiling import active, profiling, stage
+from employee.models import Employee
+from payroll_setup.memo import ResultCache, evaluate_memoized
+from payroll_setup.snapshot import get_snapshot
+
+from .changes import dirty_employee_ids, prune_marks
+from .models import PayrollRun, PayrollRunLine
+
+CHUNK_SIZE = 2000
+INSERT_BATCH_SIZE = 5000
+
+# Setup snapshot shared with worker processes by the pool initializer
+_snapshot = None
+# Whether workers profile their chunks
+_profile = False
+# Memoized line results of this process (each worker has its own)
+_cache = ResultCache()
+
+
+def cache_stats() -> dict:
+    """Hit/miss counters of the result cache, including workers' counts."""
+    return _cache.stats()
+
+
+def load_employees(payroll, snapshot, employee_ids=None, on=None) -> dict:
+    """
+    Return ``{scheme id: [(employee id, basic pay), ...]}`` with one query,
+    with scale amounts effective on ``on``. Employees on a scheme of another
+    payroll are left out.
+    """
+    queryset = Employee.objects.filter(
+        payrollCode=payroll, calculationScheme__isnull=False
+    )
+    if employee_ids is not None:
+        queryset = queryset.filter(pk__in=employee_ids)
+    rows = [
+        row
+        for row in queryset.order_by("pk").values_list(
+            "pk", "calculationScheme_id", "basicPay", "fixedPay", "scaleStep_id"
+        )
+        if row[1] in snapshot.schemes
+    ]
+    amounts = snapshot.scales.resolve((row[2:] for row in rows), on)
+    groups = {}
+    for (pk, scheme_id, *_), amount in zip(rows, amounts):
+        groups.setdefault(scheme_id, []).append((pk, amount))
+    return groups
+
+
+def partition(groups, chunk_size: int) -> list:
+    """Split ``{scheme id: rows}`` into ``[(scheme id, rows), ...]`` chunks."""
+    chunks = []
+    for scheme_id, rows in groups.items():
+        for start in range(0, len(rows), chunk_size):
+            chunks.append((scheme_id, rows[start : start + chunk_size]))
+    return chunks
+
+
+def _scope(snapshot, key, month) -> tuple:
+    return (snapshot.payrollCode, snapshot.version, snapshot.rateKey, key, month)
+
+
+def evaluate_chunk(plan, basic_code, rows, month, cache=None, scope=()) -> list:
+    """Return ``[(employee id, edCode, amount), ...]`` for one chunk."""
+    codes = (basic_code,) if basic_code else ()
+    vectors = [(amount,) if basic_code else () for _, amount in rows]
+    with stage("evaluate", plan.schemeId, len(rows)):
+        results = evaluate_memoized(plan, codes, vectors, month, cache, scope)
+        lines = []
+        for (employee_id, _), result in zip(rows, results):
+            for code, amount in result:
+                lines.append((employee_id, code, amount))
+    return lines
+
+
+def _init_worker(snapshot, profile=False):
+    global _snapshot, _profile
+    import django
+
+    django.setup()
+    _snapshot = snapshot
+    _profile = profile
+
+
+def _evaluate_in_worker(task):
+    key, rows, month = task
+    plan, basic_code = _snapshot.schemes[key]
+    hits, misses = _cache.hits, _cache.misses
+    with profiling(_profile) as profile:
+        lines = evaluate_chunk(
+            plan, basic_code, rows, month, _cache, _scope(_snapshot, key, month)
+        )
+    totals = profile.totals if profile is not None else None
+    return lines, _cache.hits - hits, _cache.misses - misses, totals
+
+
+def _collect(results):
+    profile = active()
+    for lines, hits, misses, totals in results:
+        _cache.record(hits, misses)
+        if totals is not None and profile is not None:
+            profile.merge(totals)
+        yield lines
+
+
+@contextmanager
+def calculation_results(snapshot, chunks, month, workers: int = 1):
+    """
+    Yield an iterator of result lists per ``(scheme key, rows)`` chunk (see
+    ``SetupSnapshot.scheme_key``), computed in a process pool when
+    ``workers > 1``. Enter it before opening the write transaction.
+    """
+    if workers <= 1 or len(chunks) <= 1:
+        yield (
+            evaluate_chunk(
+                *snapshot.schemes[key],
+                rows,
+                month,
+                _cache,
+                _scope(snapshot, key, month),
+            )
+            for key, rows in chunks
+        )
+        return
+    # Forked workers must not share the parent's database connections
+    connections.close_all()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(snapshot, active() is not None),
+    ) as pool:
+        tasks = [(key, rows, month) for key, rows in chunks]
+        yield _collect(pool.map(_evaluate_in_worker, tasks))
+
+
+def write_lines(run, results, employee_ids=None, progress=None) -> int:
+    """
+    Replace ``run``'s lines (or those of ``employee_ids``) with ``results``,
+    calling ``progress(chunks written)`` after each chunk.
+    """
+    written = 0
+    with transaction.atomic():
+        existing = PayrollRunLine.objects.filter(run=run)
+        if employee_ids is not None:
+            existing = existing.filter(employee_id__in=employee_ids)
+        with stage("delete"):
+            existing.delete()
+        for index, lines in enumerate(results, 1):
+            with stage("write", count=len(lines)):
+                PayrollRunLine.objects.bulk_create(
+                    [
+                        PayrollRunLine(
+                            run=run,
+                            employee_id=employee_id,
+                            edDefinition_id=code,
+                            amount=amount,
+                        )
+                        for employee_id, code, amount in lines
+                    ],
+                    batch_size=INSERT_BATCH_SIZE,
+                )
+            written += len(lines)
+            if progress is not None:
+                progress(index)
+    return written
+
+
+def execute_run(
+    run: PayrollRun,
+    chunk_size: int = CHUNK_SIZE,
+    workers: int | None = None,
+    incremental: bool = False,
+    progress=None,
+    profile: bool | None = None,
+) -> PayrollRun:
+    """
+    Calculate every employee of ``run.payrollCode`` and store the lines.
+    With ``incremental`` a calculated run only recomputes and rewrites the
+    employees changed since it last started; other runs are calculated in
+    full. Posted and running runs are refused with a ``ValidationError``.
+    ``progress(done, total)`` is called with chunk counts. With
+    ``profile`` (default: the ``PAYROLL_PROFILE`` setting) the run's stage
+    profile is stored under ``run.profile["calculate"]``.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if profile is None:
+        profile = getattr(settings, "PAYROLL_PROFILE", False)
+    run.ensure_editable()
+    # Taken before reading the marks: a change committed after that read is
+    # marked later than the new start and picked up by the next rerun
+    started = timezone.now()
+    employee_ids = None
+    if incremental and run.status == "Calculated" and run.startedAt:
+        employee_ids = dirty_employee_ids(run.startedAt)
+    run.startedAt = started
+    run.finishedAt = None
+    # Claim the run: a concurrent calculation or posting may have changed it
+    claimed = (
+        PayrollRun.objects.filter(pk=run.pk)
+        .exclude(status__in=PayrollRun.LOCKED)
+        .update(status="Running", startedAt=run.startedAt, finishedAt=None)
+    )
+    if not claimed:
+        run.refresh_from_db(fields=["status"])
+        run.ensure_editable()
+    run.status = "Running"
+    with profiling(profile) as profiled:
+        try:
+            with stage("snapshot"):
+                # Foreign-currency lookups convert at the rates of the run's period
+                snapshot = get_snapshot(run.payrollCode, run.period)
+            with stage("load_employees") as step:
+                groups = load_employees(
+                    run.payrollCode, snapshot, employee_ids, run.period
+                )
+                step.count = sum(len(rows) for rows in groups.values())
+            # Each scheme runs the version valid in the run's period
+            chunks = [
+                (snapshot.scheme_key(scheme_id, run.period), rows)
+                for scheme_id, rows in partition(groups, chunk_size)
+            ]
+            month = run.period.month
+            if progress is not None:
+                progress(0, len(chunks))
+            with calculation_results(snapshot, chunks, month, workers) as results:
+                written = write_lines(run, results, employee_ids, progress)
+            if employee_ids is None:
+                run.lineCount = written
+                run.employeeCount = sum(len(rows) for rows in groups.values())
+            else:
+                run.lineCount = PayrollRunLine.objects.filter(run=run).count()
+                run.employeeCount = Employee.objects.filter(
+                    payrollCode=run.payrollCode,
+                    calculationScheme__in=list(snapshot.schemes),
+                ).count()
+            run.status = "Calculated"
+        finally:
+            # Interrupted runs (KeyboardInterrupt, SystemExit) must not stay locked
+            if run.status == "Running":
+                run.status = "Failed"
+            run.finishedAt = timezone.now()
+            fields = ["status", "employeeCount", "lineCount", "startedAt", "finishedAt"]
+            if profiled is not None:
+                profiled.finish()
+                run.attach_profile("calculate", profiled)
+                fields.append("profile")
+            run.save(update_fields=fields)
+    prune_marks()
+    return run
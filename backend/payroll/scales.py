@@ -0,0 +1,112 @@
+"""
+Salary scale resolution.
+
+``ScaleMatrix`` holds every salary scale step of a payroll in parallel
+tuples indexed by position: step id, scale code, step code and the step's
+amount history (``SalaryScaleStepAmount`` effective dates and amounts, with
+``SalaryScaleStep.amount`` as the amount before the first revision). It is
+built with two queries and lives in the setup snapshot, so resolving a
+Scale employee's basic pay is a dict lookup and a bisection, and a scale
+revision is a new dated amount rather than an update of every employee.
+"""
+
+import datetime
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.db.models import Q
+
+from .models import SalaryScaleStep, SalaryScaleStepAmount
+
+ZERO = Decimal("0")
+
+
+class ScaleMatrix:
+    __slots__ = ("stepIds", "scaleCodes", "stepCodes", "dates", "amounts", "_index")
+
+    def __init__(self, steps, revisions=()):
+        """
+        ``steps`` are ``(id, scale code, step code, amount)`` rows and
+        ``revisions`` ``(step id, effective date, amount)`` rows.
+        """
+        history = {}
+        for step_id, effective, amount in sorted(revisions, key=lambda r: r[:2]):
+            history.setdefault(step_id, []).append((effective, amount))
+        step_ids, scale_codes, step_codes, dates, amounts = [], [], [], [], []
+        for step_id, scale_code, step_code, amount in sorted(steps, key=lambda r: r[0]):
+            revised = history.get(step_id, ())
+            step_ids.append(step_id)
+            scale_codes.append(scale_code)
+            step_codes.append(step_code)
+            dates.append((datetime.date.min, *(d for d, _ in revised)))
+            amounts.append((amount, *(a for _, a in revised)))
+        self.stepIds = tuple(step_ids)
+        self.scaleCodes = tuple(scale_codes)
+        self.stepCodes = tuple(step_codes)
+        self.dates = tuple(dates)
+        self.amounts = tuple(amounts)
+        self._index = {step_id: i for i, step_id in enumerate(self.stepIds)}
+
+    @classmethod
+    def for_payroll(cls, payroll):
+        payroll_filter = Q(payrollCode=payroll) | Q(payrollCode__isnull=True)
+        steps = SalaryScaleStep.objects.filter(payroll_filter).values_list(
+            "pk", "scale__code", "code", "amount"
+        )
+        revisions = SalaryScaleStepAmount.objects.filter(
+            Q(step__payrollCode=payroll) | Q(step__payrollCode__isnull=True)
+        ).values_list("step_id", "effectiveDate", "amount")
+        return cls(steps, revisions)
+
+    def __len__(self) -> int:
+        return len(self.stepIds)
+
+    def __contains__(self, step_id) -> bool:
+        return step_id in self._index
+
+    def amount(self, step_id, on=None) -> Decimal | None:
+        """The step's amount effective on ``on`` (the latest when ``None``)."""
+        index = self._index.get(step_id)
+        if index is None:
+            return None
+        amounts = self.amounts[index]
+        if on is None:
+            return amounts[-1]
+        return amounts[bisect_right(self.dates[index], on) - 1]
+
+    def by_code(self, on=None) -> dict:
+        """``{(scale code, step code): amount}`` effective on ``on``."""
+        return {
+            (scale, step): self.amount(step_id, on)
+            for step_id, scale, step in zip(
+                self.stepIds, self.scaleCodes, self.stepCodes
+            )
+        }
+
+    def resolve(self, rows, on=None) -> list:
+        """Basic pay for ``(basicPay, fixedPay, scaleStep id)`` rows."""
+        # Each step is looked up once however many employees share it
+        steps = {}
+        result = []
+        for basic_type, fixed_pay, step_id in rows:
+            if basic_type == "Scale":
+                if step_id not in steps:
+                    steps[step_id] = self.amount(step_id, on) or ZERO
+                result.append(steps[step_id])
+            elif basic_type == "Fixed":
+                result.append(fixed_pay or ZERO)
+            else:
+                result.append(ZERO)
+        return result
+
+
+def resolve_basic_pay(payroll, employees, on=None, matrix=None) -> dict:
+    """
+    Return ``{employee id: basic pay}`` for an ``Employee`` queryset of
+    ``payroll`` with one query (plus two to build the matrix if not given).
+    """
+    if matrix is None:
+        matrix = ScaleMatrix.for_payroll(payroll)
+    rows = list(employees.values_list("pk", "basicPay", "fixedPay", "scaleStep_id"))
+    amounts = matrix.resolve((row[1:] for row in rows), on)
+    return {row[0]: amount for row, amount in zip(rows, amounts)}
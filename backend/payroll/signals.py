@@ -0,0 +1,30 @@
+from django.db.models.signals import post_save, pre_delete
+
+from . import changes
+
+# Rows whose edits change calculation results. Deletes are handled before
+# the row goes so that its references can still be followed; employees
+# themselves cannot be deleted once they have run lines.
+DIRTY_SENDERS = (
+    "financial.ExchangeRate",
+    "payroll.SalaryScaleStep",
+    "payroll.SalaryScaleStepAmount",
+    "payroll_setup.CalculationHeader",
+    "payroll_setup.CalculationScheme",
+    "payroll_setup.CalculationSchemeVersion",
+    "payroll_setup.EdDefinition",
+    "payroll_setup.Lookup",
+    "payroll_setup.LookupLine",
+)
+
+
+def mark_affected_employees(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    changes.mark_dirty(changes.affected_employees(instance))
+
+
+post_save.connect(mark_affected_employees, sender="employee.Employee")
+for sender in DIRTY_SENDERS:
+    post_save.connect(mark_affected_employees, sender=sender)
+    pre_delete.connect(mark_affected_employees, sender=sender)
@@ -0,0 +1,45 @@
+from django.shortcuts import get_object_or_404
+
+from core.api import ReadEndpoint
+
+from .models import PayrollRun, PayrollRunLine
+
+
+class PayrollRunListView(ReadEndpoint):
+    model = PayrollRun
+    fields = {
+        "id": "pk",
+        "payrollCode": "payrollCode__code",
+        "period": "period",
+        "description": "description",
+        "status": "status",
+        "employeeCount": "employeeCount",
+        "lineCount": "lineCount",
+        "startedAt": "startedAt",
+        "finishedAt": "finishedAt",
+    }
+    filters = {"payroll": "payrollCode__code", "status": "status"}
+
+
+class PayrollRunLineListView(ReadEndpoint):
+    model = PayrollRunLine
+    fields = {
+        "id": "pk",
+        "employee": "employee_id",
+        "employeeNo": "employee__employeeNo",
+        "edCode": "edDefinition_id",
+        "amount": "amount",
+    }
+    default_fields = ("id", "employeeNo", "edCode", "amount")
+    filters = {"employeeNo": "employee__employeeNo", "edCode": "edDefinition_id"}
+
+    def get_queryset(self, request, run_id):
+        return PayrollRunLine.objects.filter(run=run_id)
+
+    def get_version(self, request, queryset, run_id):
+        # Every (re)calculation of a run stamps it when it finishes
+        run = get_object_or_404(
+            PayrollRun.objects.values_list("status", "finishedAt", "lineCount"),
+            pk=run_id,
+        )
+        return list(run)
@@ -1,15 +1,33 @@
-from django.contrib import admin
+import datetime
+import json
+
+from django.contrib import admin, messages
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.urls import path
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_http_methods
 
 from .models import (
     CalculationHeader,
     CalculationScheme,
+    CalculationSchemeVersion,
     EdDefinition,
     EdPostingGroup,
     EmployeePostingGroup,
+    Lookup,
+    LookupLine,
     PayslipGroup,
     PayrollPostingSetup,
 )
-from .forms import CalculationSchemeForm
+from .forms import (
+    CalculationSchemeForm,
+    CalculationSchemeInlineForm,
+    CalculationSchemeInlineFormSet,
+    LabelledAutocompleteSelect,
+)
+from .graph import refresh_line_order
 
 
 @admin.register(PayslipGroup)
@@ -21,6 +39,57 @@ class PayslipGroupAdmin(admin.ModelAdmin):
     ordering = ("code",)
 
 
+class LookupLineInline(admin.TabularInline):
+    model = LookupLine
+    extra = 0
+    fields = ("lowerAmount", "percent", "extractAmount")
+    ordering = ("lowerAmount",)
+
+
+@admin.register(Lookup)
+class LookupAdmin(admin.ModelAdmin):
+    list_display = (
+        "code",
+        "description",
+        "type",
+        "localServiceTax",
+        "payee",
+        "minExtractAmountLCY",
+        "maxExtractAmountLCY",
+        "currencyCode",
+        "payrollCode",
+    )
+    search_fields = ("code", "description")
+    list_filter = ("type", "localServiceTax", "payee", "payrollCode")
+    autocomplete_fields = ("payrollCode",)
+    ordering = ("code",)
+    inlines = [LookupLineInline]
+
+    fieldsets = (
+        (
+            None,
+            {
+                "fields": ("code", "description"),
+            },
+        ),
+        (
+            "General",
+            {
+                "fields": (
+                    ("type", "payrollCode"),
+                    ("localServiceTax", "payee"),
+                    ("minExtractAmountLCY", "maxExtractAmountLCY"),
+                    ("currencyCode",),
+                ),
+                "classes": ("gen-grid",),
+            },
+        ),
+    )
+
+    class Media:
+        css = {"all": ("payroll_setup/admin.css",)}
+
+
 @admin.register(CalculationScheme)
 class CalculationSchemeAdmin(admin.ModelAdmin):
     form = CalculationSchemeForm
@@ -47,6 +116,14 @@ class CalculationSchemeAdmin(admin.ModelAdmin):
         "payrollEntry__edCode",
     )
     list_filter = ("scheme", "calculation")
+    list_select_related = (
+        "scheme",
+        "payrollEntry",
+        "calculationLine__scheme",
+        "calculateTo__scheme",
+        "lookUp",
+        "payrollLines",
+    )
     autocomplete_fields = ("scheme", "calculationLine", "payrollEntry", "payrollLines")
     ordering = ("scheme", "lineNo")
 
@@ -96,8 +173,9 @@ class CalculationSchemeAdmin(admin.ModelAdmin):
 class CalculationSchemeInline(admin.StackedInline):
     model = CalculationScheme
     extra = 0
-    form = CalculationSchemeForm
-    autocomplete_fields = ("calculationLine", "payrollEntry")
+    form = CalculationSchemeInlineForm
+    formset = CalculationSchemeInlineFormSet
+    autocomplete_fields = ("payrollEntry", "payrollLines")
     fieldsets = (
         (
             None,
@@ -140,15 +218,176 @@ class CalculationSchemeInline(admin.StackedInline):
     class Media:
         css = {"all": ("payroll_setup/admin.css",)}
 
+    def get_queryset(self, request):
+        # Line __str__ (the inline heading) reads the scheme
+        return super().get_queryset(request).select_related("scheme")
+
+    def get_formset(self, request, obj=None, **kwargs):
+        self._header = obj
+        self._lines = None
+        self._ed_labels = None
+        return super().get_formset(request, obj, **kwargs)
+
+    def scheme_lines(self) -> list:
+        """``(lineNo, pk, label)`` of the header's lines, loaded once."""
+        if self._lines is None:
+            self._lines = [
+                (line.lineNo, line.pk, str(line))
+                for line in CalculationScheme.objects.select_related("scheme")
+                .filter(scheme=self._header)
+                .order_by("lineNo")
+            ]
+        return self._lines
+
+    def ed_labels(self) -> dict:
+        """Labels of the EDs the header's lines read or write, loaded once."""
+        if self._ed_labels is None:
+            eds = EdDefinition.objects.filter(
+                Q(calculationSchemes__scheme=self._header)
+                | Q(outputCalculationSchemes__scheme=self._header)
+            ).distinct()
+            self._ed_labels = {str(ed.pk): str(ed) for ed in eds}
+        return self._ed_labels
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name in self.autocomplete_fields:
+            kwargs["widget"] = LabelledAutocompleteSelect(
+                db_field, self.admin_site, self.ed_labels(), using=kwargs.get("using")
+            )
+        formfield = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        if formfield is None or db_field.name in self.autocomplete_fields:
+            return formfield
+        if db_field.name in ("calculationLine", "calculateTo"):
+            # Lines can only refer to lines of the same scheme. The line
+            # list is shared; CalculationSchemeInlineForm narrows
+            # calculationLine to the higher lines per form.
+            formfield.queryset = CalculationScheme.objects.filter(scheme=self._header)
+            formfield.lines = self.scheme_lines()
+            formfield.choices = [("", formfield.empty_label)] + [
+                (pk, label) for _, pk, label in formfield.lines
+            ]
+        else:
+            # Every line form offers the same choices: evaluate them once
+            # per formset instead of once per form
+            formfield.choices = list(formfield.choices)
+        return formfield
+
+
+class CalculationSchemeVersionInline(admin.TabularInline):
+    model = CalculationSchemeVersion
+    extra = 0
+    fields = ("validFrom", "basicPayEntry", "line_count", "createdAt")
+    readonly_fields = fields
+    ordering = ("-validFrom",)
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description="Lines")
+    def line_count(self, obj):
+        return len(obj.lineOrder)
+
 
 @admin.register(CalculationHeader)
 class CalculationHeaderAdmin(admin.ModelAdmin):
-    list_display = ("schemeId", "description", "payrollCode")
+    list_display = ("schemeId", "description", "payrollCode", "basicPayEntry")
     search_fields = ("schemeId", "description", "payrollCode__code")
     list_filter = ("payrollCode",)
-    autocomplete_fields = ("payrollCode",)
+    autocomplete_fields = ("payrollCode", "basicPayEntry")
     ordering = ("schemeId",)
-    inlines = [CalculationSchemeInline]
+    inlines = [CalculationSchemeInline, CalculationSchemeVersionInline]
+    actions = ["publish_next_month"]
+    change_form_template = "admin/payroll_setup/calculationheader/change_form.html"
+
+    def change_view(self, request, object_id, form_url="", extra_context=None):
+        # ?profile=1 evaluates the lines for a sample of the scheme's employees
+        if request.method == "GET" and request.GET.get("profile"):
+            from .profiler import profile_scheme
+
+            header = self.get_object(request, object_id)
+            if header is not None:
+                try:
+                    extra_context = {
+                        **(extra_context or {}),
+                        "line_profile": profile_scheme(header),
+                    }
+                except ValidationError as exc:
+                    self.message_user(
+                        request,
+                        f"Cannot profile {header.schemeId}: {'; '.join(exc.messages)}",
+                        level=messages.ERROR,
+                    )
+        return super().change_view(request, object_id, form_url, extra_context)
+
+    @admin.action(description="Publish lines as a version from next month")
+    def publish_next_month(self, request, queryset):
+        from .versions import publish_version
+
+        today = datetime.date.today()
+        valid_from = (today.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+        for header in queryset:
+            try:
+                version = publish_version(header, valid_from)
+            except ValidationError as exc:
+                self.message_user(
+                    request,
+                    f"{header.schemeId}: {'; '.join(exc.messages)}",
+                    level=messages.ERROR,
+                )
+            else:
+                self.message_user(
+                    request,
+                    f"{header.schemeId}: version valid from {version.validFrom}.",
+                    level=messages.SUCCESS,
+                )
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Lines were validated as a graph by the inline formset
+        refresh_line_order(form.instance)
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path(
+                "<path:object_id>/lines/",
+                self.admin_site.admin_view(self.lines_view),
+                name="payroll_setup_calculationheader_lines",
+            ),
+        ]
+        return custom_urls + urls
+
+    @method_decorator(require_http_methods(["GET", "POST", "PUT"]))
+    def lines_view(self, request, object_id):
+        """
+        GET returns the scheme's lines as JSON; PUT/POST ``{"lines": [...]}``
+        replaces them all at once (see ``payroll_setup.editor``).
+        """
+        from .editor import save_lines, serialize_lines
+
+        header = self.get_object(request, object_id)
+        if header is None:
+            raise Http404
+        if request.method == "GET":
+            if not self.has_view_or_change_permission(request, header):
+                raise PermissionDenied
+            return JsonResponse({"lines": serialize_lines(header)})
+
+        if not self.has_change_permission(request, header):
+            raise PermissionDenied
+        try:
+            payload = json.loads(request.body)
+        except (UnicodeDecodeError, ValueError):
+            return JsonResponse({"errors": ["Invalid JSON."]}, status=400)
+        if not isinstance(payload, dict) or "lines" not in payload:
+            return JsonResponse({"errors": ['Expected {"lines": [...]}.']}, status=400)
+        try:
+            counts = save_lines(header, payload["lines"])
+        except ValidationError as exc:
+            errors = exc.message_dict if hasattr(exc, "error_dict") else exc.messages
+            return JsonResponse({"errors": errors}, status=400)
+        return JsonResponse({**counts, "lines": serialize_lines(header)})
 
 
 @admin.register(EdPostingGroup)
@@ -252,6 +491,13 @@ class PayrollPostingSetupAdmin(admin.ModelAdmin):
         "employeePostingGroup",
         "edPostingGroup",
     )
+    list_select_related = (
+        "employeePostingGroup",
+        "edPostingGroup",
+        "debitAccount",
+        "creditAccount",
+    )
+    ordering = ("employeePostingGroup", "edPostingGroup")
     autocomplete_fields = (
         "employeePostingGroup",
         "edPostingGroup",
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class PayrollSetupConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'payroll_setup'
+
+    def ready(self):
+        from . import signals  # noqa: F401
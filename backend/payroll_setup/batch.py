@@ -0,0 +1,198 @@
+"""
+Batch evaluation of a compiled calculation scheme.
+
+All employees sharing a ``calculationScheme`` run the same plan, so the plan
+is evaluated once over column arrays (one row per employee, one column per
+input ED) with NumPy. Every rounding decision that lands within float
+tolerance of a boundary marks the row as ambiguous; ambiguous rows are
+re-evaluated on the scalar Decimal path, so batch results always match
+``CompiledScheme.evaluate`` to the cent.
+"""
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from core.profiling import stage
+
+from .engine import (
+    IN_ENTRY,
+    IN_LINE,
+    OP_DIVIDE,
+    OP_HIGHEST,
+    OP_LOOKUP,
+    OP_LOWEST,
+    OP_MULTIPLY,
+    OP_PERCENT,
+    OP_SUBTRACT,
+    ROUND_NEAREST,
+    ROUND_UP,
+    ZERO,
+)
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+CENT = Decimal("0.01")
+
+# Distance (in rounding units) from a boundary below which float results are
+# not trusted to round the same way as Decimal.
+_TOLERANCE = 1e-6
+_RELATIVE_TOLERANCE = 1e-12
+
+
+def to_cents(value: Decimal) -> Decimal:
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def near_boundary(distance, units):
+    """Rows whose ``distance`` to a rounding or bracket boundary is untrusted."""
+    return distance < _TOLERANCE + _RELATIVE_TOLERANCE * np.abs(units)
+
+
+def round_array(values, mode: int, precision: float):
+    """Vectorised ``engine.round_amount``; returns ``(rounded, ambiguous)``."""
+    units = values / precision
+    if mode == ROUND_NEAREST:
+        magnitude = np.abs(units)
+        whole = np.floor(magnitude)
+        ambiguous = near_boundary(np.abs(magnitude - whole - 0.5), units)
+        rounded = np.copysign(np.floor(magnitude + 0.5), units)
+    else:
+        # Includes exact float integers: the Decimal value may lie either side
+        ambiguous = near_boundary(np.abs(units - np.rint(units)), units)
+        rounded = np.ceil(units) if mode == ROUND_UP else np.floor(units)
+    return rounded * precision, ambiguous
+
+
+def cents_array(values):
+    """Convert float amounts to integer cents; returns ``(cents, ambiguous)``."""
+    scaled = values * 100.0
+    magnitude = np.abs(scaled)
+    whole = np.floor(magnitude)
+    ambiguous = near_boundary(np.abs(magnitude - whole - 0.5), scaled)
+    cents = np.copysign(np.floor(magnitude + 0.5), scaled).astype(np.int64)
+    return cents, ambiguous
+
+
+def evaluate_arrays(plan, columns, rows: int, month: int | None = None):
+    """
+    Evaluate ``plan`` over float columns.
+
+    Returns ``(outputs, ambiguous)`` where ``outputs`` maps each output ED to a
+    float array and ``ambiguous`` flags rows needing the Decimal path.
+    """
+    zero = np.zeros(rows)
+    ambiguous = np.zeros(rows, dtype=bool)
+    steps = plan.steps
+    values = [zero] * len(steps)
+    carried = [None] * len(steps)
+    amounts = dict(columns)
+    outputs = {}
+    for (
+        slot,
+        kind,
+        ref,
+        op,
+        operand,
+        lookup,
+        target,
+        rmode,
+        precision,
+        output,
+    ) in steps:
+        if kind == IN_LINE:
+            base = values[ref]
+        elif kind == IN_ENTRY:
+            base = amounts.get(ref, zero)
+        else:
+            base = zero
+        if carried[slot] is not None:
+            base = base + carried[slot]
+
+        factor = float(operand)
+        if op == OP_MULTIPLY:
+            result = base * factor
+        elif op == OP_DIVIDE:
+            result = base / factor if factor else zero
+        elif op == OP_PERCENT:
+            result = base * factor / 100.0
+        elif op == OP_HIGHEST:
+            result = np.maximum(base, factor)
+        elif op == OP_LOWEST:
+            result = np.minimum(base, factor)
+        elif op == OP_LOOKUP and lookup is not None:
+            with stage("lookup", plan.schemeId, rows):
+                result, near = lookup.resolve_array(base, month)
+            if near is not None:
+                ambiguous |= near
+        else:
+            result = base
+
+        if rmode and precision:
+            result, near = round_array(result, rmode, float(precision))
+            ambiguous |= near
+        values[slot] = result
+
+        if target is not None:
+            contribution = -result if op == OP_SUBTRACT else result
+            if carried[target] is None:
+                carried[target] = contribution
+            else:
+                carried[target] = carried[target] + contribution
+        if output:
+            amounts[output] = amounts.get(output, zero) + result
+            outputs[output] = outputs.get(output, zero) + result
+    return outputs, ambiguous
+
+
+def _decimal(value) -> Decimal:
+    if isinstance(value, Decimal):
+        return value
+    if value is None:
+        return ZERO
+    return Decimal(str(value))
+
+
+def _evaluate_row(plan, columns, row: int, month: int | None) -> dict:
+    inputs = {code: _decimal(column[row]) for code, column in columns.items()}
+    outputs = plan.evaluate(inputs, month)
+    return {code: to_cents(amount) for code, amount in outputs.items()}
+
+
+def evaluate_batch(
+    plan, columns, rows: int | None = None, month: int | None = None
+) -> dict:
+    """
+    Evaluate ``plan`` for many employees at once.
+
+    ``columns`` maps input ED codes to equally long sequences (one value per
+    employee). Returns ``{output edCode: [Decimal, ...]}`` rounded to cents,
+    identical to running ``plan.evaluate`` row by row.
+    """
+    if rows is None:
+        rows = len(next(iter(columns.values()))) if columns else 0
+    if np is None:
+        results = {code: [ZERO] * rows for code in plan.outputs}
+        for row in range(rows):
+            for code, amount in _evaluate_row(plan, columns, row, month).items():
+                results[code][row] = amount
+        return results
+
+    arrays = {
+        code: np.asarray([float(v or 0) for v in column], dtype=float)
+        for code, column in columns.items()
+    }
+    outputs, ambiguous = evaluate_arrays(plan, arrays, rows, month)
+
+    results = {}
+    for code in plan.outputs:
+        cents, near = cents_array(outputs.get(code, np.zeros(rows)))
+        ambiguous |= near
+        results[code] = [Decimal(int(c)).scaleb(-2) for c in cents]
+
+    for row in np.flatnonzero(ambiguous):
+        exact = _evaluate_row(plan, columns, int(row), month)
+        for code in plan.outputs:
+            results[code][row] = exact.get(code, ZERO)
+    return results
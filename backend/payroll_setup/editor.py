@@ -0,0 +1,299 @@
+"""
+Bulk line editor for calculation schemes.
+
+A whole scheme travels as JSON, one object per line. Lines refer to each
+other by ``lineNo``, EDs by ``edCode`` and lookups by ``code``::
+
+    {"lines": [{"lineNo": 10, "description": "Net", "payrollLines": "NET"},
+               {"lineNo": 20, "description": "Basic", "Input": "Payroll Entry",
+                "payrollEntry": "BASIC", "calculation": "Add",
+                "calculateTo": 10}]}
+
+``save_lines`` validates every line and the scheme graph in memory (EDs and
+lookups are loaded once), then applies the difference to the saved lines
+with bulk operations in one transaction. Lines missing from the payload are
+deleted with their delete signals. Query count does not depend on the
+number of lines created, updated or kept.
+"""
+
+from decimal import Decimal, InvalidOperation
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import snapshot
+from .graph import order_lines
+from .models import (
+    CalculationHeader,
+    CalculationScheme,
+    EdDefinition,
+    Lookup,
+    input_errors,
+)
+
+BATCH_SIZE = 1000
+
+# Plain fields, compared and written as they are
+VALUE_FIELDS = (
+    "lineNo",
+    "description",
+    "Input",
+    "calculation",
+    "roundType",
+    "roundPrecision",
+    "divideMultiply",
+)
+# Foreign keys given by natural key (EDs by edCode, lookups by code)
+CODE_FIELDS = ("payrollEntry", "payrollLines", "lookUp")
+LINE_FIELDS = ("calculationLine", "calculateTo")
+FIELDS = VALUE_FIELDS + tuple(f"{name}_id" for name in CODE_FIELDS + LINE_FIELDS)
+DEFAULTS = {
+    name: CalculationScheme._meta.get_field(name).get_default() for name in VALUE_FIELDS
+}
+
+
+def _choices(name) -> set:
+    return {value for value, _ in CalculationScheme._meta.get_field(name).choices}
+
+
+def _decimal(name, value):
+    field = CalculationScheme._meta.get_field(name)
+    amount = Decimal(str(value)).quantize(Decimal(1).scaleb(-field.decimal_places))
+    if len(amount.as_tuple().digits) > field.max_digits:
+        raise InvalidOperation
+    return amount
+
+
+def _line_no(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _code(name, item, messages):
+    """The natural key given for ``name``, or ``None`` (noting a bad type)."""
+    code = item.get(name) or None
+    if code is not None and not isinstance(code, str):
+        messages.append(f"{name} must be a code.")
+        return None
+    return code
+
+
+def serialize_lines(header) -> list:
+    """Return ``header``'s lines in the payload format, with one query."""
+    rows = list(
+        CalculationScheme.objects.filter(scheme=header)
+        .order_by("lineNo")
+        .values(
+            "id",
+            *VALUE_FIELDS,
+            "payrollEntry__edCode",
+            "payrollLines__edCode",
+            "lookUp_id",
+            "calculationLine_id",
+            "calculateTo_id",
+        )
+    )
+    line_nos = {row["id"]: row["lineNo"] for row in rows}
+    return [
+        {
+            **{name: row[name] for name in VALUE_FIELDS},
+            "roundPrecision": str(row["roundPrecision"]),
+            "divideMultiply": str(row["divideMultiply"]),
+            "payrollEntry": row["payrollEntry__edCode"],
+            "payrollLines": row["payrollLines__edCode"],
+            "lookUp": row["lookUp_id"],
+            "calculationLine": line_nos.get(row["calculationLine_id"]),
+            "calculateTo": line_nos.get(row["calculateTo_id"]),
+        }
+        for row in rows
+    ]
+
+
+def parse_lines(payload) -> tuple:
+    """
+    Check every payload line on its own. Returns ``(lines, errors)`` where
+    lines are dicts of ``VALUE_FIELDS``, ED codes and ids, lookup codes and
+    referenced line numbers, and errors are ``{lineNo or "#index": [messages]}``.
+    """
+    if not isinstance(payload, list):
+        raise ValidationError("Expected a list of lines.")
+    ed_ids = dict(EdDefinition.objects.values_list("edCode", "pk"))
+    lookup_codes = set(Lookup.objects.values_list("code", flat=True))
+    choices = {name: _choices(name) for name in ("Input", "calculation", "roundType")}
+    max_description = CalculationScheme._meta.get_field("description").max_length
+
+    lines = []
+    errors = {}
+    seen = set()
+    for index, item in enumerate(payload):
+        messages = []
+        if not isinstance(item, dict):
+            errors[f"#{index}"] = ["Expected an object."]
+            continue
+        line_no = item.get("lineNo")
+        valid_no = _line_no(line_no) and line_no >= 0
+        key = line_no if valid_no else f"#{index}"
+        if not valid_no:
+            messages.append("lineNo must be a whole number.")
+        elif line_no in seen:
+            messages.append("Duplicate lineNo.")
+        else:
+            seen.add(line_no)
+
+        line = {name: item.get(name, DEFAULTS[name]) for name in VALUE_FIELDS}
+        line["lineNo"] = line_no
+        line["description"] = str(line["description"] or "")
+        if not line["description"]:
+            messages.append("description is required.")
+        elif len(line["description"]) > max_description:
+            messages.append(f"description is longer than {max_description}.")
+        for name, allowed in choices.items():
+            if line[name] is None and name == "Input":
+                continue
+            if not isinstance(line[name], str) or line[name] not in allowed:
+                messages.append(f"{name} '{line[name]}' is not a valid choice.")
+        for name in ("roundPrecision", "divideMultiply"):
+            try:
+                line[name] = _decimal(name, line[name])
+            except (InvalidOperation, ValueError, TypeError):
+                messages.append(f"{name} '{item.get(name)}' is not a valid amount.")
+
+        for name in ("payrollEntry", "payrollLines"):
+            code = _code(name, item, messages)
+            line[name] = code
+            line[f"{name}_id"] = ed_ids.get(code)
+            if code is not None and code not in ed_ids:
+                messages.append(f"{name} '{code}' does not exist.")
+        code = _code("lookUp", item, messages)
+        line["lookUp_id"] = code
+        if code is not None and code not in lookup_codes:
+            messages.append(f"lookUp '{code}' does not exist.")
+        for name in LINE_FIELDS:
+            line[name] = item.get(name)
+            if line[name] is not None and not _line_no(line[name]):
+                messages.append(f"{name} must be a line number.")
+                line[name] = None
+
+        if messages:
+            errors[key] = messages
+        # Lines without a usable lineNo cannot be referenced or saved
+        if valid_no:
+            lines.append(line)
+    return lines, errors
+
+
+def validate_lines(lines, errors) -> list:
+    """
+    Check references between lines, the input rules and the graph. Returns
+    the lines in evaluation order as ``graph`` line dicts keyed by lineNo.
+    """
+    by_no = {line["lineNo"]: line for line in lines}
+    for line in lines:
+        messages = []
+        for name in LINE_FIELDS:
+            target = line[name]
+            if target is not None and target not in by_no:
+                messages.append(f"{name} {target} is not a line of this scheme.")
+        rule = input_errors(
+            line["Input"],
+            line["lineNo"],
+            line["calculationLine"],
+            bool(line["payrollEntry_id"]),
+        )
+        if rule:
+            messages.extend(dict.fromkeys(rule.values()))
+        if messages:
+            errors.setdefault(line["lineNo"], []).extend(messages)
+    if errors:
+        raise ValidationError(errors)
+
+    graph_lines = [
+        {
+            "id": line["lineNo"],
+            "lineNo": line["lineNo"],
+            "Input": line["Input"],
+            "calculationLine_id": line["calculationLine"],
+            "payrollEntry__edCode": line["payrollEntry"],
+            "calculation": line["calculation"],
+            "divideMultiply": line["divideMultiply"],
+            "lookUp_id": line["lookUp_id"],
+            "calculateTo_id": line["calculateTo"],
+            "roundType": line["roundType"],
+            "roundPrecision": line["roundPrecision"],
+            "payrollLines__edCode": line["payrollLines"],
+        }
+        for line in lines
+    ]
+    return order_lines(graph_lines)
+
+
+def save_lines(header, payload) -> dict:
+    """
+    Replace ``header``'s lines with ``payload``. Raises ``ValidationError``
+    (a dict keyed by lineNo) and writes nothing if any line is invalid.
+    Returns counts of created, updated, deleted and unchanged lines.
+    """
+    lines, errors = parse_lines(payload)
+    ordered = validate_lines(lines, errors)
+    by_no = {line["lineNo"]: line for line in lines}
+
+    with transaction.atomic():
+        existing = {
+            obj.lineNo: obj
+            for obj in CalculationScheme.objects.select_for_update().filter(
+                scheme=header
+            )
+        }
+        # Saved lines keep their id when their lineNo is kept
+        deleted = [obj.pk for no, obj in existing.items() if no not in by_no]
+        existing = {no: obj for no, obj in existing.items() if no in by_no}
+
+        created = [
+            CalculationScheme(
+                scheme=header,
+                **{name: line[name] for name in VALUE_FIELDS},
+                **{f"{name}_id": line[f"{name}_id"] for name in CODE_FIELDS},
+            )
+            for no, line in by_no.items()
+            if no not in existing
+        ]
+        CalculationScheme.objects.bulk_create(created, batch_size=BATCH_SIZE)
+        objects = {**existing, **{obj.lineNo: obj for obj in created}}
+        ids = {no: obj.pk for no, obj in objects.items()}
+
+        new = {obj.pk for obj in created}
+        updated = []
+        unchanged = 0
+        for no, obj in objects.items():
+            line = by_no[no]
+            values = {
+                **{name: line[name] for name in VALUE_FIELDS},
+                **{f"{name}_id": line[f"{name}_id"] for name in CODE_FIELDS},
+                **{f"{name}_id": ids.get(line[name]) for name in LINE_FIELDS},
+            }
+            if all(getattr(obj, name) == value for name, value in values.items()):
+                if obj.pk not in new:
+                    unchanged += 1
+                continue
+            for name, value in values.items():
+                setattr(obj, name, value)
+            updated.append(obj)
+        CalculationScheme.objects.bulk_update(updated, FIELDS, batch_size=BATCH_SIZE)
+        # Kept lines no longer point at deleted ones
+        CalculationScheme.objects.filter(pk__in=deleted).delete()
+
+        header.lineOrder = [ids[line["lineNo"]] for line in ordered]
+        CalculationHeader.objects.filter(pk=header.pk).update(
+            lineOrder=header.lineOrder
+        )
+
+    # Bulk writes send no signals
+    snapshot.invalidate()
+    from payroll.changes import mark_dirty
+
+    mark_dirty(header.employees.all())
+    return {
+        "created": len(created),
+        "updated": sum(1 for obj in updated if obj.pk not in new),
+        "deleted": len(deleted),
+        "unchanged": unchanged,
+    }
@@ -0,0 +1,241 @@
+"""
+Calculation scheme engine.
+
+A ``CalculationHeader`` and its ``schemeLines`` are compiled once into a flat,
+topologically ordered plan of opcode tuples. The compiled plan holds only
+plain Python values, so evaluating it per employee never touches the ORM.
+
+Line semantics:
+
+* the line's base value is its input (``None`` -> 0, ``Calculation Line`` ->
+  the referenced line's result, ``Payroll Entry`` -> the employee amount for
+  that ED) plus anything other lines calculated into it via ``calculateTo``;
+* ``calculation`` transforms the base: Multiply/Divide/Percent use
+  ``divideMultiply``, Highest/Lowest compare against ``divideMultiply``,
+  Look Up resolves the base through ``lookUp``; None/Add/Subtract keep it;
+* the result is rounded with ``roundType``/``roundPrecision``;
+* if ``calculateTo`` is set the result is added to that line (Subtract adds
+  its negation); if ``payrollLines`` is set the result is added to that ED.
+"""
+
+import time
+from decimal import ROUND_CEILING, ROUND_FLOOR, ROUND_HALF_UP, Decimal
+
+from .graph import order_lines, ordered_scheme_lines
+from .lookups import load_lookup_tables
+
+ZERO = Decimal("0")
+HUNDRED = Decimal("100")
+
+# Opcodes
+OP_NONE = 0
+OP_ADD = 1
+OP_SUBTRACT = 2
+OP_MULTIPLY = 3
+OP_DIVIDE = 4
+OP_PERCENT = 5
+OP_HIGHEST = 6
+OP_LOWEST = 7
+OP_LOOKUP = 8
+
+OPCODES = {
+    "None": OP_NONE,
+    "Add": OP_ADD,
+    "Subtract": OP_SUBTRACT,
+    "Multiply": OP_MULTIPLY,
+    "Divide": OP_DIVIDE,
+    "Percent": OP_PERCENT,
+    "Highest": OP_HIGHEST,
+    "Lowest": OP_LOWEST,
+    "Look Up": OP_LOOKUP,
+}
+
+# Input kinds
+IN_NONE = 0
+IN_LINE = 1
+IN_ENTRY = 2
+
+INPUT_KINDS = {
+    None: IN_NONE,
+    "None": IN_NONE,
+    "Calculation Line": IN_LINE,
+    "Payroll Entry": IN_ENTRY,
+}
+
+# Rounding modes
+ROUND_NONE = 0
+ROUND_UP = 1
+ROUND_DOWN = 2
+ROUND_NEAREST = 3
+
+ROUND_MODES = {
+    "None": ROUND_NONE,
+    "Up": ROUND_UP,
+    "Down": ROUND_DOWN,
+    "Nearest": ROUND_NEAREST,
+}
+
+_DECIMAL_ROUNDING = {
+    ROUND_UP: ROUND_CEILING,
+    ROUND_DOWN: ROUND_FLOOR,
+    ROUND_NEAREST: ROUND_HALF_UP,
+}
+
+# Step tuple layout
+(
+    S_SLOT,
+    S_INPUT,
+    S_REF,
+    S_OP,
+    S_OPERAND,
+    S_LOOKUP,
+    S_TARGET,
+    S_ROUND,
+    S_PRECISION,
+    S_OUTPUT,
+) = range(10)
+
+
+def round_amount(value: Decimal, mode: int, precision: Decimal) -> Decimal:
+    if mode == ROUND_NONE or not precision:
+        return value
+    units = (value / precision).quantize(Decimal(1), rounding=_DECIMAL_ROUNDING[mode])
+    return units * precision
+
+
+class CompiledScheme:
+    """An evaluation plan for one ``CalculationHeader``."""
+
+    __slots__ = ("schemeId", "steps", "lineNos", "inputs", "outputs")
+
+    def __init__(self, schemeId: str, steps: tuple, lineNos: tuple):
+        self.schemeId = schemeId
+        self.steps = steps
+        self.lineNos = lineNos
+        self.inputs = tuple(sorted({s[S_REF] for s in steps if s[S_INPUT] == IN_ENTRY}))
+        self.outputs = tuple(sorted({s[S_OUTPUT] for s in steps if s[S_OUTPUT]}))
+
+    def __repr__(self) -> str:
+        return f"<CompiledScheme {self.schemeId}: {len(self.steps)} steps>"
+
+    def evaluate_lines(
+        self, inputs, month: int | None = None, timings: list | None = None
+    ) -> tuple[list, dict]:
+        """
+        Return ``(line values in step order, ED outputs)`` for one employee.
+        ``timings``, a list of one float per step, gets each step's seconds
+        added (see ``profiler.py``).
+        """
+        n = len(self.steps)
+        values = [ZERO] * n
+        carried = [ZERO] * n
+        amounts = dict(inputs)
+        outputs = {}
+        clock = time.perf_counter if timings is not None else None
+        for (
+            slot,
+            kind,
+            ref,
+            op,
+            operand,
+            lookup,
+            target,
+            rmode,
+            precision,
+            output,
+        ) in self.steps:
+            if clock is not None:
+                started = clock()
+            if kind == IN_LINE:
+                base = values[ref]
+            elif kind == IN_ENTRY:
+                base = amounts.get(ref, ZERO)
+            else:
+                base = ZERO
+            base += carried[slot]
+
+            if op == OP_MULTIPLY:
+                result = base * operand
+            elif op == OP_DIVIDE:
+                result = base / operand if operand else ZERO
+            elif op == OP_PERCENT:
+                result = base * operand / HUNDRED
+            elif op == OP_HIGHEST:
+                result = base if base > operand else operand
+            elif op == OP_LOWEST:
+                result = base if base < operand else operand
+            elif op == OP_LOOKUP:
+                result = lookup.resolve(base, month) if lookup is not None else base
+            else:
+                result = base
+
+            if rmode:
+                result = round_amount(result, rmode, precision)
+            values[slot] = result
+
+            if target is not None:
+                carried[target] += -result if op == OP_SUBTRACT else result
+            if output:
+                amounts[output] = amounts.get(output, ZERO) + result
+                outputs[output] = outputs.get(output, ZERO) + result
+            if clock is not None:
+                timings[slot] += clock() - started
+        return values, outputs
+
+    def evaluate(self, inputs, month: int | None = None) -> dict:
+        """Return the ED outputs (edCode -> Decimal) for one employee's inputs."""
+        return self.evaluate_lines(inputs, month)[1]
+
+
+def build_plan(schemeId: str, lines, lookups, ordered: bool = False) -> CompiledScheme:
+    """
+    Build a ``CompiledScheme`` from line dicts (``graph.LINE_FIELDS``) and
+    ``{code: LookupTable}``. Pass ``ordered=True`` if ``lines`` already are in
+    evaluation order.
+    """
+    if not ordered:
+        lines = order_lines(lines)
+    slots = {line["id"]: slot for slot, line in enumerate(lines)}
+    steps = []
+    for slot, line in enumerate(lines):
+        kind = INPUT_KINDS.get(line["Input"], IN_NONE)
+        if kind == IN_LINE:
+            ref = slots.get(line["calculationLine_id"])
+            if ref is None:
+                kind = IN_NONE
+        elif kind == IN_ENTRY:
+            ref = line["payrollEntry__edCode"]
+            if ref is None:
+                kind = IN_NONE
+        else:
+            ref = None
+        op = OPCODES.get(line["calculation"], OP_NONE)
+        steps.append(
+            (
+                slot,
+                kind,
+                ref,
+                op,
+                Decimal(line["divideMultiply"] or 0),
+                lookups.get(line["lookUp_id"]) if op == OP_LOOKUP else None,
+                slots.get(line["calculateTo_id"]),
+                ROUND_MODES.get(line["roundType"], ROUND_NONE),
+                Decimal(line["roundPrecision"] or 0),
+                line["payrollLines__edCode"],
+            )
+        )
+    return CompiledScheme(
+        schemeId, tuple(steps), tuple(line["lineNo"] for line in lines)
+    )
+
+
+def compile_scheme(header) -> CompiledScheme:
+    """
+    Compile a ``CalculationHeader``: one query for its lines (ordered by the
+    cached ``lineOrder``) and two for lookups.
+    """
+    lines = ordered_scheme_lines(header)
+    lookups = load_lookup_tables(
+        line["lookUp_id"] for line in lines if line["lookUp_id"]
+    )
+    return build_plan(header.schemeId, lines, lookups, ordered=True)
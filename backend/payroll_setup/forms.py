@@ -1,5 +1,7 @@
 from django import forms
+from django.contrib.admin.widgets import AutocompleteSelect
 
+from .graph import line_from_data, validate_pending
 from .models import CalculationScheme
 
 
@@ -15,28 +17,98 @@ class CalculationSchemeForm(forms.ModelForm):
             self.instance if isinstance(self.instance, CalculationScheme) else None
         )
 
-        # Default: empty queryset until we can determine scheme
-        queryset = CalculationScheme.objects.none()
-
         if instance and instance.scheme_id:
-            queryset = CalculationScheme.objects.filter(scheme=instance.scheme)
-            # If current line number is known, only allow higher lines
-            if instance.lineNo:
-                queryset = queryset.filter(lineNo__gt=instance.lineNo)
+            scheme = instance.scheme_id
+            line_no = instance.lineNo
         else:
             # Try from provided initial data
-            scheme = self.initial.get("scheme") or (
-                self.data.get("scheme") if hasattr(self, "data") else None
+            scheme = self.initial.get("scheme") or self.data.get(
+                self.add_prefix("scheme")
             )
-            line_no = self.initial.get("lineNo") or (
-                self.data.get("lineNo") if hasattr(self, "data") else None
+            line_no = self.initial.get("lineNo") or self.data.get(
+                self.add_prefix("lineNo")
             )
-            if scheme:
-                queryset = CalculationScheme.objects.filter(scheme=scheme)
-                try:
-                    if line_no:
-                        queryset = queryset.filter(lineNo__gt=int(line_no))
-                except (TypeError, ValueError):
-                    pass
+        try:
+            line_no = int(line_no) if line_no else None
+        except (TypeError, ValueError):
+            line_no = None
+        self.limit_calculation_lines(scheme, line_no)
 
+    def limit_calculation_lines(self, scheme, line_no):
+        """Only offer higher lines (once ``line_no`` is known) of ``scheme``."""
+        # Default: empty queryset until we can determine scheme
+        queryset = CalculationScheme.objects.none()
+        if scheme:
+            queryset = CalculationScheme.objects.filter(scheme=scheme)
+            if line_no is not None:
+                queryset = queryset.filter(lineNo__gt=line_no)
         self.fields["calculationLine"].queryset = queryset
+
+    # Inline forms leave the scheme-wide check to CalculationSchemeInlineFormSet
+    validate_scheme = True
+
+    def clean(self):
+        cleaned_data = super().clean()
+        scheme = cleaned_data.get("scheme")
+        if self.validate_scheme and scheme is not None and not self.errors:
+            line = line_from_data(self.instance.pk or "new", cleaned_data)
+            validate_pending(scheme.pk, [line])
+        return cleaned_data
+
+
+class CalculationSchemeInlineForm(CalculationSchemeForm):
+    validate_scheme = False
+
+    def limit_calculation_lines(self, scheme, line_no):
+        # CalculationSchemeInline loads the scheme's lines once per formset
+        field = self.fields["calculationLine"]
+        lines = getattr(field, "lines", None)
+        if lines is None:
+            return super().limit_calculation_lines(scheme, line_no)
+        field.choices = [("", field.empty_label)] + [
+            (pk, label)
+            for lineNo, pk, label in lines
+            if line_no is None or lineNo > line_no
+        ]
+
+
+class LabelledAutocompleteSelect(AutocompleteSelect):
+    """
+    ``AutocompleteSelect`` labelling the selected option from ``labels``
+    (``{str(pk): label}``, shared by every form of a formset) instead of a
+    query per form. Values missing from ``labels`` fall back to the query.
+    """
+
+    def __init__(self, field, admin_site, labels, **kwargs):
+        super().__init__(field, admin_site, **kwargs)
+        self.labels = labels
+
+    def optgroups(self, name, value, attr=None):
+        selected = [v for v in value if v not in ("", None)]
+        if any(v not in self.labels for v in selected):
+            return super().optgroups(name, value, attr)
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, "", "", False, 0))
+        for v in selected[:1]:
+            options.append(
+                self.create_option(name, v, self.labels[v], True, len(options))
+            )
+        return [(None, options, 0)]
+
+
+class CalculationSchemeInlineFormSet(forms.BaseInlineFormSet):
+    def clean(self):
+        super().clean()
+        if any(self.errors):
+            return
+        lines = []
+        for index, form in enumerate(self.forms):
+            if not hasattr(form, "cleaned_data") or not form.cleaned_data:
+                continue
+            if self.can_delete and self._should_delete_form(form):
+                continue
+            key = form.instance.pk or f"new-{index}"
+            lines.append(line_from_data(key, form.cleaned_data))
+        # The formset holds every line of the scheme, so nothing is loaded
+        validate_pending(None, lines)
@@ -0,0 +1,219 @@
+"""
+Bracket-indexed lookup tables.
+
+A ``Lookup`` and its ``lookupLines`` are loaded once into a ``LookupTable``
+holding the bracket lower bounds as a sorted tuple, so an amount resolves to
+its bracket by bisection instead of a scan or a query.
+
+Resolution by ``Lookup.type`` for the bracket ``b`` containing the key:
+
+* Percentage: ``b.extractAmount + (amount - b.lowerAmount) * b.percent / 100``
+  (marginal rate on top of the cumulative amount, as for PAYE);
+* Extract Amount: ``b.extractAmount`` (flat amount, as for Local Service Tax);
+* Max Min: ``amount * b.percent / 100 + b.extractAmount``;
+* Month: as Max Min, keyed by the period month instead of the amount;
+* Special, or a lookup without lines: the amount itself.
+
+The result is then bounded by ``minExtractAmountLCY``/``maxExtractAmountLCY``.
+Keys below the first bracket resolve to zero.
+
+Brackets of a lookup with a ``currencyCode`` are in that currency;
+``in_lcy`` converts them with an exchange rate (``financial.rates``) so the
+table resolves LCY amounts like the others.
+"""
+
+from bisect import bisect_right
+from decimal import Decimal
+
+from .models import Lookup, LookupLine
+
+ZERO = Decimal("0")
+HUNDRED = Decimal("100")
+CENT = Decimal("0.01")
+
+
+class LookupTable:
+    __slots__ = (
+        "code",
+        "type",
+        "minimum",
+        "maximum",
+        "currency",
+        "bounds",
+        "percents",
+        "amounts",
+        "_arrays",
+    )
+
+    def __init__(self, code, type, minimum=None, maximum=None, lines=(), currency=None):
+        self.code = code
+        self.type = type
+        self.minimum = minimum
+        self.maximum = maximum
+        self.currency = currency
+        lines = sorted(lines)
+        self.bounds = tuple(line[0] for line in lines)
+        self.percents = tuple(line[1] for line in lines)
+        self.amounts = tuple(line[2] for line in lines)
+        self._arrays = None
+
+    def __repr__(self) -> str:
+        return f"<LookupTable {self.code}: {self.type}, {len(self.bounds)} brackets>"
+
+    @classmethod
+    def from_lookup(cls, lookup: Lookup, lines=None) -> "LookupTable":
+        """``lines`` is an iterable of ``(lowerAmount, percent, extractAmount)``."""
+        if lines is None:
+            lines = lookup.lookupLines.values_list(
+                "lowerAmount", "percent", "extractAmount"
+            )
+        return cls(
+            lookup.code,
+            lookup.type,
+            lookup.minExtractAmountLCY,
+            lookup.maxExtractAmountLCY,
+            lines,
+            lookup.currencyCode_id,
+        )
+
+    def in_lcy(self, rate: Decimal) -> "LookupTable":
+        """
+        This table with its brackets converted to LCY at ``rate`` (LCY per
+        unit of ``currency``), to the cent. Month bounds and percentages are
+        unchanged.
+        """
+        bounds = self.bounds
+        if self.type != "Month":
+            bounds = tuple((bound * rate).quantize(CENT) for bound in bounds)
+        amounts = tuple((amount * rate).quantize(CENT) for amount in self.amounts)
+        return LookupTable(
+            self.code,
+            self.type,
+            self.minimum,
+            self.maximum,
+            zip(bounds, self.percents, amounts),
+        )
+
+    def bracket(self, key) -> int:
+        """Index of the bracket containing ``key``, or -1 below the first one."""
+        return bisect_right(self.bounds, key) - 1
+
+    def _bound(self, amount: Decimal) -> Decimal:
+        if self.minimum is not None and amount < self.minimum:
+            return self.minimum
+        if self.maximum is not None and amount > self.maximum:
+            return self.maximum
+        return amount
+
+    def resolve(self, amount: Decimal, month: int | None = None) -> Decimal:
+        if not self.bounds or self.type == "Special":
+            return self._bound(amount)
+        if self.type == "Month":
+            if month is None:
+                return ZERO
+            index = self.bracket(month)
+        else:
+            index = self.bracket(amount)
+        if index < 0:
+            return ZERO
+        if self.type == "Percentage":
+            result = (
+                self.amounts[index]
+                + (amount - self.bounds[index]) * self.percents[index] / HUNDRED
+            )
+        elif self.type == "Extract Amount":
+            result = self.amounts[index]
+        else:
+            result = amount * self.percents[index] / HUNDRED + self.amounts[index]
+        return self._bound(result)
+
+    def resolve_many(self, amounts, month: int | None = None) -> list:
+        return [self.resolve(amount, month) for amount in amounts]
+
+    def resolve_array(self, amounts, month: int | None = None):
+        """
+        Vectorised ``resolve`` over a float array.
+
+        Returns ``(results, ambiguous)``; ``ambiguous`` flags rows within float
+        tolerance of a bracket bound (``None`` if no row can be), which callers
+        re-resolve with ``resolve``.
+        """
+        from .batch import near_boundary, np
+
+        if self._arrays is None:
+            self._arrays = (
+                np.asarray(self.bounds, dtype=float),
+                np.asarray(self.percents, dtype=float),
+                np.asarray(self.amounts, dtype=float),
+            )
+        bounds, percents, fixed = self._arrays
+        ambiguous = None
+        below = None
+
+        if not self.bounds or self.type == "Special":
+            results = amounts
+        elif self.type == "Month":
+            index = self.bracket(month) if month is not None else -1
+            if index < 0:
+                return np.zeros_like(amounts), None
+            results = amounts * percents[index] / 100.0 + fixed[index]
+        else:
+            index = np.searchsorted(bounds, amounts, side="right") - 1
+            below = index < 0
+            index = np.maximum(index, 0)
+            if self.type == "Percentage":
+                marginal = (amounts - bounds[index]) * percents[index] / 100.0
+                results = fixed[index] + marginal
+            elif self.type == "Extract Amount":
+                results = fixed[index]
+            else:
+                results = amounts * percents[index] / 100.0 + fixed[index]
+
+            upper = np.minimum(index + 1, len(bounds) - 1)
+            distance = np.minimum(
+                np.abs(amounts - bounds[index]), np.abs(bounds[upper] - amounts)
+            )
+            ambiguous = near_boundary(distance, amounts)
+
+        if self.minimum is not None or self.maximum is not None:
+            lower = -np.inf if self.minimum is None else float(self.minimum)
+            upper = np.inf if self.maximum is None else float(self.maximum)
+            results = np.clip(results, lower, upper)
+        if below is not None:
+            # Below the first bracket resolves to zero, unbounded.
+            results = np.where(below, 0.0, results)
+        return results, ambiguous
+
+
+def convert_tables(tables: dict, rates, on=None) -> dict:
+    """``tables`` with foreign-currency tables converted at ``on``'s rates."""
+    return {
+        code: (
+            table.in_lcy(rates.rate(table.currency, on))
+            if table.currency in rates
+            else table
+        )
+        for code, table in tables.items()
+    }
+
+
+def load_lookup_tables(codes, on=None) -> dict:
+    """
+    Load ``{code: LookupTable}`` for ``codes`` with two queries, in LCY at
+    the rates in effect on ``on`` (the latest if ``None``).
+    """
+    from financial.rates import get_rates
+
+    codes = set(codes)
+    if not codes:
+        return {}
+    lines = {}
+    for lookup_id, lower, percent, amount in LookupLine.objects.filter(
+        lookup_id__in=codes
+    ).values_list("lookup_id", "lowerAmount", "percent", "extractAmount"):
+        lines.setdefault(lookup_id, []).append((lower, percent, amount))
+    tables = {
+        lookup.code: LookupTable.from_lookup(lookup, lines.get(lookup.code, ()))
+        for lookup in Lookup.objects.filter(code__in=codes)
+    }
+    return convert_tables(tables, get_rates(), on)
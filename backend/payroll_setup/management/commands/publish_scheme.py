@@ -0,0 +1,35 @@
+import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll_setup.models import CalculationHeader
+from payroll_setup.versions import publish_version
+
+
+class Command(BaseCommand):
+    help = "Publish a calculation scheme's lines as a version valid from a date."
+
+    def add_arguments(self, parser):
+        parser.add_argument("scheme", help="Scheme ID")
+        parser.add_argument("valid_from", help="First valid date as YYYY-MM-DD")
+
+    def handle(self, *args, **options):
+        try:
+            header = CalculationHeader.objects.get(schemeId=options["scheme"])
+        except CalculationHeader.DoesNotExist:
+            raise CommandError(f"Scheme {options['scheme']} does not exist.")
+        try:
+            valid_from = datetime.date.fromisoformat(options["valid_from"])
+        except ValueError:
+            raise CommandError("Valid from must be given as YYYY-MM-DD.")
+        try:
+            version = publish_version(header, valid_from)
+        except ValidationError as exc:
+            raise CommandError("; ".join(exc.messages))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{header.schemeId}: version {version.pk} valid from "
+                f"{version.validFrom} with {len(version.lineOrder)} lines."
+            )
+        )
@@ -0,0 +1,106 @@
+"""
+Memoized scheme results.
+
+Employees on the same scheme with the same inputs (e.g. the same scale step
+in a grade-based payroll) get the same lines, so ``evaluate_memoized``
+evaluates each distinct input vector once and shares the result. Results
+are kept across calls in a ``ResultCache`` keyed by a caller-supplied scope
+(scheme, setup snapshot version and month) plus the input vector, with
+least-recently-used eviction.
+"""
+
+from collections import OrderedDict
+
+from core.profiling import stage
+
+from .batch import evaluate_batch
+
+MAX_ENTRIES = 100_000
+
+
+class ResultCache:
+    """An LRU mapping with hit, miss and eviction counters."""
+
+    def __init__(self, maxsize: int = MAX_ENTRIES):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key):
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def record(self, hits: int, misses: int):
+        """Add counts gathered elsewhere, e.g. in a worker process."""
+        self.hits += hits
+        self.misses += misses
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def evaluate_memoized(plan, codes, vectors, month=None, cache=None, scope=()):
+    """
+    Return one ``((edCode, amount), ...)`` tuple of non-zero outputs per input
+    vector in ``vectors`` (tuples of amounts aligned with ``codes``).
+    """
+    results = {}
+    missing = []
+    reused = 0
+    for vector in vectors:
+        if vector in results:
+            reused += 1
+            continue
+        cached = cache.get((scope, vector)) if cache is not None else None
+        results[vector] = cached
+        if cached is None:
+            missing.append(vector)
+
+    if cache is not None:
+        cache.record(reused, 0)
+    if missing:
+        columns = {
+            code: [vector[index] for vector in missing]
+            for index, code in enumerate(codes)
+        }
+        with stage("evaluate_batch", plan.schemeId, len(missing)):
+            outputs = evaluate_batch(plan, columns, len(missing), month)
+        for row, vector in enumerate(missing):
+            result = tuple(
+                (code, amounts[row])
+                for code, amounts in outputs.items()
+                if amounts[row]
+            )
+            results[vector] = result
+            if cache is not None:
+                cache.put((scope, vector), result)
+    return [results[vector] for vector in vectors]
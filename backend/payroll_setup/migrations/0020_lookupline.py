@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll_setup', '0019_calculationscheme_payrolllines'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LookupLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lowerAmount', models.DecimalField(decimal_places=2, default=0.0, help_text='Bracket start. For Month lookups, the first month (1-12).', max_digits=12, verbose_name='Lower Amount')),
+                ('percent', models.DecimalField(decimal_places=2, default=0.0, max_digits=7, verbose_name='Percent')),
+                ('extractAmount', models.DecimalField(decimal_places=2, default=0.0, max_digits=12, verbose_name='Extract Amount')),
+                ('lookup', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lookupLines', to='payroll_setup.lookup', verbose_name='Lookup')),
+            ],
+            options={
+                'verbose_name': 'Lookup Line',
+                'verbose_name_plural': 'Lookup Lines',
+                'ordering': ['lookup', 'lowerAmount'],
+                'unique_together': {('lookup', 'lowerAmount')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll_setup', '0020_lookupline'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calculationheader',
+            name='lineOrder',
+            field=models.JSONField(blank=True, editable=False, help_text='Line ids in evaluation order; cleared when lines change.', null=True, verbose_name='Line Order'),
+        ),
+    ]
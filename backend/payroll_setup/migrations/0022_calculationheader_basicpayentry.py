@@ -0,0 +1,19 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll_setup', '0021_calculationheader_lineorder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='calculationheader',
+            name='basicPayEntry',
+            field=models.ForeignKey(blank=True, help_text="ED that receives the employee's basic pay in payroll runs.", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='basicPaySchemes', to='payroll_setup.eddefinition', verbose_name='Basic Pay Entry'),
+        ),
+    ]
@@ -0,0 +1,96 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payroll_setup", "0022_calculationheader_basicpayentry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="SchemeLineRevision",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("digest", models.CharField(max_length=64, unique=True)),
+                (
+                    "data",
+                    models.JSONField(help_text="Line fields as in graph.LINE_FIELDS."),
+                ),
+            ],
+            options={
+                "verbose_name": "Scheme Line Revision",
+                "verbose_name_plural": "Scheme Line Revisions",
+            },
+        ),
+        migrations.CreateModel(
+            name="CalculationSchemeVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("validFrom", models.DateField(verbose_name="Valid From")),
+                (
+                    "basicPayEntry",
+                    models.CharField(
+                        blank=True,
+                        max_length=50,
+                        null=True,
+                        verbose_name="Basic Pay Entry",
+                    ),
+                ),
+                (
+                    "lineOrder",
+                    models.JSONField(
+                        default=list,
+                        help_text="Line ids in evaluation order.",
+                        verbose_name="Line Order",
+                    ),
+                ),
+                (
+                    "createdAt",
+                    models.DateTimeField(auto_now_add=True, verbose_name="Created At"),
+                ),
+                (
+                    "scheme",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="versions",
+                        to="payroll_setup.calculationheader",
+                        verbose_name="Scheme",
+                    ),
+                ),
+                (
+                    "lines",
+                    models.ManyToManyField(
+                        related_name="versions",
+                        to="payroll_setup.schemelinerevision",
+                        verbose_name="Lines",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Calculation Scheme Version",
+                "verbose_name_plural": "Calculation Scheme Versions",
+                "ordering": ["scheme", "-validFrom"],
+                "unique_together": {("scheme", "validFrom")},
+            },
+        ),
+    ]
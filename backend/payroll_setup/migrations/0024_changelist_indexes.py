@@ -0,0 +1,28 @@
+# Generated by Django 5.2.6 on 2026-10-18 19:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("financial", "0004_generalledgerentry_glaccountbalance"),
+        ("payroll_setup", "0023_calculationschemeversion"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="calculationscheme",
+            index=models.Index(
+                fields=["calculation", "scheme", "lineNo"],
+                name="payroll_set_calcula_77ab24_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payrollpostingsetup",
+            index=models.Index(
+                fields=["edPostingGroup", "employeePostingGroup"],
+                name="payroll_set_edPosti_9eab51_idx",
+            ),
+        ),
+    ]
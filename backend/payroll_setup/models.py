@@ -34,6 +34,22 @@ class CalculationHeader(models.Model):
         on_delete=models.PROTECT,
         related_name="calculationHeaders",
     )
+    basicPayEntry = models.ForeignKey(
+        "EdDefinition",
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="basicPaySchemes",
+        verbose_name="Basic Pay Entry",
+        help_text="ED that receives the employee's basic pay in payroll runs.",
+    )
+    lineOrder = models.JSONField(
+        blank=True,
+        null=True,
+        editable=False,
+        verbose_name="Line Order",
+        help_text="Line ids in evaluation order; cleared when lines change.",
+    )
 
     class Meta:
         verbose_name = "Calculation Header"
@@ -179,6 +195,7 @@ class PayrollPostingSetup(models.Model):
     class Meta:
         verbose_name = "Payroll Posting Setup"
         verbose_name_plural = "Payroll Posting Setups"
+        indexes = [models.Index(fields=["edPostingGroup", "employeePostingGroup"])]
         unique_together = (
             (
                 "employeePostingGroup",
@@ -247,6 +264,47 @@ class Lookup(models.Model):
         return f"{self.code} - {self.description}"
 
 
+class LookupLine(models.Model):
+    lookup = models.ForeignKey(
+        "Lookup",
+        on_delete=models.CASCADE,
+        related_name="lookupLines",
+        verbose_name="Lookup",
+    )
+    lowerAmount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0.0,
+        verbose_name="Lower Amount",
+        help_text="Bracket start. For Month lookups, the first month (1-12).",
+    )
+    percent = models.DecimalField(
+        max_digits=7, decimal_places=2, default=0.0, verbose_name="Percent"
+    )
+    extractAmount = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0.0, verbose_name="Extract Amount"
+    )
+
+    class Meta:
+        verbose_name = "Lookup Line"
+        verbose_name_plural = "Lookup Lines"
+        ordering = ["lookup", "lowerAmount"]
+        unique_together = (("lookup", "lowerAmount"),)
+
+    def clean(self):
+        super().clean()
+        if self.lookup_id and self.lookup.type == "Month":
+            if self.lowerAmount != int(self.lowerAmount) or not (
+                1 <= self.lowerAmount <= 12
+            ):
+                raise ValidationError(
+                    {"lowerAmount": "Month lookups need a whole month from 1 to 12."}
+                )
+
+    def __str__(self) -> str:
+        return f"{self.lookup_id} - {self.lowerAmount}"
+
+
 class CalculationScheme(models.Model):
     lineNo = models.PositiveIntegerField(verbose_name="Line No.")
     description = models.CharField(max_length=255)
@@ -355,45 +413,98 @@ class CalculationScheme(models.Model):
         verbose_name_plural = "Calculation Scheme Lines"
         ordering = ["scheme", "lineNo"]
         unique_together = (("scheme", "lineNo"),)
+        indexes = [models.Index(fields=["calculation", "scheme", "lineNo"])]
 
     def clean(self):
         super().clean()
-        # Conditional requirements based on Input selection
-        if self.Input == "Calculation Line":
-            if not self.calculationLine:
-                raise ValidationError(
-                    {"calculationLine": "Required when Input is 'Calculation Line'."}
-                )
-            if self.payrollEntry:
-                raise ValidationError(
-                    {"payrollEntry": "Clear this when Input is 'Calculation Line'."}
-                )
-            # Validate reference line belongs to same scheme and is higher
-            if self.calculationLine.scheme_id != self.scheme_id:
-                raise ValidationError(
-                    {"calculationLine": "Must reference a line in the same Scheme."}
-                )
-            if self.calculationLine.lineNo <= self.lineNo:
-                raise ValidationError(
-                    {"calculationLine": "Line number must be higher than current line."}
-                )
-        elif self.Input == "Payroll Entry":
-            if not self.payrollEntry:
-                raise ValidationError(
-                    {"payrollEntry": "Required when Input is 'Payroll Entry'."}
-                )
-            if self.calculationLine:
-                raise ValidationError(
-                    {"calculationLine": "Clear this when Input is 'Payroll Entry'."}
-                )
-        else:
-            # Input == None
-            if self.calculationLine or self.payrollEntry:
-                raise ValidationError(
-                    {
-                        "Input": "When Input is 'None', both Payroll Entry and Calculation Line must be empty.",
-                    }
-                )
+        source = self.calculationLine
+        errors = input_errors(
+            self.Input,
+            self.lineNo,
+            source.lineNo if source else None,
+            bool(self.payrollEntry),
+            source is None or source.scheme_id == self.scheme_id,
+        )
+        if errors:
+            raise ValidationError(errors)
 
     def __str__(self) -> str:
         return f"{self.scheme.schemeId} - {self.lineNo}: {self.description}"
+
+
+class SchemeLineRevision(models.Model):
+    """
+    An immutable calculation line as published in a scheme version, stored
+    once per distinct content and shared by every version containing it.
+    """
+
+    digest = models.CharField(max_length=64, unique=True)
+    data = models.JSONField(help_text="Line fields as in graph.LINE_FIELDS.")
+
+    class Meta:
+        verbose_name = "Scheme Line Revision"
+        verbose_name_plural = "Scheme Line Revisions"
+
+    def __str__(self) -> str:
+        return f"{self.data.get('lineNo')} ({self.digest[:12]})"
+
+
+class CalculationSchemeVersion(models.Model):
+    scheme = models.ForeignKey(
+        "CalculationHeader",
+        on_delete=models.CASCADE,
+        related_name="versions",
+        verbose_name="Scheme",
+    )
+    validFrom = models.DateField(verbose_name="Valid From")
+    basicPayEntry = models.CharField(
+        max_length=50, blank=True, null=True, verbose_name="Basic Pay Entry"
+    )
+    lines = models.ManyToManyField(
+        "SchemeLineRevision", related_name="versions", verbose_name="Lines"
+    )
+    lineOrder = models.JSONField(
+        default=list,
+        verbose_name="Line Order",
+        help_text="Line ids in evaluation order.",
+    )
+    createdAt = models.DateTimeField(auto_now_add=True, verbose_name="Created At")
+
+    class Meta:
+        verbose_name = "Calculation Scheme Version"
+        verbose_name_plural = "Calculation Scheme Versions"
+        ordering = ["scheme", "-validFrom"]
+        unique_together = (("scheme", "validFrom"),)
+
+    def __str__(self) -> str:
+        return f"{self.scheme_id} from {self.validFrom:%Y-%m-%d}"
+
+
+def input_errors(Input, lineNo, sourceLineNo, hasPayrollEntry, sameScheme=True):
+    """
+    Input rules of a calculation line, shared by ``CalculationScheme.clean``
+    and the bulk line editor. ``sourceLineNo`` is the line number of the
+    Calculation Line (``None`` if empty). Returns the first violation as a
+    field error dict, or ``None``.
+    """
+    if Input == "Calculation Line":
+        if sourceLineNo is None:
+            return {"calculationLine": "Required when Input is 'Calculation Line'."}
+        if hasPayrollEntry:
+            return {"payrollEntry": "Clear this when Input is 'Calculation Line'."}
+        # Validate reference line belongs to same scheme and is higher
+        if not sameScheme:
+            return {"calculationLine": "Must reference a line in the same Scheme."}
+        if lineNo is not None and sourceLineNo <= lineNo:
+            return {"calculationLine": "Line number must be higher than current line."}
+    elif Input == "Payroll Entry":
+        if not hasPayrollEntry:
+            return {"payrollEntry": "Required when Input is 'Payroll Entry'."}
+        if sourceLineNo is not None:
+            return {"calculationLine": "Clear this when Input is 'Payroll Entry'."}
+    elif sourceLineNo is not None or hasPayrollEntry:
+        # Input == None
+        return {
+            "Input": "When Input is 'None', both Payroll Entry and Calculation Line must be empty.",
+        }
+    return None
@@ -0,0 +1,194 @@
+"""
+Per-line profiling of calculation schemes.
+
+``profile_scheme`` compiles a ``CalculationHeader``'s working lines and
+evaluates them for a sample of the scheme's employees (once with no inputs
+for a scheme without a basic pay entry), timing each step through
+``CompiledScheme.evaluate_lines(timings=...)``. Evaluations, non-zero
+results and lookup resolutions are counted per step, all attributed to the
+line's ``lineNo``. Timing every step adds overhead of its own, so compare
+lines with each other rather than with a normal run.
+
+Lines are flagged when:
+
+* ``always zero``: every sampled evaluation gave zero;
+* ``result unused``: the line has no ``payrollLines``, no ``calculateTo``
+  and no other line reads it as its ``calculationLine``;
+* ``output unused``: its ``payrollLines`` ED is not read by any line of
+  the scheme, is not the basic pay entry, has no payslip group and is not
+  posted.
+"""
+
+import datetime
+from typing import NamedTuple
+
+from employee.models import Employee
+from payroll.scales import ScaleMatrix, resolve_basic_pay
+
+from .engine import OP_LOOKUP, S_LOOKUP, S_OP, compile_scheme
+from .models import CalculationScheme, EdDefinition
+
+SAMPLE_SIZE = 1000
+
+
+class LineProfile(NamedTuple):
+    lineNo: int
+    description: str
+    calculation: str
+    output: str | None
+    evaluations: int
+    seconds: float
+    nonZero: int
+    lookups: int
+    share: float
+    flags: tuple
+
+    @property
+    def microseconds(self) -> float:
+        """Mean time per evaluation."""
+        return self.seconds * 1e6 / self.evaluations if self.evaluations else 0.0
+
+
+class SchemeProfile(NamedTuple):
+    schemeId: str
+    employees: int
+    seconds: float
+    lines: list
+
+
+def profile_plan(plan, inputs, month: int | None = None) -> list:
+    """
+    Evaluate ``plan`` for each mapping in ``inputs`` timing every step.
+    Returns ``[evaluations, seconds, non-zero results, lookups]`` per step.
+    """
+    timings = [0.0] * len(plan.steps)
+    non_zero = [0] * len(plan.steps)
+    for employee_inputs in inputs:
+        values, _ = plan.evaluate_lines(employee_inputs, month, timings)
+        for slot, value in enumerate(values):
+            if value:
+                non_zero[slot] += 1
+    evaluations = len(inputs)
+    return [
+        [
+            evaluations,
+            timings[slot],
+            non_zero[slot],
+            (
+                evaluations
+                if step[S_OP] == OP_LOOKUP and step[S_LOOKUP] is not None
+                else 0
+            ),
+        ]
+        for slot, step in enumerate(plan.steps)
+    ]
+
+
+def sample_inputs(header, basic_code, size: int = SAMPLE_SIZE, on=None) -> list:
+    """
+    Input mappings of up to ``size`` employees on ``header``; one empty
+    mapping when the scheme reads no basic pay.
+    """
+    if basic_code is None:
+        return [{}]
+    employees = Employee.objects.filter(calculationScheme=header).order_by("pk")
+    ids = list(employees.values_list("pk", flat=True)[:size])
+    matrix = ScaleMatrix.for_payroll(header.payrollCode)
+    amounts = resolve_basic_pay(
+        header.payrollCode, employees.filter(pk__in=ids), on, matrix
+    )
+    return [{basic_code: amounts[pk]} for pk in ids]
+
+
+def _flags(line, stats, read_lines, read_eds, consumed_eds, basic_code) -> tuple:
+    flags = []
+    if stats[0] and not stats[2]:
+        flags.append("always zero")
+    output = line["payrollLines__edCode"]
+    if not output and not line["calculateTo_id"] and line["id"] not in read_lines:
+        flags.append("result unused")
+    if (
+        output
+        and output not in read_eds
+        and output not in consumed_eds
+        and output != basic_code
+    ):
+        flags.append("output unused")
+    return tuple(flags)
+
+
+def profile_scheme(header, size: int = SAMPLE_SIZE, on=None) -> SchemeProfile:
+    """Profile ``header``'s working lines; see the module docstring."""
+    on = on or datetime.date.today()
+    plan = compile_scheme(header)
+    basic_code = header.basicPayEntry.edCode if header.basicPayEntry_id else None
+    inputs = sample_inputs(header, basic_code, size, on)
+    stats = profile_plan(plan, inputs, on.month)
+
+    lines = {
+        line["lineNo"]: line
+        for line in CalculationScheme.objects.filter(scheme=header).values(
+            "id",
+            "lineNo",
+            "description",
+            "calculation",
+            "Input",
+            "calculationLine_id",
+            "calculateTo_id",
+            "payrollEntry__edCode",
+            "payrollLines__edCode",
+        )
+    }
+    read_lines = {
+        line["calculationLine_id"]
+        for line in lines.values()
+        if line["Input"] == "Calculation Line"
+    }
+    read_eds = {
+        line["payrollEntry__edCode"]
+        for line in lines.values()
+        if line["Input"] == "Payroll Entry"
+    }
+    outputs = {line["payrollLines__edCode"] for line in lines.values()} - {None}
+    eds = EdDefinition.objects.filter(edCode__in=outputs).values_list(
+        "edCode", "payslipGroup_id", "edPostingGroup_id", "postingType"
+    )
+    consumed_eds = {
+        code
+        for code, payslip_group, posting_group, posting_type in eds
+        if payslip_group or (posting_group and posting_type != "None")
+    }
+
+    total = sum(counts[1] for counts in stats)
+    profiles = []
+    for slot, lineNo in enumerate(plan.lineNos):
+        line = lines[lineNo]
+        evaluations, seconds, non_zero, lookups = stats[slot]
+        profiles.append(
+            LineProfile(
+                lineNo=lineNo,
+                description=line["description"],
+                calculation=line["calculation"],
+                output=line["payrollLines__edCode"],
+                evaluations=evaluations,
+                seconds=seconds,
+                nonZero=non_zero,
+                lookups=lookups,
+                share=100 * seconds / total if total else 0.0,
+                flags=_flags(
+                    line,
+                    stats[slot],
+                    read_lines,
+                    read_eds,
+                    consumed_eds,
+                    basic_code,
+                ),
+            )
+        )
+    profiles.sort(key=lambda profile: profile.lineNo)
+    return SchemeProfile(
+        schemeId=header.schemeId,
+        employees=len(inputs) if basic_code else 0,
+        seconds=total,
+        lines=profiles,
+    )
@@ -0,0 +1,48 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from financial.models import ExchangeRate
+
+from . import snapshot
+from .models import (
+    CalculationHeader,
+    CalculationScheme,
+    CalculationSchemeVersion,
+    EdDefinition,
+    Lookup,
+    LookupLine,
+    PayrollPostingSetup,
+)
+
+
+@receiver(post_save, sender=CalculationScheme)
+@receiver(post_delete, sender=CalculationScheme)
+def clear_line_order(sender, instance, **kwargs):
+    # The cached evaluation order is rebuilt lazily by graph.ordered_scheme_lines
+    CalculationHeader.objects.filter(pk=instance.scheme_id).exclude(
+        lineOrder=None
+    ).update(lineOrder=None)
+
+
+SNAPSHOT_SENDERS = (
+    ExchangeRate,
+    CalculationHeader,
+    CalculationSchemeVersion,
+    CalculationScheme,
+    EdDefinition,
+    Lookup,
+    LookupLine,
+    PayrollPostingSetup,
+    "payroll.SalaryScaleStep",
+    "payroll.SalaryScaleStepAmount",
+)
+
+
+def invalidate_snapshots(sender, **kwargs):
+    # Published version plans embed lookup tables, converted at the rates
+    snapshot.invalidate(plans=sender in (ExchangeRate, Lookup, LookupLine))
+
+
+for sender in SNAPSHOT_SENDERS:
+    post_save.connect(invalidate_snapshots, sender=sender)
+    post_delete.connect(invalidate_snapshots, sender=sender)
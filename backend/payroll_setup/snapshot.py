@@ -0,0 +1,266 @@
+"""
+In-process snapshot of the setup data a payroll calculation needs.
+
+``get_snapshot(payroll)`` builds, with a fixed handful of bulk queries, every
+ED definition, lookup table, salary scale matrix, posting setup and
+compiled calculation scheme for a ``Payroll`` and keeps it in memory until a
+``post_save``/``post_delete`` signal on one of those models invalidates the
+cache (see ``signals.py``), in this process or, through a shared version
+(``core.caches``), in another one. Snapshots hold only plain values, so they
+pickle cleanly into worker processes. Treat them as read-only.
+
+Compiled plans of published scheme versions (``versions.py``) are immutable
+and kept across snapshots; only lookup changes discard them.
+
+Lookups in a foreign currency are converted to LCY at the exchange rates in
+effect on the date asked for (``financial.rates``). Snapshots, and version
+plans, are cached per ``rateKey``: one per set of rates, not per date.
+"""
+
+import threading
+from bisect import bisect_right
+from typing import NamedTuple
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from core.caches import SharedVersion
+from financial.rates import get_rates
+from payroll.scales import ScaleMatrix
+
+from .engine import build_plan
+from .graph import LINE_FIELDS, order_lines
+from .lookups import LookupTable, convert_tables
+from .models import (
+    CalculationHeader,
+    CalculationScheme,
+    EdDefinition,
+    Lookup,
+    LookupLine,
+    PayrollPostingSetup,
+)
+
+
+class EdEntry(NamedTuple):
+    edCode: str
+    description: str
+    payslipText: str
+    calculationGroup: str
+    postingType: str
+    debitCredit: str | None
+    payslipGroup_id: int | None
+    edPostingGroup_id: int | None
+
+
+class SetupSnapshot(NamedTuple):
+    payrollCode: str
+    version: int
+    rateKey: tuple
+    edDefinitions: dict
+    lookups: dict
+    scales: ScaleMatrix
+    postingSetups: dict
+    schemes: dict
+    versions: dict
+
+    def scheme_key(self, header_id, on=None):
+        """
+        Key into ``schemes`` for the version of a scheme valid on ``on``:
+        ``(header id, version id)``, or the header id for the working lines
+        when the scheme has no versions (or ``on`` is ``None``). A versioned
+        scheme without a version valid on ``on`` raises ``ValidationError``
+        rather than run a past period with the current lines.
+        """
+        if on is None or header_id not in self.versions:
+            return header_id
+        dates, version_ids = self.versions[header_id]
+        index = bisect_right(dates, on)
+        if not index:
+            plan, _ = self.schemes[header_id]
+            raise ValidationError(
+                f"Scheme {plan.schemeId} has no version valid on {on}; "
+                "publish one from that date."
+            )
+        return (header_id, version_ids[index - 1])
+
+    def scheme(self, header_id, on=None):
+        """Return ``(compiled plan, basic pay edCode)`` for a scheme id."""
+        return self.schemes[self.scheme_key(header_id, on)]
+
+
+_lock = threading.Lock()
+_version = 0
+_snapshots = {}
+# Compiled plans of published versions by (version id, rate key)
+_version_plans = {}
+# Currencies of each payroll's lookups, by payroll code
+_currencies = {}
+# Invalidations by other processes
+_shared = SharedVersion("payroll_setup.snapshot")
+_shared_plans = SharedVersion("payroll_setup.plans")
+
+
+def _payroll_filter(payroll) -> Q:
+    return Q(payrollCode=payroll) | Q(payrollCode__isnull=True)
+
+
+def _load_lookups(payroll, rates, on=None) -> dict:
+    lines = {}
+    for lookup_id, lower, percent, amount in LookupLine.objects.filter(
+        Q(lookup__payrollCode=payroll) | Q(lookup__payrollCode__isnull=True)
+    ).values_list("lookup_id", "lowerAmount", "percent", "extractAmount"):
+        lines.setdefault(lookup_id, []).append((lower, percent, amount))
+    tables = {
+        lookup.code: LookupTable.from_lookup(lookup, lines.get(lookup.code, ()))
+        for lookup in Lookup.objects.filter(_payroll_filter(payroll))
+    }
+    return convert_tables(tables, rates, on)
+
+
+def _lookup_currencies(payroll) -> frozenset:
+    currencies = _currencies.get(payroll.code)
+    if currencies is None:
+        version = _version
+        currencies = frozenset(
+            Lookup.objects.filter(_payroll_filter(payroll), currencyCode__isnull=False)
+            .values_list("currencyCode_id", flat=True)
+            .distinct()
+        )
+        with _lock:
+            if version == _version:
+                _currencies[payroll.code] = currencies
+    return currencies
+
+
+def _load_schemes(payroll, lookups) -> dict:
+    headers = list(
+        CalculationHeader.objects.filter(payrollCode=payroll).values_list(
+            "pk", "schemeId", "basicPayEntry__edCode", "lineOrder"
+        )
+    )
+    lines = {}
+    for line in CalculationScheme.objects.filter(scheme__payrollCode=payroll).values(
+        "scheme_id", *LINE_FIELDS
+    ):
+        lines.setdefault(line.pop("scheme_id"), []).append(line)
+
+    schemes = {}
+    for pk, schemeId, basic_code, cached in headers:
+        scheme_lines = lines.get(pk, [])
+        by_id = {line["id"]: line for line in scheme_lines}
+        if cached and len(cached) == len(by_id) and all(i in by_id for i in cached):
+            ordered = [by_id[i] for i in cached]
+        else:
+            ordered = order_lines(scheme_lines)
+        schemes[pk] = (build_plan(schemeId, ordered, lookups, ordered=True), basic_code)
+    return schemes
+
+
+def _load_versions(payroll, lookups, schemes, version, rate_key) -> dict:
+    """Add version plans to ``schemes``; return ``{header id: (dates, ids)}``."""
+    from .versions import load_versions
+
+    by_header = {}
+    for version_id, (header_id, schemeId, valid_from, basic_code, lines) in sorted(
+        load_versions(payroll).items(), key=lambda item: (item[1][0], item[1][2])
+    ):
+        plan = _version_plans.get((version_id, rate_key))
+        if plan is None:
+            plan = build_plan(schemeId, lines, lookups, ordered=True)
+            with _lock:
+                if version == _version:
+                    _version_plans[(version_id, rate_key)] = plan
+        schemes[(header_id, version_id)] = (plan, basic_code)
+        dates, ids = by_header.setdefault(header_id, ([], []))
+        dates.append(valid_from)
+        ids.append(version_id)
+    return {
+        header_id: (tuple(dates), tuple(ids))
+        for header_id, (dates, ids) in by_header.items()
+    }
+
+
+def build_snapshot(payroll, version: int = 0, on=None) -> SetupSnapshot:
+    rates = get_rates()
+    rate_key = rates.key(_lookup_currencies(payroll), on)
+    edDefinitions = {
+        row[0]: EdEntry(*row)
+        for row in EdDefinition.objects.filter(_payroll_filter(payroll)).values_list(
+            "edCode",
+            "description",
+            "payslipText",
+            "calculationGroup",
+            "postingType",
+            "debitCredit",
+            "payslipGroup_id",
+            "edPostingGroup_id",
+        )
+    }
+    lookups = _load_lookups(payroll, rates, on)
+    postingSetups = {
+        (employee_group, ed_group): (debit, credit)
+        for employee_group, ed_group, debit, credit in PayrollPostingSetup.objects.filter(
+            employeePostingGroup__payrollCode=payroll
+        ).values_list(
+            "employeePostingGroup_id",
+            "edPostingGroup_id",
+            "debitAccount_id",
+            "creditAccount_id",
+        )
+    }
+    schemes = _load_schemes(payroll, lookups)
+    versions = _load_versions(payroll, lookups, schemes, version, rate_key)
+    return SetupSnapshot(
+        payrollCode=payroll.code,
+        version=version,
+        rateKey=rate_key,
+        edDefinitions=edDefinitions,
+        lookups=lookups,
+        scales=ScaleMatrix.for_payroll(payroll),
+        postingSetups=postingSetups,
+        schemes=schemes,
+        versions=versions,
+    )
+
+
+def get_snapshot(payroll, on=None) -> SetupSnapshot:
+    """
+    Return the cached snapshot for ``payroll`` with lookups converted at the
+    rates in effect on ``on`` (the latest if ``None``), building it if needed.
+    """
+    # Drop what another process invalidated
+    plans = _shared_plans.changed()
+    if _shared.changed() or plans:
+        _clear(plans)
+    version = _version
+    rate_key = get_rates().key(_lookup_currencies(payroll), on)
+    snapshot = _snapshots.get((payroll.code, rate_key))
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+    snapshot = build_snapshot(payroll, version, on)
+    with _lock:
+        if version == _version:
+            _snapshots[(payroll.code, snapshot.rateKey)] = snapshot
+    return snapshot
+
+
+def invalidate(plans: bool = False):
+    """
+    Drop every cached snapshot, here and in other processes; snapshots being
+    built are not cached. Pass ``plans`` when lookups changed to drop the
+    version plans too.
+    """
+    _clear(plans)
+    _shared.bump()
+    if plans:
+        _shared_plans.bump()
+
+
+def _clear(plans: bool):
+    global _version
+    with _lock:
+        _version += 1
+        _snapshots.clear()
+        _currencies.clear()
+        if plans:
+            _version_plans.clear()
@@ -1,3 +1,796 @@
-from django.test import TestCase
+import datetime
+import json
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from employee.models import Employee, ModeOfPayment
+from financial.models import GeneralJournalLine, GLAccount
+from payroll.models import (
+    Job,
+    Payroll,
+    PayrollRun,
+    PayrollRunLine,
+    SalaryScale,
+    SalaryScaleStep,
+    SalaryScaleStepAmount,
+)
+from payroll.jobs import claim_next
+from payroll.posting import document_no, post_run
+from payroll.run import execute_run
+
+from . import snapshot
+from .batch import evaluate_batch, np, round_array, to_cents
+from .engine import ROUND_DOWN, ROUND_NEAREST, ROUND_UP, compile_scheme, round_amount
+from .graph import order_lines, scheme_lines
+from .lookups import LookupTable
+from .models import (
+    CalculationHeader,
+    CalculationScheme,
+    EdDefinition,
+    EdPostingGroup,
+    EmployeePostingGroup,
+    Lookup,
+    LookupLine,
+    PayrollPostingSetup,
+    SchemeLineRevision,
+)
+from .versions import INITIAL_VALID_FROM, publish_version
+
+
+class AdminQueryCountTests(TestCase):
+    """Changelists and the scheme inline must not issue a query per row."""
+
+    # Queries per page, whatever the number of rows on it
+    EXPECTED = {
+        "/admin/payroll_setup/calculationscheme/": 6,
+        "/admin/employee/employee/": 7,
+        "/admin/payroll_setup/payrollpostingsetup/": 7,
+    }
+    HEADER_CHANGE_QUERIES = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        cls.payroll = Payroll.objects.create(code="P", description="Payroll")
+        cls.ed = EdDefinition.objects.create(edCode="BASIC", description="Basic")
+        cls.lookup = Lookup.objects.create(code="TAX", description="Tax")
+        cls.header = CalculationHeader.objects.create(
+            schemeId="S", description="Scheme", payrollCode=cls.payroll
+        )
+        cls.total = CalculationScheme.objects.create(
+            scheme=cls.header, lineNo=1, description="Total", payrollLines=cls.ed
+        )
+        cls.scale = SalaryScale.objects.create(code="U1", payrollCode=cls.payroll)
+        cls.step = SalaryScaleStep.objects.create(
+            code="U1-1", scale=cls.scale, amount=100, payrollCode=cls.payroll
+        )
+        cls.mode = ModeOfPayment.objects.create(code="BANK", description="Bank")
+        cls.edGroup = EdPostingGroup.objects.create(
+            edPostingGroup="SAL", description="Salaries", payrollCode=cls.payroll
+        )
+        cls.debit = GLAccount.objects.create(no="6000", name="Salaries")
+        cls.credit = GLAccount.objects.create(no="2000", name="Payables")
+        cls.next_line = 2
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def add_rows(self, count):
+        start = self.next_line
+        for i in range(start, start + count):
+            CalculationScheme.objects.create(
+                scheme=self.header,
+                lineNo=i,
+                description=f"Line {i}",
+                Input="Payroll Entry",
+                payrollEntry=self.ed,
+                calculation="Multiply",
+                divideMultiply=1,
+                calculationLine=self.total,
+                calculateTo=self.total,
+                lookUp=self.lookup,
+            )
+            Employee.objects.create(
+                employeeNo=f"E{i:04d}",
+                name=f"Employee {i}",
+                calculationScheme=self.header,
+                payrollCode=self.payroll,
+                modeOfPayment=self.mode,
+                basicPay="Scale",
+                salaryScale=self.scale,
+                scaleStep=self.step,
+            )
+            group = EmployeePostingGroup.objects.create(
+                postingGroup=f"G{i}", description="Group", payrollCode=self.payroll
+            )
+            PayrollPostingSetup.objects.create(
+                employeePostingGroup=group,
+                edPostingGroup=self.edGroup,
+                debitAccount=self.debit,
+                creditAccount=self.credit,
+            )
+        self.next_line += count
+
+    def count_queries(self, url):
+        # The first request fills per-process caches (content types etc.)
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_query_count_is_fixed(self):
+        for rows in (5, 45):
+            self.add_rows(rows)
+            for url, expected in self.EXPECTED.items():
+                with self.subTest(url=url, rows=self.next_line - 2):
+                    self.assertEqual(self.count_queries(url), expected)
+
+    def test_scheme_inline_query_count_is_fixed(self):
+        url = f"/admin/payroll_setup/calculationheader/{self.header.pk}/change/"
+        for rows in (5, 45):
+            self.add_rows(rows)
+            with self.subTest(rows=self.next_line - 2):
+                self.assertEqual(self.count_queries(url), self.HEADER_CHANGE_QUERIES)
+
+    def test_scheme_inline_offers_higher_lines_only(self):
+        self.add_rows(3)
+        url = f"/admin/payroll_setup/calculationheader/{self.header.pk}/change/"
+        response = self.client.get(url)
+        formset = response.context["inline_admin_formsets"][0].formset
+        for form in formset.forms:
+            with self.subTest(lineNo=form.instance.lineNo):
+                choices = form.fields["calculationLine"].choices
+                self.assertEqual(
+                    [value for value, _ in choices if value],
+                    list(
+                        CalculationScheme.objects.filter(
+                            scheme=self.header, lineNo__gt=form.instance.lineNo
+                        )
+                        .order_by("lineNo")
+                        .values_list("pk", flat=True)
+                    ),
+                )
+
+
+class LookupTableBatchTests(SimpleTestCase):
+    """``resolve_array`` must give the same results as ``resolve``."""
+
+    AMOUNTS = ["0", "99.99", "4999.99", "5000", "10000", "123456.78", "900000"]
+
+    def assertBatchMatches(self, table, month=None):
+        amounts = [Decimal(amount) for amount in self.AMOUNTS]
+        results, _ = table.resolve_array(
+            np.asarray([float(amount) for amount in amounts]), month
+        )
+        for amount, result in zip(amounts, results):
+            with self.subTest(type=table.type, amount=amount, month=month):
+                self.assertAlmostEqual(
+                    float(table.resolve(amount, month)), result, places=6
+                )
+
+    def test_types_below_and_within_brackets(self):
+        lines = [
+            (Decimal("5000"), Decimal("10"), Decimal("5000")),
+            (Decimal("100000"), Decimal("30"), Decimal("14500")),
+        ]
+        for type in ("Percentage", "Extract Amount", "Max Min", "Special"):
+            self.assertBatchMatches(
+                LookupTable("LST", type, Decimal("5000"), Decimal("80000"), lines)
+            )
+
+    def test_month_lookup(self):
+        lines = [(Decimal("3"), Decimal("50"), Decimal("0"))]
+        table = LookupTable("BONUS", "Month", Decimal("100"), None, lines)
+        for month in (None, 1, 3, 12):
+            self.assertBatchMatches(table, month)
+
+
+class SchemeGraphTests(TestCase):
+    """Cycles and references out of the scheme are rejected by line."""
+
+    @classmethod
+    def setUpTestData(cls):
+        payroll = Payroll.objects.create(code="GRAPH", description="Graph")
+        cls.eds = {
+            code: EdDefinition.objects.create(edCode=code, description=code)
+            for code in ("G-X", "G-Y")
+        }
+        cls.header, cls.other = [
+            CalculationHeader.objects.create(
+                schemeId=scheme_id, description=scheme_id, payrollCode=payroll
+            )
+            for scheme_id in ("G-1", "G-2")
+        ]
+
+    def line(self, lineNo, header=None, **fields):
+        return CalculationScheme.objects.create(
+            scheme=header or self.header,
+            lineNo=lineNo,
+            description=str(lineNo),
+            **fields,
+        )
+
+    def assertRejected(self, messages):
+        with self.assertRaises(ValidationError) as raised:
+            order_lines(scheme_lines(self.header.pk))
+        self.assertEqual(raised.exception.messages, messages)
+
+    def test_calculate_to_cycle(self):
+        first = self.line(10)
+        second = self.line(20, calculateTo=first)
+        first.calculateTo = second
+        first.save()
+        # Depends on the cycle without being on it
+        self.line(30, Input="Calculation Line", calculationLine=second)
+        self.line(40)
+        self.assertRejected(["Calculation scheme has a cycle through lines 10, 20."])
+
+    def test_cycle_through_produced_and_read_eds(self):
+        x, y = self.eds["G-X"], self.eds["G-Y"]
+        self.line(10, Input="Payroll Entry", payrollEntry=y, payrollLines=x)
+        self.line(20, Input="Payroll Entry", payrollEntry=x, payrollLines=y)
+        self.line(30, Input="Payroll Entry", payrollEntry=x)
+        self.assertRejected(["Calculation scheme has a cycle through lines 10, 20."])
+
+    def test_reference_to_a_line_of_another_scheme(self):
+        foreign = self.line(10, header=self.other)
+        self.line(10)
+        self.line(20, Input="Calculation Line", calculationLine=foreign)
+        self.line(30, calculateTo=foreign)
+        self.assertRejected(
+            [
+                "Line 20: Calculation Line is not a line of this scheme.",
+                "Line 30: Calculate To is not a line of this scheme.",
+            ]
+        )
+
+
+class BatchEvaluationTests(TestCase):
+    """The batch path and payroll runs must match ``CompiledScheme.evaluate``."""
+
+    AMOUNTS = ["0", "100", "1000.01", "234999.99", "235000", "335000.50", "5000000"]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.payroll = Payroll.objects.create(code="BATCH", description="Batch")
+        basic = EdDefinition.objects.create(edCode="B-BASIC", description="Basic")
+        paye = EdDefinition.objects.create(edCode="B-PAYE", description="PAYE")
+        net = EdDefinition.objects.create(edCode="B-NET", description="Net")
+        third = EdDefinition.objects.create(edCode="B-THIRD", description="Thirds")
+        lookup = Lookup.objects.create(
+            code="B-PAYE", description="PAYE", type="Percentage"
+        )
+        for lower, percent, amount in [
+            (235000, 10, 0),
+            (335000, 20, 10000),
+            (410000, 30, 25000),
+        ]:
+            LookupLine.objects.create(
+                lookup=lookup, lowerAmount=lower, percent=percent, extractAmount=amount
+            )
+        cls.header = CalculationHeader.objects.create(
+            schemeId="BATCH",
+            description="Batch",
+            payrollCode=cls.payroll,
+            basicPayEntry=basic,
+        )
+
+        def line(lineNo, **fields):
+            return CalculationScheme.objects.create(
+                scheme=cls.header, lineNo=lineNo, description=str(lineNo), **fields
+            )
+
+        total = line(10, payrollLines=net)
+        line(
+            20,
+            Input="Payroll Entry",
+            payrollEntry=basic,
+            calculateTo=total,
+        )
+        line(
+            30,
+            Input="Payroll Entry",
+            payrollEntry=basic,
+            calculation="Look Up",
+            lookUp=lookup,
+            roundType="Down",
+            roundPrecision=1,
+            payrollLines=paye,
+        )
+        line(
+            40,
+            Input="Payroll Entry",
+            payrollEntry=paye,
+            calculation="Subtract",
+            calculateTo=total,
+        )
+        # 100 / 3 * 3 is exactly 100.0 in floats but just below 100 in Decimal
+        line(
+            50,
+            Input="Calculation Line",
+            calculationLine=line(
+                60,
+                Input="Payroll Entry",
+                payrollEntry=basic,
+                calculation="Divide",
+                divideMultiply=3,
+                roundType="None",
+            ),
+            calculation="Multiply",
+            divideMultiply=3,
+            roundType="Down",
+            roundPrecision=1,
+            payrollLines=third,
+        )
+        mode = ModeOfPayment.objects.create(code="B-BANK", description="Bank")
+        for index, amount in enumerate(cls.AMOUNTS):
+            Employee.objects.create(
+                employeeNo=f"B{index:04d}",
+                name=f"Employee {index}",
+                calculationScheme=cls.header,
+                payrollCode=cls.payroll,
+                modeOfPayment=mode,
+                basicPay="Fixed",
+                fixedPay=Decimal(amount),
+            )
+
+    def setUp(self):
+        snapshot.invalidate(plans=True)
+
+    def scalar(self, plan, amount):
+        outputs = plan.evaluate({"B-BASIC": Decimal(amount)})
+        return {code: to_cents(value) for code, value in outputs.items()}
+
+    def test_round_array_matches_round_amount(self):
+        values = [-2.5, -1.0, 0.0, 0.5, 1.0, 1.005, 2.675, 99.99, 100.0, 12345.5]
+        flags = {}
+        for mode in (ROUND_UP, ROUND_DOWN, ROUND_NEAREST):
+            for precision in (0.01, 1.0, 5.0):
+                rounded, ambiguous = round_array(np.asarray(values), mode, precision)
+                for value, result, near in zip(values, rounded, ambiguous):
+                    if near:
+                        continue
+                    expected = round_amount(
+                        Decimal(repr(value)), mode, Decimal(repr(precision))
+                    )
+                    with self.subTest(mode=mode, precision=precision, value=value):
+                        self.assertAlmostEqual(float(expected), result, places=6)
+                flags[mode, precision] = ambiguous
+        # Exact float integers may be a hair off in Decimal: always recheck
+        self.assertTrue(flags[ROUND_DOWN, 1.0][values.index(100.0)])
+
+    def test_batch_matches_scalar(self):
+        plan = compile_scheme(self.header)
+        results = evaluate_batch(plan, {"B-BASIC": self.AMOUNTS})
+        for row, amount in enumerate(self.AMOUNTS):
+            expected = self.scalar(plan, amount)
+            for code in plan.outputs:
+                with self.subTest(amount=amount, code=code):
+                    self.assertEqual(
+                        results[code][row], expected.get(code, Decimal("0"))
+                    )
+
+    def test_run_matches_scalar(self):
+        plan = compile_scheme(self.header)
+        run = PayrollRun.objects.create(
+            payrollCode=self.payroll, period=datetime.date(2025, 1, 1)
+        )
+        execute_run(run, chunk_size=3, workers=1)
+        self.assertEqual(run.status, "Calculated")
+        self.assertEqual(run.employeeCount, len(self.AMOUNTS))
+        for employee in Employee.objects.filter(payrollCode=self.payroll):
+            lines = dict(
+                PayrollRunLine.objects.filter(run=run, employee=employee).values_list(
+                    "edDefinition_id", "amount"
+                )
+            )
+            expected = {
+                code: amount
+                for code, amount in self.scalar(plan, employee.fixedPay).items()
+                if amount
+            }
+            with self.subTest(employee=employee.employeeNo):
+                self.assertEqual(lines, expected)
+
+    def test_posted_and_running_runs_are_not_recalculated(self):
+        for status in PayrollRun.LOCKED:
+            run = PayrollRun.objects.create(
+                payrollCode=self.payroll,
+                period=datetime.date(2025, 2, 1),
+                status=status,
+            )
+            with self.subTest(status=status):
+                with self.assertRaises(ValidationError):
+                    execute_run(run, workers=1)
+                run.refresh_from_db()
+                self.assertEqual(run.status, status)
+                self.assertFalse(PayrollRunLine.objects.filter(run=run).exists())
+            run.delete()
+
+    def test_interrupted_run_is_failed(self):
+        run = PayrollRun.objects.create(
+            payrollCode=self.payroll, period=datetime.date(2025, 3, 1)
+        )
+        with mock.patch("payroll.run.load_employees", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                execute_run(run, workers=1)
+        run.refresh_from_db()
+        self.assertEqual(run.status, "Failed")
+        execute_run(run, workers=1)
+        self.assertEqual(run.status, "Calculated")
+
+    def test_posting_refuses_a_run_claimed_since_the_check(self):
+        run = PayrollRun.objects.create(
+            payrollCode=self.payroll, period=datetime.date(2025, 4, 1)
+        )
+        execute_run(run, workers=1)
+        PayrollRun.objects.filter(pk=run.pk).update(status="Running")
+        with self.assertRaises(ValidationError):
+            post_run(run)
+        self.assertEqual(PayrollRun.objects.get(pk=run.pk).status, "Running")
+        self.assertFalse(
+            GeneralJournalLine.objects.filter(documentNo=document_no(run)).exists()
+        )
+
+    def test_reopen_stuck_runs(self):
+        user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.client.force_login(user)
+        stuck, busy = [
+            PayrollRun.objects.create(
+                payrollCode=self.payroll, period=period, status="Running"
+            )
+            for period in (datetime.date(2025, 5, 1), datetime.date(2025, 6, 1))
+        ]
+        Job.objects.create(
+            kind="calculate", arguments={"run": busy.pk}, status="Running"
+        )
+        self.client.post(
+            "/admin/payroll/payrollrun/",
+            {"action": "reopen_runs", "_selected_action": [stuck.pk, busy.pk]},
+        )
+        stuck.refresh_from_db()
+        busy.refresh_from_db()
+        self.assertEqual((stuck.status, busy.status), ("Failed", "Running"))
+
+
+class IncrementalRunTests(TestCase):
+    """An incremental rerun rewrites only the employees an edit affects."""
+
+    PERIOD = datetime.date(2025, 1, 1)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.payroll = Payroll.objects.create(code="INC", description="Incremental")
+        basic = EdDefinition.objects.create(edCode="I-BASIC", description="Basic")
+        tax = EdDefinition.objects.create(edCode="I-TAX", description="Tax")
+        cls.lookup = Lookup.objects.create(
+            code="I-TAX", description="Tax", type="Percentage"
+        )
+        cls.bracket = LookupLine.objects.create(
+            lookup=cls.lookup, lowerAmount=0, percent=10, extractAmount=0
+        )
+        taxed, untaxed = [
+            CalculationHeader.objects.create(
+                schemeId=f"I-{name}",
+                description=name,
+                payrollCode=cls.payroll,
+                basicPayEntry=basic,
+            )
+            for name in ("TAXED", "UNTAXED")
+        ]
+        pay = EdDefinition.objects.create(edCode="I-PAY", description="Pay")
+        for scheme in (taxed, untaxed):
+            CalculationScheme.objects.create(
+                scheme=scheme,
+                lineNo=20,
+                description="Pay",
+                Input="Payroll Entry",
+                payrollEntry=basic,
+                payrollLines=pay,
+            )
+        CalculationScheme.objects.create(
+            scheme=taxed,
+            lineNo=10,
+            description="Tax",
+            Input="Payroll Entry",
+            payrollEntry=basic,
+            calculation="Look Up",
+            lookUp=cls.lookup,
+            payrollLines=tax,
+        )
+        scale = SalaryScale.objects.create(code="I-U1", payrollCode=cls.payroll)
+        cls.step = SalaryScaleStep.objects.create(
+            code="I-U1-1", scale=scale, amount=700, payrollCode=cls.payroll
+        )
+        mode = ModeOfPayment.objects.create(code="I-BANK", description="Bank")
+        cls.employees = {}
+        for name, scheme, pay in [
+            ("taxed1", taxed, {"fixedPay": 1000}),
+            ("taxed2", taxed, {"fixedPay": 2000}),
+            ("scaled", untaxed, {"salaryScale": scale, "scaleStep": cls.step}),
+            ("fixed", untaxed, {"fixedPay": 3000}),
+        ]:
+            cls.employees[name] = Employee.objects.create(
+                employeeNo=f"I-{name}",
+                name=name,
+                calculationScheme=scheme,
+                payrollCode=cls.payroll,
+                modeOfPayment=mode,
+                basicPay="Scale" if "scaleStep" in pay else "Fixed",
+                **pay,
+            )
+
+    def setUp(self):
+        snapshot.invalidate(plans=True)
+        self.run = PayrollRun.objects.create(
+            payrollCode=self.payroll, period=self.PERIOD
+        )
+        execute_run(self.run, workers=1)
+
+    def lines(self):
+        """``{employee name: {edCode: (line pk, amount)}}`` of the run."""
+        names = {employee.pk: name for name, employee in self.employees.items()}
+        lines = {}
+        for pk, employee_id, code, amount in PayrollRunLine.objects.filter(
+            run=self.run
+        ).values_list("pk", "employee_id", "edDefinition_id", "amount"):
+            lines.setdefault(names[employee_id], {})[code] = (pk, amount)
+        return lines
+
+    def assertRewrites(self, edit, names, amounts):
+        before = self.lines()
+        with self.captureOnCommitCallbacks(execute=True):
+            edit()
+        execute_run(self.run, workers=1, incremental=True)
+        after = self.lines()
+        self.assertEqual(
+            {name for name in after if after[name] != before[name]}, set(names)
+        )
+        for name, expected in amounts.items():
+            self.assertEqual(
+                {code: amount for code, (_, amount) in after[name].items()},
+                expected,
+            )
+        self.assertEqual(self.run.lineCount, sum(map(len, after.values())))
+
+    def test_scale_step_amount(self):
+        self.assertRewrites(
+            lambda: SalaryScaleStepAmount.objects.create(
+                step=self.step, effectiveDate=self.PERIOD, amount=800
+            ),
+            ["scaled"],
+            {"scaled": {"I-PAY": Decimal("800.00")}},
+        )
+
+    def test_lookup_line(self):
+        def edit():
+            self.bracket.percent = 20
+            self.bracket.save()
+
+        self.assertRewrites(
+            edit,
+            ["taxed1", "taxed2"],
+            {"taxed2": {"I-PAY": Decimal("2000.00"), "I-TAX": Decimal("400.00")}},
+        )
+
+    def test_employee(self):
+        def edit():
+            employee = self.employees["fixed"]
+            employee.fixedPay = 3500
+            employee.save()
+
+        self.assertRewrites(edit, ["fixed"], {"fixed": {"I-PAY": Decimal("3500.00")}})
+
+
+class SchemeVersionTests(TestCase):
+    """Published versions share unchanged lines and are picked by period."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.payroll = Payroll.objects.create(code="VER", description="Versions")
+        basic = EdDefinition.objects.create(edCode="V-BASIC", description="Basic")
+        pay = EdDefinition.objects.create(edCode="V-PAY", description="Pay")
+        cls.header = CalculationHeader.objects.create(
+            schemeId="VER",
+            description="Versions",
+            payrollCode=cls.payroll,
+            basicPayEntry=basic,
+        )
+        cls.factor = CalculationScheme.objects.create(
+            scheme=cls.header,
+            lineNo=10,
+            description="Pay",
+            Input="Payroll Entry",
+            payrollEntry=basic,
+            calculation="Multiply",
+            divideMultiply=1,
+            payrollLines=pay,
+        )
+        for lineNo in (20, 30):
+            CalculationScheme.objects.create(
+                scheme=cls.header, lineNo=lineNo, description=str(lineNo)
+            )
+        Employee.objects.create(
+            employeeNo="V-1",
+            name="Employee",
+            calculationScheme=cls.header,
+            payrollCode=cls.payroll,
+            modeOfPayment=ModeOfPayment.objects.create(code="V-BANK"),
+            basicPay="Fixed",
+            fixedPay=1000,
+        )
+
+    def setUp(self):
+        snapshot.invalidate(plans=True)
+
+    def set_factor(self, factor):
+        self.factor.divideMultiply = factor
+        self.factor.save()
+
+    def pay(self, period):
+        run, _ = PayrollRun.objects.get_or_create(
+            payrollCode=self.payroll, period=period
+        )
+        execute_run(run, workers=1)
+        return PayrollRunLine.objects.get(run=run).amount
+
+    def test_unchanged_lines_are_shared(self):
+        first = publish_version(self.header, datetime.date(2025, 1, 1))
+        self.assertEqual(
+            list(self.header.versions.values_list("validFrom", flat=True)),
+            [datetime.date(2025, 1, 1), INITIAL_VALID_FROM],
+        )
+        self.assertEqual(SchemeLineRevision.objects.count(), 3)
+
+        self.set_factor(2)
+        second = publish_version(self.header, datetime.date(2025, 3, 1))
+        self.assertEqual(SchemeLineRevision.objects.count(), 4)
+        shared = set(first.lines.all()) & set(second.lines.all())
+        self.assertEqual(len(shared), 2)
+        self.assertNotIn(self.factor.pk, {line.data["id"] for line in shared})
+
+        # Publishing unchanged lines again writes nothing
+        self.assertEqual(
+            publish_version(self.header, datetime.date(2025, 4, 1)), second
+        )
+        self.assertEqual(self.header.versions.count(), 3)
+
+    def test_runs_use_the_version_valid_in_their_period(self):
+        publish_version(self.header, datetime.date(2025, 1, 1))
+        self.set_factor(2)
+        publish_version(self.header, datetime.date(2025, 3, 1))
+        # Unpublished edits are not used by versioned periods
+        self.set_factor(3)
+        for period, expected in [
+            (datetime.date(2024, 12, 1), 1000),
+            (datetime.date(2025, 2, 1), 1000),
+            (datetime.date(2025, 3, 1), 2000),
+            (datetime.date(2025, 6, 1), 2000),
+        ]:
+            with self.subTest(period=period):
+                self.assertEqual(self.pay(period), expected)
+
+    def test_periods_without_a_version_are_refused(self):
+        publish_version(self.header, datetime.date(2025, 1, 1))
+        self.header.versions.filter(validFrom=INITIAL_VALID_FROM).delete()
+        run = PayrollRun.objects.create(
+            payrollCode=self.payroll, period=datetime.date(2024, 12, 1)
+        )
+        with self.assertRaises(ValidationError):
+            execute_run(run, workers=1)
+        self.assertEqual(run.status, "Failed")
+
+
+class JobTests(TestCase):
+    """Jobs of dead workers must become retryable."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        cls.payroll = Payroll.objects.create(code="JOBS", description="Jobs")
+
+    def running(self, period, minutes_ago):
+        run = PayrollRun.objects.create(
+            payrollCode=self.payroll, period=period, status="Running"
+        )
+        beat = timezone.now() - datetime.timedelta(minutes=minutes_ago)
+        job = Job.objects.create(
+            kind="calculate",
+            arguments={"run": run.pk},
+            status="Running",
+            startedAt=beat,
+            heartbeatAt=beat,
+            worker="host:1",
+        )
+        return run, job
+
+    def test_stale_jobs_are_failed_and_requeued(self):
+        stale_run, stale = self.running(datetime.date(2025, 1, 1), 60)
+        live_run, live = self.running(datetime.date(2025, 2, 1), 1)
+        self.assertIsNone(claim_next("host:2"))
+        for obj in (stale_run, stale, live_run, live):
+            obj.refresh_from_db()
+        self.assertEqual((stale.status, stale_run.status), ("Failed", "Failed"))
+        self.assertEqual((live.status, live_run.status), ("Running", "Running"))
+
+        self.client.force_login(self.user)
+        self.client.post(
+            "/admin/payroll/job/",
+            {"action": "requeue", "_selected_action": [stale.pk, live.pk]},
+        )
+        job = claim_next("host:2")
+        self.assertEqual((job.pk, job.worker), (stale.pk, "host:2"))
+        self.assertIsNone(claim_next("host:2"))
+
+
+class SchemeLineEditorTests(TestCase):
+    """The bulk line editor endpoint."""
+
+    LINES = [
+        {"lineNo": 10, "description": "Net", "payrollLines": "E-NET"},
+        {
+            "lineNo": 20,
+            "description": "Basic",
+            "Input": "Payroll Entry",
+            "payrollEntry": "E-BASIC",
+            "calculation": "Add",
+            "calculateTo": 10,
+        },
+        {"lineNo": 30, "description": "Unused"},
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        payroll = Payroll.objects.create(code="EDIT", description="Editor")
+        EdDefinition.objects.create(edCode="E-BASIC", description="Basic")
+        EdDefinition.objects.create(edCode="E-NET", description="Net")
+        cls.header = CalculationHeader.objects.create(
+            schemeId="EDIT", description="Editor", payrollCode=payroll
+        )
+        cls.url = f"/admin/payroll_setup/calculationheader/{cls.header.pk}/lines/"
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def put(self, lines):
+        return self.client.put(
+            self.url, json.dumps({"lines": lines}), content_type="application/json"
+        )
+
+    def counts(self, response):
+        self.assertEqual(response.status_code, 200)
+        return {name: response.json()[name] for name in ("created", "unchanged")}
+
+    def test_counts(self):
+        self.assertEqual(
+            self.counts(self.put(self.LINES)), {"created": 3, "unchanged": 0}
+        )
+        self.assertEqual(
+            self.counts(self.put(self.LINES)), {"created": 0, "unchanged": 3}
+        )
+        response = self.put(self.LINES[:2])
+        self.assertEqual(response.json()["deleted"], 1)
+        self.assertEqual(self.header.schemeLines.count(), 2)
+
+    def test_values_of_the_wrong_type_are_rejected(self):
+        for name, value in [
+            ("lineNo", [10]),
+            ("payrollLines", ["E-NET"]),
+            ("lookUp", 5),
+            ("calculateTo", [20]),
+            ("calculation", ["Add"]),
+            ("Input", {}),
+        ]:
+            with self.subTest(name=name):
+                response = self.put([{**self.LINES[0], name: value}])
+                self.assertEqual(response.status_code, 400)
+        self.assertFalse(self.header.schemeLines.exists())
@@ -0,0 +1,143 @@
+"""
+Effective-dated calculation scheme versions.
+
+The lines edited on a ``CalculationHeader`` are its working copy.
+``publish_version`` freezes them into a ``CalculationSchemeVersion`` valid
+from a date. Lines are stored copy-on-write: each distinct line content is
+one ``SchemeLineRevision`` (keyed by a digest of its fields) shared by every
+version containing it, so a version that changes one line adds one row.
+
+Runs use the latest version valid on their period, or the working lines if
+the scheme has none yet. The first publish of a scheme also freezes the
+lines as an initial version valid from ``INITIAL_VALID_FROM``, so reruns of
+periods before versioning started keep the lines they were run with (as
+long as the scheme is published before its lines are edited for a later
+period). Versions never change, so their compiled plans are kept by the
+setup snapshot across edits to the working lines.
+"""
+
+import datetime
+import hashlib
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import snapshot
+from .graph import order_lines, scheme_lines
+from .models import CalculationSchemeVersion, SchemeLineRevision
+
+# Validity of a scheme's initial version: every period before the first publish
+INITIAL_VALID_FROM = datetime.date.min
+
+
+def canonical_line(line) -> dict:
+    """A line dict with JSON-safe values (Decimals as normalized strings)."""
+    return {
+        key: str(value.normalize()) if isinstance(value, Decimal) else value
+        for key, value in line.items()
+    }
+
+
+def line_digest(line) -> str:
+    text = json.dumps(line, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def _line_set(version) -> tuple:
+    return (
+        version.basicPayEntry,
+        sorted(version.lines.values_list("digest", flat=True)),
+    )
+
+
+def publish_version(header, valid_from) -> CalculationSchemeVersion:
+    """
+    Freeze ``header``'s working lines as a version valid from ``valid_from``.
+    If they equal the version that would otherwise apply on that date, that
+    version is returned and nothing is written. A scheme's first publish
+    also stores them as its initial version for all earlier periods.
+    """
+    lines = [canonical_line(line) for line in order_lines(scheme_lines(header.pk))]
+    digests = {line["id"]: line_digest(line) for line in lines}
+    basic_code = header.basicPayEntry_id and header.basicPayEntry.edCode
+
+    with transaction.atomic():
+        current = (
+            CalculationSchemeVersion.objects.filter(
+                scheme=header, validFrom__lte=valid_from
+            )
+            .order_by("-validFrom")
+            .first()
+        )
+        if current is not None and _line_set(current) == (
+            basic_code,
+            sorted(digests.values()),
+        ):
+            return current
+        if CalculationSchemeVersion.objects.filter(
+            scheme=header, validFrom=valid_from
+        ).exists():
+            raise ValidationError(
+                f"{header.schemeId} already has a version valid from {valid_from}."
+            )
+
+        existing = dict(
+            SchemeLineRevision.objects.filter(digest__in=digests.values()).values_list(
+                "digest", "pk"
+            )
+        )
+        SchemeLineRevision.objects.bulk_create(
+            [
+                SchemeLineRevision(digest=digests[line["id"]], data=line)
+                for line in lines
+                if digests[line["id"]] not in existing
+            ],
+            ignore_conflicts=True,
+        )
+        revisions = list(SchemeLineRevision.objects.filter(digest__in=digests.values()))
+        dates = [valid_from]
+        if valid_from > INITIAL_VALID_FROM and not header.versions.exists():
+            dates.insert(0, INITIAL_VALID_FROM)
+        for date in dates:
+            version = CalculationSchemeVersion.objects.create(
+                scheme=header,
+                validFrom=date,
+                basicPayEntry=basic_code,
+                lineOrder=[line["id"] for line in lines],
+            )
+            version.lines.set(revisions)
+    # The version was saved before its lines were attached
+    snapshot.invalidate()
+    return version
+
+
+def load_versions(payroll) -> dict:
+    """
+    Return ``{version id: (header id, schemeId, validFrom, basic code,
+    ordered lines)}`` for ``payroll``'s schemes with two queries.
+    """
+    versions = CalculationSchemeVersion.objects.filter(
+        scheme__payrollCode=payroll
+    ).values_list(
+        "pk",
+        "scheme_id",
+        "scheme__schemeId",
+        "validFrom",
+        "basicPayEntry",
+        "lineOrder",
+    )
+    rows = list(versions)
+    lines = {}
+    through = CalculationSchemeVersion.lines.through
+    for version_id, data in through.objects.filter(
+        calculationschemeversion__scheme__payrollCode=payroll
+    ).values_list("calculationschemeversion_id", "schemelinerevision__data"):
+        lines.setdefault(version_id, {})[data["id"]] = data
+    result = {}
+    for pk, header_id, scheme_id, valid_from, basic_code, line_order in rows:
+        by_id = lines.get(pk, {})
+        ordered = [by_id[line_id] for line_id in line_order if line_id in by_id]
+        result[pk] = (header_id, scheme_id, valid_from, basic_code, ordered)
+    return result